@@ -1,14 +1,26 @@
+import time
+
 import streamlit as st
 from dotenv import load_dotenv
 from collections import Counter
 
 load_dotenv()
 
-from build_graph import workflow
+import config
+import result_cache
+import score_ranks
+import tracing
+import warmup
+from criteria_registry import CRITERIA
 from schemas import EssayState
-from utils import resolve_annotations, render_annotated_essay, get_criterion_color, CRITERION_COLORS
+from utils import resolve_annotations, render_annotated_essay, get_criterion_color, annotation_dict, CRITERION_COLORS
 from donation import show_donation_dialog
 
+# langgraph, langchain and the OpenAI client load in the background while
+# the form renders; `build_graph` and `nodes` are imported where needed.
+if config.WARMUP_ON_START and not config.EVALUATION_SERVICE_URL:
+    warmup.start()
+
 
 # =====================================================
 # PAGE CONFIG
@@ -78,24 +90,126 @@ st.markdown(
 # SESSION STATE
 # =====================================================
 
-if "result" not in st.session_state:
-    st.session_state.result = None
-
-if "essay" not in st.session_state:
-    st.session_state.essay = ""
-
-if "topic" not in st.session_state:
-    st.session_state.topic = ""
+# A handle into result_cache: the result is stored once per process, packed
+if "result_handle" not in st.session_state:
+    st.session_state.result_handle = None
 
 if "selected_criterion" not in st.session_state:
     st.session_state.selected_criterion = None
 
 
+# =====================================================
+# LIVE (STREAMING) EVALUATION VIEW
+# =====================================================
+
+def run_streaming_evaluation(workflow, initial_state: EssayState, criteria_keys: list[str]):
+    """Run the workflow, filling criterion cards and essay highlights as evaluators stream."""
+
+    essay_text = initial_state["essay"]
+
+    essay_col, feedback_col = st.columns([1.5, 1])
+
+    with essay_col:
+        st.subheader("Your Essay")
+        essay_slot = st.empty()
+
+    with feedback_col:
+        st.subheader("Criterion Analysis")
+        card_slots = {key: st.empty() for key in criteria_keys}
+
+    def show_essay(resolved):
+        essay_slot.markdown(
+            f"""
+            <div style='line-height:1.85;
+                        font-size:17px;
+                        padding-right:25px'>
+                {render_annotated_essay(essay_text, resolved)}
+            </div>
+            """,
+            unsafe_allow_html=True
+        )
+
+    def show_card(key, card):
+        with card_slots[key].container():
+            st.markdown(
+                f"""
+                <div style='background-color:{get_criterion_color(key)["bg"]};color:white;padding:8px 12px;border-radius:4px;margin-bottom:8px;'>
+                    <strong style='font-size:16px;'>{key.replace("_", " ").title()} — {card.get("rating", "…")}</strong>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+            st.caption(card.get("feedback", ""))
+
+    show_essay([])
+
+    cards = {}
+    raw_annotations = []
+    state = initial_state
+
+    for mode, chunk in workflow.stream(initial_state, stream_mode=["custom", "values"]):
+
+        if mode == "values":
+            state = chunk
+            continue
+
+        key = chunk["criterion"]
+        if key not in card_slots:
+            card_slots[key] = st.empty()  # relevance check outside the selected subset
+
+        if "annotation" in chunk:
+            raw_annotations.append(annotation_dict(key, chunk["annotation"]))
+            show_essay(resolve_annotations(
+                essay_text,
+                raw_annotations,
+                sentence_index=state.get("sentences")
+            ))
+        else:
+            card = cards.setdefault(key, {})
+            card.update({k: v for k, v in chunk.items() if k != "criterion"})
+            show_card(key, card)
+
+    return state
+
+
+# =====================================================
+# BACKGROUND JOB (EVALUATION_SERVICE_URL)
+# =====================================================
+
+# The job id lives in the URL, so a reload or reconnect resumes polling
+job_id = st.query_params.get("job")
+
+if st.session_state.result_handle is None and job_id and config.EVALUATION_SERVICE_URL:
+
+    import service
+
+    job = service.job_status(job_id)
+
+    if job is not None and job["status"] == "done":
+        st.session_state.result_handle = result_cache.get_cache().put(service.job_result(job_id))
+        st.rerun()
+
+    if job is None or job["status"] == "failed":
+        st.error("Evaluation not found." if job is None else f"Evaluation failed: {job['error']}")
+        if st.button("Evaluate Another Essay", type="primary"):
+            st.query_params.clear()
+            st.rerun()
+        st.stop()
+
+    if job["status"] == "queued":
+        st.info(f"Essay queued for evaluation ({job['position']} ahead of it). You can safely reload this page.")
+    else:
+        st.info(f"Evaluating essay... ({time.time() - job['started']:.0f} s). You can safely reload this page.")
+
+    time.sleep(config.JOB_POLL_INTERVAL)
+    st.rerun()
+
+
 # =====================================================
 # INPUT VIEW
 # =====================================================
 
-if st.session_state.result is None:
+if st.session_state.result_handle is None:
 
     topic = st.text_input("Essay Topic")
 
@@ -104,6 +218,16 @@ if st.session_state.result is None:
         height=400
     )
 
+    with st.expander("Evaluation options"):
+        criteria_keys = st.multiselect(
+            "Criteria",
+            options=[criterion.key for criterion in CRITERIA],
+            default=[criterion.key for criterion in CRITERIA],
+            format_func=lambda key: next(c.name for c in CRITERIA if c.key == key),
+        )
+        skip_overall = st.checkbox("Skip overall evaluation (criterion feedback only)")
+        student = st.text_input("Student ID (optional)", help="Keeps this result in the student's history")
+
     btn_col1, btn_col2 = st.columns([3, 1])
     with btn_col1:
         evaluate_clicked = st.button("Evaluate Essay", use_container_width=True, type="primary")
@@ -117,19 +241,39 @@ if st.session_state.result is None:
             st.warning("Please provide both topic and essay.")
             st.stop()
 
-        with st.spinner("Evaluating essay..."):
+        if not criteria_keys:
+            st.warning("Please select at least one criterion.")
+            st.stop()
+
+        if config.EVALUATION_SERVICE_URL:
+            import service
+            st.query_params["job"] = service.submit_job(topic, essay, criteria_keys, overall=not skip_overall, student=student)
+            st.rerun()
+
+        with st.spinner("Loading evaluator..."):
+            from build_graph import get_workflow
+            workflow = get_workflow(criteria_keys, overall=not skip_overall)
+
+        with st.spinner("Evaluating essay..."), tracing.trace("evaluate", "app", criteria=len(criteria_keys)):
 
+            started = time.perf_counter()
             initial_state: EssayState = {
                 "topic": topic,
                 "essay": essay,
                 "overall": "",
             }
 
-            result = workflow.invoke(initial_state)
+            if config.STREAM_EVALUATIONS:
+                result = run_streaming_evaluation(workflow, initial_state, [c.key for c in CRITERIA if c.key in criteria_keys])
+            else:
+                result = workflow.invoke(initial_state)
 
-        st.session_state.result = result
-        st.session_state.topic = topic
-        st.session_state.essay = essay
+        score_ranks.record(result)
+        if config.RESULTS_STORE_PATH:
+            import results_store
+            results_store.record(result, student, wall_s=time.perf_counter() - started)
+
+        st.session_state.result_handle = result_cache.get_cache().put(result)
 
         st.rerun()
 
@@ -140,66 +284,109 @@ if st.session_state.result is None:
 
 else:
 
-    result = st.session_state.result
+    result = result_cache.get_cache().get(st.session_state.result_handle)
+
+    if result is None:
+        st.session_state.result_handle = None
+        st.warning("This result has expired. Please evaluate the essay again.")
+        if st.button("Evaluate Another Essay", type="primary", key="expired"):
+            st.query_params.clear()
+            st.rerun()
+        st.stop()
 
     # -------------------------------------------------
     # ESSAY TITLE
     # -------------------------------------------------
-    st.markdown(f"### {st.session_state.topic}")
+    st.markdown(f"### {result['topic']}")
     
     # -------------------------------------------------
     # FINAL REPORT
     # -------------------------------------------------
     st.subheader("🧠 Final Examiner Report")
     
-    # Display score in a circular visual
-    score = result.get("score", 0)
+    # Display score in a circular visual (absent when the overall evaluation was skipped)
+    score = result.get("score")
+    ranks = score_ranks.ranks(result)
     
-    # Determine color based on score
-    if score >= 90:
-        color = "#28a745"  # Green
-    elif score >= 80:
-        color = "#17a2b8"  # Cyan
-    elif score >= 70:
-        color = "#ffc107"  # Yellow
-    elif score >= 60:
-        color = "#fd7e14"  # Orange
-    else:
-        color = "#dc3545"  # Red
+    if score is not None:
+
+        # Determine color based on score
+        if score >= 90:
+            color = "#28a745"  # Green
+        elif score >= 80:
+            color = "#17a2b8"  # Cyan
+        elif score >= 70:
+            color = "#ffc107"  # Yellow
+        elif score >= 60:
+            color = "#fd7e14"  # Orange
+        else:
+            color = "#dc3545"  # Red
     
-    # Create circular score display
-    circle_html = f"""
-    <div style='display: flex; justify-content: center; align-items: center; margin: 20px 0;'>
-        <div style='
-            width: 150px;
-            height: 150px;
-            border-radius: 50%;
-            background: conic-gradient({color} 0deg {score * 3.6}deg, #e9ecef {score * 3.6}deg 360deg);
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-        '>
+        # Create circular score display
+        circle_html = f"""
+        <div style='display: flex; justify-content: center; align-items: center; margin: 20px 0;'>
             <div style='
-                width: 140px;
-                height: 140px;
+                width: 150px;
+                height: 150px;
                 border-radius: 50%;
-                background: white;
+                background: conic-gradient({color} 0deg {score * 3.6}deg, #e9ecef {score * 3.6}deg 360deg);
                 display: flex;
                 justify-content: center;
                 align-items: center;
-                flex-direction: column;
+                box-shadow: 0 4px 12px rgba(0,0,0,0.15);
             '>
-                <div style='font-size: 48px; font-weight: 700; color: {color};'>{score}</div>
-                <div style='font-size: 12px; color: #666;'>out of 100</div>
+                <div style='
+                    width: 140px;
+                    height: 140px;
+                    border-radius: 50%;
+                    background: white;
+                    display: flex;
+                    justify-content: center;
+                    align-items: center;
+                    flex-direction: column;
+                '>
+                    <div style='font-size: 48px; font-weight: 700; color: {color};'>{score}</div>
+                    <div style='font-size: 12px; color: #666;'>out of 100</div>
+                </div>
             </div>
         </div>
-    </div>
-    """
-    
-    st.markdown(circle_html, unsafe_allow_html=True)
+        """
+
+        st.markdown(circle_html, unsafe_allow_html=True)
+
+        score_rank = ranks.get("score") and ranks["score"].best()
+        if score_rank:
+            scope, percentile, count = score_rank
+            st.markdown(
+                f"<div style='text-align:center;color:#666;margin-top:-8px;'>Higher than {percentile:.0f}% of "
+                f"{count} essays {'on this topic' if scope == 'topic' else 'across all topics'}</div>",
+                unsafe_allow_html=True,
+            )
     
-    st.info(result["overall"])
+    relevance = result.get("relevance") or {}
+    if relevance.get("off_topic") and not relevance.get("confirmed") and result.get("evaluations"):
+        st.warning("This essay may not address the given topic closely. Check the Relevance & Thematic Focus feedback.")
+
+    selected_criteria = result.get("criteria") or []
+    if 0 < len(selected_criteria) < len(CRITERIA) or result.get("skip_overall"):
+        st.caption(
+            f"Evaluated {len(selected_criteria)} of {len(CRITERIA)} criteria"
+            + (", overall evaluation skipped" if result.get("skip_overall") else "")
+        )
+
+    # Fast mode scored the essay locally and skipped only the prose report
+    fast_mode = result.get("score") is not None and "overall_evaluation" not in (result.get("usage") or {})
+
+    if result["overall"]:
+        st.info(result["overall"])
+    elif result.get("evaluations") and fast_mode and not result.get("skip_overall"):
+        # Write the report only when asked for.
+        if st.button("Write examiner report", key="write_report"):
+            with st.spinner("Writing examiner report..."), tracing.trace("examiner_report", "app"):
+                from nodes import generate_final_assessment
+                result["overall"] = generate_final_assessment(result)
+                result_cache.get_cache().put(result, st.session_state.result_handle)
+            st.rerun()
 
     st.divider()
 
@@ -213,24 +400,20 @@ else:
     # LEFT — ESSAY WITH ANNOTATIONS
     # -------------------------------------------------
 
-    with essay_col:
+    with essay_col, tracing.trace("render_result", "app"):
 
         st.subheader("Your Essay")
 
-        essay_text = st.session_state.essay
+        essay_text = result["essay"]
 
         # Collect annotations from all evaluations
         raw_annotations = []
         for criterion_key, evaluation in result["evaluations"].items():
             if hasattr(evaluation, "annotations") and evaluation.annotations:
                 for ann in evaluation.annotations:
-                    raw_annotations.append({
-                        "quote": ann.quote,
-                        "type": criterion_key,
-                        "severity": ann.severity,
-                        "message": ann.issue,
-                        "suggestions": [ann.suggestion]
-                    })
+                    raw_annotations.append(annotation_dict(criterion_key, ann))
+
+        sentence_index = result.get("sentences")
 
         # Resolve two ways:
         # - non-overlapping (default, safe for combined view)
@@ -240,13 +423,15 @@ else:
         resolved_nonoverlap = resolve_annotations(
             essay_text,
             raw_annotations,
-            allow_overlaps=False
+            allow_overlaps=False,
+            sentence_index=sentence_index
         )
 
         resolved_all = resolve_annotations(
             essay_text,
             raw_annotations,
-            allow_overlaps=True
+            allow_overlaps=True,
+            sentence_index=sentence_index
         )
 
         # If a criterion is selected, render only that criterion's annotations
@@ -256,7 +441,8 @@ else:
             resolved_selected = resolve_annotations(
                 essay_text,
                 filtered_raw,
-                allow_overlaps=True
+                allow_overlaps=True,
+                sentence_index=sentence_index
             )
 
             st.caption(f"Viewing annotations for: {selected} — {len(resolved_selected)} / {len(filtered_raw)} resolved")
@@ -322,6 +508,11 @@ else:
             )
             st.caption(feedback)
 
+            rating_rank = ranks.get(f"rating_{key}") and ranks[f"rating_{key}"].best()
+            if rating_rank:
+                scope, percentile, count = rating_rank
+                st.caption(f"Rated higher than {percentile:.0f}% of {count} essays {'on this topic' if scope == 'topic' else 'overall'}")
+
             # Button to view annotations for this criterion (per-criterion view)
             if st.button("View annotations", key=f"view_{key}"):
                 st.session_state.selected_criterion = key
@@ -331,14 +522,31 @@ else:
 
         st.markdown("### ✅ Overall Strengths")
 
-        for s in result["strengths"]:
+        for s in result.get("strengths", []):
             st.write(f"- {s}")
 
         st.markdown("### ⚠️ Overall Weaknesses")
 
-        for w in result["weaknesses"]:
+        for w in result.get("weaknesses", []):
             st.write(f"- {w}")
 
+    usage = result.get("usage")
+    if usage:
+        with st.expander("Model usage"):
+            st.dataframe(
+                [{"node": node, **u} for node, u in usage.items()],
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption(f"Total cost: ${sum(u['cost_usd'] for u in usage.values()):.4f}")
+            plan = result.get("plan") or {}
+            if plan.get("predicted") and plan.get("actual"):
+                st.caption(
+                    f"Plan: {plan['mode']} — predicted {plan['predicted']['input_tokens'] + plan['predicted']['output_tokens']} tokens "
+                    f"(${plan['predicted']['cost_usd']:.4f}), actual {plan['actual']['input_tokens'] + plan['actual']['output_tokens']} tokens "
+                    f"(${plan['actual']['cost_usd']:.4f})"
+                )
+
     st.divider()
 
     btn_col1, btn_col2 = st.columns([3, 1])
@@ -350,8 +558,8 @@ else:
 
     if reset_clicked:
 
-        st.session_state.result = None
-        st.session_state.topic = ""
-        st.session_state.essay = ""
+        result_cache.get_cache().discard(st.session_state.result_handle)
+        st.session_state.result_handle = None
+        st.query_params.clear()
 
         st.rerun()
@@ -0,0 +1,140 @@
+"""Grade a corpus on several nodes at once through the shared job queue.
+
+    python -m batch submit corpus.jsonl --batch mains-2024     # once, from any node
+    python -m batch submit corpus/ --shard 0/4 --batch mains-2024  # one index range of a corpus directory
+    python -m batch work --workers 8 --until-done mains-2024    # on every grading node
+    python -m batch status mains-2024 --watch 30                # progress, throughput, ETA
+    python -m batch export mains-2024 results.jsonl             # one line per essay
+
+Each corpus line is a JSON object with "topic", "essay" and optionally "id",
+"tenant", "criteria" and "overall"; without "id" the line number is used.
+A corpus directory from `python -m corpus_store build` is read lazily.
+Submitting the same corpus again only queues the items that are missing.
+
+All nodes must reach the same JOBS_DB_PATH on a filesystem with working
+locks (a local disk or a shared volume that supports POSIX locking; not
+every network filesystem does). Leases are compared against each node's
+clock, so keep node clocks in sync to well under JOB_STALE_AFTER. Set
+JOB_MAX_RUNNING to the number of calls the shared API rate limit sustains:
+throughput then scales with the number of workers up to that budget.
+"""
+
+import argparse
+import json
+import signal
+import threading
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from corpus_store import parse_shard, read_items
+from jobs import JobStore, WorkerPool
+from service import validate_request
+import config
+
+
+def read_corpus(path: str, tenant: str | None = None, shard: tuple[int, int] | None = None):
+    """(item id, job request) for each corpus item; requests run at batch priority."""
+
+    for item in read_items(path, shard):
+        request = validate_request({**item, "tenant": item.get("tenant") or tenant, "priority": "batch"})
+        yield item["id"], request
+
+
+def submit(store: JobStore, corpus: str, batch: str, tenant: str | None = None, shard: tuple[int, int] | None = None):
+    added = store.submit_batch(batch, read_corpus(corpus, tenant, shard))
+    print(f"Queued {added} new essays in batch {batch} ({sum(store.counts(batch).values())} in total)")
+
+
+def work(store: JobStore, workers: int, until_done: str | None = None):
+
+    pool = WorkerPool(store, workers).start()
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    print(f"{workers} batch workers ({pool.prefix}*) on {store.path}")
+
+    try:
+        while not stopped.wait(config.JOB_POLL_INTERVAL):
+            if until_done and not _remaining(store.counts(until_done)):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+def _remaining(counts: dict[str, int]) -> int:
+    return counts.get("queued", 0) + counts.get("running", 0)
+
+
+def status(store: JobStore, batch: str, watch: float = 0):
+
+    while True:
+        p = store.progress(batch)
+        counts = p["counts"]
+        eta = f"{p['eta_s'] // 60}m{p['eta_s'] % 60:02d}s" if p["eta_s"] is not None else "-"
+        nodes = ", ".join(f"{node} {n}" for node, n in sorted(p["running_by_node"].items())) or "-"
+        print(
+            f"{batch}: {counts.get('done', 0)}/{p['total']} done, {counts.get('failed', 0)} failed, "
+            f"{counts.get('running', 0)} running, {counts.get('queued', 0)} queued, {p['retried']} retried | "
+            f"{p['per_minute']:.1f}/min, ETA {eta} | running on: {nodes}"
+        )
+        if not watch or not _remaining(counts):
+            return
+        time.sleep(watch)
+
+
+def export(store: JobStore, batch: str, out: str):
+
+    written = 0
+    with open(out, "w", encoding="utf-8") as f:
+        for item, job_status, result, error in store.batch_results(batch):
+            line = {"id": item, "status": job_status}
+            if result is not None:
+                line["result"] = json.loads(result)
+            if error:
+                line["error"] = error
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+            written += 1
+    print(f"Wrote {written} results of batch {batch} to {out}")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="Queue a corpus under a batch name")
+    submit_parser.add_argument("corpus", help="JSONL file with topic/essay objects, or a corpus directory")
+    submit_parser.add_argument("--shard", type=parse_shard, metavar="K/N", help="Only the K-th (0-based) of N index ranges")
+    submit_parser.add_argument("--batch", required=True)
+    submit_parser.add_argument("--tenant", help="Tenant for items without one")
+
+    work_parser = commands.add_parser("work", help="Run workers on this node")
+    work_parser.add_argument("--workers", type=int, default=config.JOB_WORKERS)
+    work_parser.add_argument("--until-done", metavar="BATCH", help="Exit once this batch has nothing left to run")
+
+    status_parser = commands.add_parser("status", help="Progress of a batch")
+    status_parser.add_argument("batch")
+    status_parser.add_argument("--watch", type=float, default=0, metavar="SECONDS", help="Repeat until the batch is finished")
+
+    export_parser = commands.add_parser("export", help="Write a batch's results as JSONL")
+    export_parser.add_argument("batch")
+    export_parser.add_argument("out")
+
+    args = parser.parse_args()
+    store = JobStore()
+
+    if args.command == "submit":
+        submit(store, args.corpus, args.batch, args.tenant, args.shard)
+    elif args.command == "work":
+        work(store, args.workers, args.until_done)
+    elif args.command == "status":
+        status(store, args.batch, args.watch)
+    else:
+        export(store, args.batch, args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Output tokens and latency per criterion: full schema vs compact wire schema.
+
+Usage:
+    python -m benchmarks.compact_schema --topic "..." --essay essay.txt [--runs 3]
+
+Needs OPENAI_API_KEY. Besides the live numbers, each full-schema response is
+re-encoded in the compact schema and both are counted with tiktoken, which
+isolates the saving from run-to-run variation in what the model writes.
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from dotenv import load_dotenv
+load_dotenv()
+
+import tiktoken
+
+from criteria_registry import CRITERIA
+from models import get_chat_model
+from nodes import evaluator_prompt, metadata_node, COMPACT_OUTPUT_NOTE
+from schemas import EvaluationSchema, CompactEvaluationSchema
+
+
+def _timed_call(schema, prompt):
+    runnable = get_chat_model().with_structured_output(schema, include_raw=True)
+    started = time.perf_counter()
+    out = runnable.invoke(prompt)
+    elapsed = time.perf_counter() - started
+    usage = out["raw"].usage_metadata or {}
+    return out["parsed"], usage.get("output_tokens", 0), elapsed
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--topic", required=True)
+    parser.add_argument("--essay", required=True, help="Path to a UTF-8 essay file")
+    parser.add_argument("--runs", type=int, default=1)
+    args = parser.parse_args()
+
+    with open(args.essay, encoding="utf-8") as f:
+        essay = f.read()
+
+    state = {"topic": args.topic, "essay": essay}
+    state.update(metadata_node(state))
+    if "metadata" not in state:
+        raise SystemExit(state["overall"])
+
+    enc = tiktoken.encoding_for_model(get_chat_model().model_name)
+
+    print(f"{'criterion':<22} {'full tok':>9} {'cmp tok':>8} {'full s':>7} {'cmp s':>7} {'re-enc':>12}")
+    print("-" * 70)
+
+    totals = {"full_tok": 0, "cmp_tok": 0, "full_s": 0.0, "cmp_s": 0.0}
+
+    for criterion in CRITERIA:
+
+        prompt = evaluator_prompt(criterion, state)
+        full_tok, cmp_tok, full_s, cmp_s, reenc = [], [], [], [], []
+
+        for _ in range(args.runs):
+
+            parsed, tokens, elapsed = _timed_call(EvaluationSchema, prompt)
+            full_tok.append(tokens)
+            full_s.append(elapsed)
+
+            compact = CompactEvaluationSchema.compress(parsed)
+            sizes = len(enc.encode(parsed.model_dump_json())), len(enc.encode(compact.model_dump_json()))
+            if compact.expand() != parsed:
+                # The token comparison below is meaningless if the compact form loses content
+                raise SystemExit(
+                    f"{criterion.key}: compact schema does not round-trip the response "
+                    f"(full {sizes[0]} tokens, compact {sizes[1]} tokens)"
+                )
+            reenc.append(sizes)
+
+            _, tokens, elapsed = _timed_call(CompactEvaluationSchema, prompt + COMPACT_OUTPUT_NOTE)
+            cmp_tok.append(tokens)
+            cmp_s.append(elapsed)
+
+        row = {
+            "full_tok": statistics.mean(full_tok),
+            "cmp_tok": statistics.mean(cmp_tok),
+            "full_s": statistics.mean(full_s),
+            "cmp_s": statistics.mean(cmp_s),
+        }
+        for k in totals:
+            totals[k] += row[k]
+
+        reenc_full = sum(a for a, _ in reenc)
+        reenc_cmp = sum(b for _, b in reenc)
+
+        print(
+            f"{criterion.key:<22} {row['full_tok']:>9.0f} {row['cmp_tok']:>8.0f} "
+            f"{row['full_s']:>7.2f} {row['cmp_s']:>7.2f} "
+            f"{reenc_full:>5}->{reenc_cmp:<5}"
+        )
+
+    print("-" * 70)
+    print(
+        f"{'total':<22} {totals['full_tok']:>9.0f} {totals['cmp_tok']:>8.0f} "
+        f"{totals['full_s']:>7.2f} {totals['cmp_s']:>7.2f}"
+    )
+    print(json.dumps(totals))
+
+
+if __name__ == "__main__":
+    main()
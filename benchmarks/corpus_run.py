@@ -0,0 +1,137 @@
+"""Run a corpus of essays through `workflow` and report wall time.
+
+Usage:
+    LLM_CASSETTE=record python -m benchmarks.corpus_run corpus.jsonl
+    LLM_CASSETTE=replay LLM_CASSETTE_LATENCY=zero python -m benchmarks.corpus_run corpus.jsonl
+
+Each corpus line is a JSON object with "topic", "essay" and optionally
+"tenant"; essays run at batch priority (see scheduler.py). A corpus
+directory (`python -m corpus_store build corpus.jsonl corpus/`) is read
+lazily through mmap instead, and `--shard k/n` runs one index range of it. Recording once
+and replaying afterwards gives deterministic, offline re-runs for comparing
+pipeline changes; a replay miss means the prompt for that call changed.
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from build_graph import workflow
+from corpus_store import CorpusStore, is_corpus, parse_shard, read_items
+from scoring import severity_counts
+import circuit_breaker
+import http_pool
+import repair
+import scheduler
+import tracing
+
+
+def summarize(result: dict) -> dict:
+    return {
+        "score": result.get("score"),
+        "ratings": {k: e.rating for k, e in result.get("evaluations", {}).items()},
+        "annotations": sum(len(e.annotations) for e in result.get("evaluations", {}).values()),
+        "severities": {k: severity_counts(e) for k, e in result.get("evaluations", {}).items()},
+        "overall": result.get("overall"),
+        "usage": result.get("usage", {}),
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="JSONL file with topic/essay objects, or a corpus directory")
+    parser.add_argument("--shard", type=parse_shard, metavar="K/N", help="Only the K-th (0-based) of N index ranges")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--out", help="Write one summary per essay to this JSONL file")
+    args = parser.parse_args()
+
+    if is_corpus(args.corpus):
+        store = CorpusStore(args.corpus)
+        store = store.shard(*args.shard) if args.shard else store
+        # Indices, not essays: each essay is read from the mapping when its run starts
+        items, load = range(len(store)), store.__getitem__
+    else:
+        items, load = list(read_items(args.corpus, args.shard)), None
+
+    def run(item):
+        if load:
+            entry = load(item)
+            item = {"topic": entry.topic, "essay": entry.essay, "tenant": entry.tenant}
+        started = time.perf_counter()
+        state = {"topic": item["topic"], "essay": item["essay"], "overall": "", "priority": "batch"}
+        if item.get("tenant"):
+            state["tenant"] = item["tenant"]
+        with tracing.trace("evaluate", "corpus", tenant=item.get("tenant")):
+            result = workflow.invoke(state)
+        return summarize(result), time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        outcomes = list(pool.map(run, items))
+    elapsed = time.perf_counter() - started
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for summary, _ in outcomes:
+                f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+
+    per_node = {}
+    for summary, _ in outcomes:
+        for node, u in summary["usage"].items():
+            agg = per_node.setdefault(node, {
+                "model": u["model"], "calls": 0, "latency_s": 0.0, "cost_usd": 0.0, "escalated": 0, "saved_usd": 0.0,
+            })
+            agg["calls"] += 1
+            agg["latency_s"] += u["latency_s"]
+            agg["cost_usd"] += u["cost_usd"]
+            cascade = u.get("cascade")
+            if cascade:
+                agg["escalated"] += cascade["escalated"]
+                agg["saved_usd"] += cascade["saved_usd"]
+
+    if per_node:
+        print(f"{'node':<22} {'model':<14} {'mean s':>7} {'mean $':>9} {'escal.':>7} {'saved $':>9}")
+        for node, agg in per_node.items():
+            print(
+                f"{node:<22} {agg['model']:<14} {agg['latency_s'] / agg['calls']:>7.2f} "
+                f"{agg['cost_usd'] / agg['calls']:>9.5f} {agg['escalated'] / agg['calls']:>7.0%} {agg['saved_usd']:>9.4f}"
+            )
+        print()
+
+    latencies = sorted(t for _, t in outcomes)
+    print(f"Essays        : {len(items)}")
+    print(f"Wall time     : {elapsed:.2f}s")
+    if latencies:
+        print(f"Per essay     : mean {sum(latencies) / len(latencies):.2f}s, max {latencies[-1]:.2f}s")
+
+    counts = repair.stats()
+    if counts.get("calls"):
+        print(
+            f"Repairs       : {counts.get('repaired', 0)}/{counts['calls']} fixed locally, "
+            f"{counts.get('retried', 0)} re-requested, {counts.get('failed', 0)} failed"
+        )
+
+    for tenant, s in scheduler.stats().items():
+        print(
+            f"Queue {tenant[:8]:<8}: {s['granted']} calls, wait mean {s['wait_mean_s']:.2f}s, "
+            f"p95 {s['wait_p95_s']:.2f}s, max {s['wait_max_s']:.2f}s"
+        )
+
+    for t in circuit_breaker.transitions():
+        print(f"Circuit {t['circuit']}: {t['from']} -> {t['to']} ({t['reason']})")
+
+    pool = http_pool.stats()
+    if pool["requests"]:
+        print(
+            f"HTTP pool     : {pool['requests']} requests, {pool['reuse_rate']:.0%} on reused connections "
+            f"({pool['new_connections']} opened), peak {pool['peak_in_flight']}/{pool['max_connections']} in flight"
+        )
+
+
+if __name__ == "__main__":
+    main()
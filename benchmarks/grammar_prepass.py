@@ -0,0 +1,52 @@
+"""Throughput and findings of the local grammar pre-pass on one core.
+
+Usage:
+    python -m benchmarks.grammar_prepass corpus.jsonl [--repeat 20]
+
+Each corpus line is a JSON object with an "essay" (as for corpus_run); a
+corpus directory from `python -m corpus_store build` works too.
+No API calls are made.
+"""
+
+import argparse
+import time
+from collections import Counter
+
+from corpus_store import read_items
+from grammar_rules import check_essay
+from utils import build_sentence_index
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", help="JSONL file with essay objects, or a corpus directory")
+    parser.add_argument("--repeat", type=int, default=20, help="Passes over the corpus")
+    args = parser.parse_args()
+
+    essays = [item["essay"] for item in read_items(args.corpus)]
+
+    indexes = [build_sentence_index(e) for e in essays]
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for essay, index in zip(essays, indexes):
+            check_essay(essay, index)
+    elapsed = time.perf_counter() - started
+
+    kinds = Counter()
+    for essay, index in zip(essays, indexes):
+        kinds.update(a.issue.split(' "')[0] for a in check_essay(essay, index))
+
+    runs = len(essays) * args.repeat
+    words = sum(len(e.split()) for e in essays) / max(len(essays), 1)
+    print(f"Essays        : {len(essays)} x {args.repeat}, {words:,.0f} words on average")
+    print(f"Throughput    : {runs / elapsed:,.0f} essays/s ({elapsed / runs * 1e6:.0f} us per essay, "
+          f"{runs * words / elapsed / 1e6:.2f}M words/s)")
+    print(f"Findings      : {sum(kinds.values()) / max(len(essays), 1):.1f} per essay")
+    for kind, n in kinds.most_common():
+        print(f"  {kind:<34} {n}")
+
+
+if __name__ == "__main__":
+    main()
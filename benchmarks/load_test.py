@@ -0,0 +1,205 @@
+"""Concurrent-session load test of the evaluation path with a fake model.
+
+Usage:
+    python -m benchmarks.load_test [--levels 1,2,4,8,16,32,64] [--sessions-per-level 3]
+                                   [--median-latency 2.5] [--time-scale 0.05]
+
+Each simulated session does what one Streamlit script run does on
+"Evaluate Essay": `workflow.invoke`, then the resolve/render steps of the
+output view. Model calls are served by a fake with a log-normal latency
+distribution (median `--median-latency` seconds, multiplied by
+`--time-scale` so a full ramp finishes quickly). For every concurrency level
+the report shows end-to-end p50/p95/p99, throughput, peak thread count and
+RSS, and marks the saturation knee: the first level where adding sessions
+no longer buys at least 10% more throughput.
+"""
+
+import argparse
+import math
+import os
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+import psutil
+
+import nodes
+from build_graph import workflow
+from criteria_registry import CRITERIA
+from schemas import Annotation, EvaluationSchema, OverallEvaluationSchema
+from utils import annotation_dict, resolve_annotations, render_annotated_essay
+
+
+SAMPLE_PARAGRAPH = (
+    "Development is often measured in numbers, yet its real test lies in how it changes "
+    "the everyday lives of ordinary citizens. A road that connects a village to a market "
+    "matters less for its length than for the doctor it brings closer and the produce it "
+    "carries away. Policy makers who forget this tend to build monuments rather than "
+    "capabilities, and the gap between growth and welfare widens quietly."
+)
+
+
+def synthetic_essay(paragraphs: int = 14) -> str:
+    return "\n\n".join(SAMPLE_PARAGRAPH for _ in range(paragraphs))
+
+
+class FakeModel:
+    """Stands in for a structured-output runnable with realistic latency."""
+
+    def __init__(self, median_s: float, sigma: float, time_scale: float, seed: int = 0):
+        self.mu = math.log(median_s)
+        self.sigma = sigma
+        self.time_scale = time_scale
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        with self._lock:
+            delay = self._rng.lognormvariate(self.mu, self.sigma)
+        time.sleep(delay * self.time_scale)
+
+    def invoke(self, prompt: str, *args, **kwargs):
+        self._sleep()
+        if "SENIOR UPSC examiner" in prompt:
+            return OverallEvaluationSchema(
+                overall_strengths=["Clear framing"],
+                overall_weaknesses=["Thin evidence"],
+                final_assessment="Competent essay with uneven depth.",
+                essay_score=64,
+            )
+        words = SAMPLE_PARAGRAPH.split()
+        annotations = []
+        for i in range(6):
+            start = (i * 7) % (len(words) - 8)
+            annotations.append(Annotation(
+                quote=" ".join(words[start:start + 6]),
+                issue="Generic claim",
+                suggestion="Add a specific example.",
+                severity="warning" if i % 2 else "error",
+            ))
+        return EvaluationSchema(rating="Average", feedback="Adequate but generic.", annotations=annotations)
+
+
+def install_fake_model(fake: FakeModel):
+    nodes.get_structured_model = lambda profile, schema: fake
+    nodes.get_overall_model = lambda: fake
+    nodes.config.COMPACT_OUTPUT = False
+    nodes.config.SENTENCE_ANCHORS = False
+    nodes.config.STREAM_EVALUATIONS = False
+
+
+def run_session(topic: str, essay: str) -> float:
+
+    started = time.perf_counter()
+
+    result = workflow.invoke({"topic": topic, "essay": essay, "overall": ""})
+
+    raw_annotations = [
+        annotation_dict(key, ann)
+        for key, evaluation in result["evaluations"].items()
+        for ann in evaluation.annotations
+    ]
+    sentence_index = result.get("sentences")
+    render_annotated_essay(essay, resolve_annotations(essay, raw_annotations, False, sentence_index))
+    resolve_annotations(essay, raw_annotations, True, sentence_index)
+    for criterion in CRITERIA:
+        if criterion.key not in result["evaluations"]:
+            continue
+        selected = [a for a in raw_annotations if a["type"] == criterion.key]
+        render_annotated_essay(essay, resolve_annotations(essay, selected, True, sentence_index))
+
+    return time.perf_counter() - started
+
+
+def percentile(values, q):
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[idx]
+
+
+def run_level(concurrency: int, sessions: int, essay: str) -> dict:
+
+    process = psutil.Process()
+    peak = {"threads": threading.active_count(), "rss": process.memory_info().rss}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.02):
+            peak["threads"] = max(peak["threads"], threading.active_count())
+            peak["rss"] = max(peak["rss"], process.memory_info().rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(lambda _: run_session("Development and welfare", essay), range(sessions)))
+    wall = time.perf_counter() - started
+
+    done.set()
+    sampler.join()
+
+    return {
+        "concurrency": concurrency,
+        "sessions": sessions,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies),
+        "throughput": sessions / wall,
+        "threads": peak["threads"],
+        "rss_mb": peak["rss"] / 2**20,
+    }
+
+
+def find_knee(rows, min_gain: float = 1.10):
+    for prev, row in zip(rows, rows[1:]):
+        if row["throughput"] < prev["throughput"] * min_gain:
+            return prev["concurrency"]
+    return None
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="1,2,4,8,16,32,64")
+    parser.add_argument("--sessions-per-level", type=int, default=3,
+                        help="Sessions per level, as a multiple of the concurrency")
+    parser.add_argument("--median-latency", type=float, default=2.5, help="Median model call latency (s)")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Log-normal shape parameter")
+    parser.add_argument("--time-scale", type=float, default=0.05)
+    parser.add_argument("--paragraphs", type=int, default=14)
+    args = parser.parse_args()
+
+    install_fake_model(FakeModel(args.median_latency, args.sigma, args.time_scale))
+    essay = synthetic_essay(args.paragraphs)
+
+    levels = [int(x) for x in args.levels.split(",")]
+    rows = []
+
+    print(f"{'conc':>5} {'sess':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'ess/s':>7} {'threads':>8} {'rss MB':>8}")
+    print("-" * 62)
+
+    for level in levels:
+        row = run_level(level, level * args.sessions_per_level, essay)
+        rows.append(row)
+        print(
+            f"{row['concurrency']:>5} {row['sessions']:>5} {row['p50']:>7.2f} {row['p95']:>7.2f} "
+            f"{row['p99']:>7.2f} {row['throughput']:>7.2f} {row['threads']:>8} {row['rss_mb']:>8.1f}"
+        )
+
+    knee = find_knee(rows)
+    print("-" * 62)
+    if knee is None:
+        print("No saturation knee within the tested levels; extend --levels.")
+    else:
+        print(f"Saturation knee at ~{knee} concurrent sessions (next level adds <10% throughput).")
+    print(f"Model latency is scaled by x{args.time_scale}; graph and resolve/render CPU time is not.")
+
+
+if __name__ == "__main__":
+    main()
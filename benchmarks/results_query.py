@@ -0,0 +1,108 @@
+"""Aggregate query times of the results store over synthetic results.
+
+Usage:
+    python -m benchmarks.results_query [--results 1000000] [--path /tmp/results-bench]
+
+Fills a fresh store with random results spread over students, topics,
+tenants and 90 days (no API calls), compacts it, and times the dashboard
+queries: statistics per topic and per tenant, one institute's last month,
+and one student's history with a payload fetch.
+"""
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from criteria_registry import CRITERIA
+from results_store import ResultsStore
+
+
+def synthetic_entries(n: int, seed: int = 7):
+
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    for _ in range(n):
+        created = start + timedelta(seconds=rng.randrange(90 * 86400))
+        row = {
+            "id": f"{rng.getrandbits(128):032x}",
+            "student": f"student-{rng.randrange(n // 10 or 1)}",
+            "tenant": f"institute-{rng.randrange(40)}",
+            "topic": f"Topic {rng.randrange(200)}",
+            "date": created.date(),
+            "created": created,
+            "score": rng.randint(35, 92),
+            "criteria": len(CRITERIA),
+            "word_count": rng.randint(600, 1400),
+            "annotations": rng.randint(5, 40),
+            "wall_s": rng.uniform(8, 40),
+            "model_s": rng.uniform(20, 90),
+            "queue_s": rng.uniform(0, 3),
+            "cost_usd": rng.uniform(0.002, 0.02),
+        }
+        for c in CRITERIA:
+            row[f"rating_{c.key}"] = rng.randint(1, 4)
+            row[f"errors_{c.key}"] = rng.randint(0, 6)
+            row[f"warnings_{c.key}"] = rng.randint(0, 6)
+        yield row, json.dumps({"topic": row["topic"], "essay": "", "evaluations": {}, "score": row["score"]})
+
+
+def timed(label: str, fn, repeat: int = 5):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - started)
+    print(f"{label:<34} {min(times) * 1000:>9.1f} ms  ({sum(times) / len(times) * 1000:.1f} ms mean)")
+    return out
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=1_000_000)
+    parser.add_argument("--chunk", type=int, default=100_000, help="Results per append")
+    parser.add_argument("--path", help="Store directory (default: a temporary one, removed afterwards)")
+    args = parser.parse_args()
+
+    path = args.path or tempfile.mkdtemp(prefix="results-bench-")
+    store = ResultsStore(path)
+
+    try:
+        started = time.perf_counter()
+        chunk = []
+        for entry in synthetic_entries(args.results):
+            chunk.append(entry)
+            if len(chunk) == args.chunk:
+                store.append(chunk)
+                chunk = []
+        if chunk:
+            store.append(chunk)
+        store.flush()
+        print(f"Appended {args.results} results in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        merged = store.compact()
+        print(f"Compacted {merged} segments in {time.perf_counter() - started:.1f}s\n")
+
+        last_id = store.query(["id"], student="student-1")["id"][0].as_py()
+
+        timed("count + mean score (all)", lambda: store.query(["score"]).num_rows)
+        by_topic = timed("stats per topic (all)", lambda: store.aggregate("topic"))
+        timed("stats per tenant (all)", lambda: store.aggregate("tenant"))
+        timed("one tenant, last 30 days, per topic", lambda: store.aggregate("topic", tenant="institute-3", since="2026-03-02"))
+        history = timed("one student's history", lambda: store.history("student-1"))
+        timed("one payload", lambda: store.payload(last_id))
+
+        print(f"\n{by_topic.num_rows} topics, {len(history)} results for student-1")
+    finally:
+        if not args.path:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
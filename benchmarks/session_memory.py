@@ -0,0 +1,120 @@
+"""Server memory per Streamlit session holding a finished result.
+
+Usage:
+    python -m benchmarks.session_memory [--sessions 500] [--cap-mb 4]
+
+Builds one realistic result with the load-test fake model (on an essay of
+shuffled words, so it does not compress unrealistically well), then, in a fresh
+interpreter per mode, keeps `--sessions` copies of it the way sessions do:
+
+    dict     the full result dict with live models (each session its own copy)
+    packed   a handle per session into result_cache, under the default cap
+    capped   the same with a `--cap-mb` cache, spilling the rest to disk
+
+and reports RSS growth per session, packed size and pack/unpack time.
+"""
+
+import argparse
+import copy
+import gc
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "load-test")
+
+
+def build_result() -> dict:
+
+    from benchmarks.load_test import SAMPLE_PARAGRAPH, FakeModel, install_fake_model
+    from build_graph import workflow
+
+    rng = random.Random(0)
+    words = SAMPLE_PARAGRAPH.split()
+    essay = "\n\n".join(" ".join(rng.choice(words) for _ in range(70)) for _ in range(14))
+
+    install_fake_model(FakeModel(median_s=1.0, sigma=0.1, time_scale=0.0))
+    return workflow.invoke({"topic": "Development and welfare", "essay": essay, "overall": ""})
+
+
+def measure(mode: str, sessions: int, cap_mb: float) -> dict:
+
+    import psutil
+    import config
+    import result_cache
+
+    result = build_result()
+    process = psutil.Process()
+
+    config.RESULT_SPILL_DIR = tempfile.mkdtemp(prefix="session-memory-")
+    config.RESULT_CACHE_MB = cap_mb if mode == "capped" else config.RESULT_CACHE_MB
+    cache = result_cache.get_cache()
+
+    packed = result_cache.pack(result)
+    started = time.perf_counter()
+    for _ in range(100):
+        result_cache.unpack(packed)
+    unpack_ms = (time.perf_counter() - started) * 10
+    started = time.perf_counter()
+    for _ in range(100):
+        result_cache.pack(result)
+    pack_ms = (time.perf_counter() - started) * 10
+
+    gc.collect()
+    before = process.memory_info().rss
+
+    if mode == "dict":
+        held = [copy.deepcopy(result) for _ in range(sessions)]
+    else:
+        held = [cache.put(result) for _ in range(sessions)]
+
+    gc.collect()
+    after = process.memory_info().rss
+
+    # Every session reads its result back once, as its next rerun would
+    if mode != "dict":
+        assert all(cache.get(handle) is not None for handle in held)
+
+    return {
+        "mode": mode,
+        "kb_per_session": (after - before) / sessions / 1024,
+        "packed_kb": len(packed) / 1024,
+        "pack_ms": pack_ms,
+        "unpack_ms": unpack_ms,
+        "cache": cache.stats() if mode != "dict" else None,
+    }
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--cap-mb", type=float, default=4)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args.sessions, args.cap_mb)))
+        return
+
+    print(f"{'mode':<8} {'KB/session':>11} {'packed KB':>10} {'pack ms':>8} {'unpack ms':>10}  cache")
+    for mode in ("dict", "packed", "capped"):
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.session_memory", "--child", mode,
+             "--sessions", str(args.sessions), "--cap-mb", str(args.cap_mb)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        row = json.loads(out.strip().splitlines()[-1])
+        cache = row["cache"]
+        print(
+            f"{mode:<8} {row['kb_per_session']:>11.1f} {row['packed_kb']:>10.1f} {row['pack_ms']:>8.2f} {row['unpack_ms']:>10.2f}  "
+            + (f"{cache['entries']} in memory ({cache['bytes'] / 2**20:.1f} MB), {cache['spilled']} spilled" if cache else "-")
+        )
+
+
+if __name__ == "__main__":
+    main()
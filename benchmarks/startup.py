@@ -0,0 +1,84 @@
+"""Cold-start cost: module import times, warm-up steps and first-page latency.
+
+Usage:
+    python -m benchmarks.startup [--runs 3]
+
+Every measurement runs in a fresh interpreter so nothing is cached between
+them. "First page" renders app.py headlessly with Streamlit's AppTest and
+reports whether the LLM stack (langchain_openai) was already loaded when
+the input form was ready. No API calls are made.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules behind the input form, then the LLM stack in dependency order
+MODULES = ["config", "schemas", "utils", "criteria_registry", "models", "nodes", "planner", "build_graph"]
+
+_IMPORT = """
+import json, time
+started = time.perf_counter()
+import {module}
+print(json.dumps({{"s": time.perf_counter() - started}}))
+"""
+
+_WARM_UP = """
+import json, warmup
+print(json.dumps(warmup.warm_up()))
+"""
+
+_FIRST_PAGE = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+started = time.perf_counter()
+at = AppTest.from_file("app.py", default_timeout=120).run()
+page = time.perf_counter() - started
+loaded = "langchain_openai" in sys.modules
+import warmup
+warmup.wait()
+ready = time.perf_counter() - started
+print(json.dumps({"page": page, "ready": ready, "llm_loaded": loaded, "form": len(at.text_area) > 0}))
+"""
+
+
+def run_fresh(code: str) -> dict:
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "startup-benchmark")}
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement (median reported)")
+    args = parser.parse_args()
+
+    def median(code, key):
+        return statistics.median(run_fresh(code)[key] for _ in range(args.runs))
+
+    print("Import time (cumulative, fresh interpreter)")
+    for module in MODULES:
+        print(f"  {module:<18} {median(_IMPORT.format(module=module), 's') * 1000:7.0f} ms")
+
+    steps = [run_fresh(_WARM_UP) for _ in range(args.runs)]
+    print("\nWarm-up steps (warmup.warm_up)")
+    for name in steps[0]:
+        print(f"  {name:<18} {statistics.median(s[name] for s in steps) * 1000:7.0f} ms")
+
+    pages = [run_fresh(_FIRST_PAGE) for _ in range(args.runs)]
+    print("\nApp")
+    print(f"  first page         {statistics.median(p['page'] for p in pages) * 1000:7.0f} ms"
+          f"  (form rendered: {all(p['form'] for p in pages)}, LLM stack loaded: {any(p['llm_loaded'] for p in pages)})")
+    print(f"  evaluator ready    {statistics.median(p['ready'] for p in pages) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
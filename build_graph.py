@@ -1,9 +1,34 @@
-from langgraph.graph import StateGraph, START, END
+from functools import lru_cache
+
 from schemas import EssayState
-from criteria_registry import CRITERIA
-from nodes import metadata_node, introConclusion_extractor, build_evaluator, overall_evaluation
+from criteria_registry import CRITERIA, select_criteria
+from nodes import metadata_node, introConclusion_extractor, build_evaluator, fused_evaluator, overall_evaluation
+from planner import planner_node, planner_feedback
+from relevance_gate import relevance_gate_node, relevance_check, gated
+from topic_analysis import topic_analysis_node
+import config
+import tracing
 
 def checkValidEssay(state: EssayState):
+    from langgraph.graph import END
+
+    if not state["overall"]:
+        return "relevance_gate"
+    else:
+        return END
+
+
+def checkRelevance(state: EssayState):
+    from langgraph.graph import END
+
+    if not state["overall"]:
+        return "topic_analysis"
+    else:
+        return END
+
+
+def checkPlan(state: EssayState):
+    from langgraph.graph import END
 
     if not state["overall"]:
         return "intro_conclusion"
@@ -11,43 +36,143 @@ def checkValidEssay(state: EssayState):
         return END
 
 
-def build_evaluation_graph():
+def build_evaluation_graph(keys: tuple[str, ...] | None = None, overall: bool = True):
+    """Evaluation graph for the criteria in `keys` (all when None).
+
+    With `overall=False` the evaluators go straight to planner_feedback and
+    the result has no overall report, strengths, weaknesses or score.
+    """
+
+    # langgraph (and langchain_core under it) loads with the first graph, not at import
+    from langgraph.graph import StateGraph, START, END
+
+    criteria = select_criteria(keys)
+    evaluator_keys = [criterion.key for criterion in criteria]
+
+    def selectCriteria(state: EssayState):
+        return {"criteria": evaluator_keys, "skip_overall": not overall}
+
+    def routeEvaluators(state: EssayState):
+
+        if gated(state):
+            return ["relevance_check"]
+        elif state["plan"]["mode"] == "fused":
+            return ["fused_evaluation"]
+        else:
+            return evaluator_keys
+
+    def checkRelevanceConfirmed(state: EssayState):
+
+        if state["relevance"]["confirmed"]:
+            return "planner_feedback"
+        elif state["plan"]["mode"] == "fused":
+            return ["fused_evaluation"]
+        else:
+            return evaluator_keys
 
     graph = StateGraph(EssayState)
 
+    def add_node(name, fn):
+        # Each node runs as a span of the evaluation's trace (when it is sampled)
+        graph.add_node(name, tracing.traced(name, fn, cat="node"))
+
     # ----------------------- GRAPH NODES -----------------------
-    
+
+    # CRITERIA SUBSET AND OPTIONS FOR THIS GRAPH
+    add_node("select_criteria", selectCriteria)
+
     # PRE-EVALUATION NODES
-    graph.add_node("metadata", metadata_node)
-    graph.add_node("intro_conclusion", introConclusion_extractor)
+    add_node("metadata", metadata_node)
+    add_node("relevance_gate", relevance_gate_node)
+    add_node("topic_analysis", topic_analysis_node)
+    add_node("planner", planner_node)
+    add_node("intro_conclusion", introConclusion_extractor)
 
     # EVALUATION CRITERIA NODES
-    for criterion in CRITERIA:
-        graph.add_node(
+    for criterion in criteria:
+        add_node(
             criterion.key,
             build_evaluator(criterion)
         )
 
+    # CHEAP RELEVANCE-ONLY CALL FOR ESSAYS THE GATE FLAGGED
+    add_node("relevance_check", relevance_check)
+
+    # ALL CRITERIA IN ONE CALL (planner's "fused" mode)
+    add_node("fused_evaluation", fused_evaluator)
+
     # OVERALL EVALUATION NODE
-    graph.add_node("overall_evaluation", overall_evaluation)
+    if overall:
+        add_node("overall_evaluation", overall_evaluation)
+
+    # PREDICTED VS ACTUAL USAGE
+    add_node("planner_feedback", planner_feedback)
 
     # ----------------------- GRAPH EDGES -----------------------
 
-    # START > metadata > checkValidEssay ? intro_conclusion : END
-    graph.add_edge(START, "metadata")
+    # START > select_criteria > metadata > checkValidEssay ? relevance_gate : END
+    graph.add_edge(START, "select_criteria")
+    graph.add_edge("select_criteria", "metadata")
     graph.add_conditional_edges("metadata", checkValidEssay)
 
-    # intro_conclusion > evaluators
-    for criterion in CRITERIA:
-        graph.add_edge("intro_conclusion", criterion.key)
+    # relevance_gate > checkRelevance ? topic_analysis : END (off-topic, "stop" action)
+    graph.add_conditional_edges("relevance_gate", checkRelevance)
+
+    # topic_analysis > planner (the planner's estimates include the topic notes)
+    graph.add_edge("topic_analysis", "planner")
+
+    # planner > checkPlan ? intro_conclusion : END (over budget)
+    graph.add_conditional_edges("planner", checkPlan)
+
+    # intro_conclusion > evaluators (or the fused evaluator, or the relevance check)
+    graph.add_conditional_edges(
+        "intro_conclusion",
+        routeEvaluators,
+        evaluator_keys + ["fused_evaluation", "relevance_check"]
+    )
 
-    # evaluators > overall_evaluation
-    for criterion in CRITERIA:
-        graph.add_edge(criterion.key, "overall_evaluation")
+    # relevance_check > checkRelevanceConfirmed ? planner_feedback : evaluators
+    graph.add_conditional_edges(
+        "relevance_check",
+        checkRelevanceConfirmed,
+        evaluator_keys + ["fused_evaluation", "planner_feedback"]
+    )
 
-    # overall_evaluation > END
-    graph.add_edge("overall_evaluation", END)
+    # evaluators > overall_evaluation > planner_feedback (or straight to planner_feedback)
+    after_evaluators = "overall_evaluation" if overall else "planner_feedback"
+    for key in evaluator_keys + ["fused_evaluation"]:
+        graph.add_edge(key, after_evaluators)
+    if overall:
+        graph.add_edge("overall_evaluation", "planner_feedback")
+
+    # planner_feedback > END
+    graph.add_edge("planner_feedback", END)
 
     return graph.compile()
 
-workflow = build_evaluation_graph()
+
+@lru_cache(maxsize=config.GRAPH_CACHE_SIZE)
+def _compiled(keys: tuple[str, ...] | None, overall: bool):
+    return build_evaluation_graph(keys, overall)
+
+
+def get_workflow(criteria=None, overall: bool = True):
+    """Compiled graph for a criteria subset, cached by (subset, options).
+
+    `criteria` is any iterable of `CRITERIA` keys; order and duplicates do
+    not matter. None or the full set gives the default graph.
+    """
+
+    keys = tuple(c.key for c in select_criteria(None if criteria is None else set(criteria)))
+    if len(keys) == len(CRITERIA):
+        keys = None
+
+    return _compiled(keys, overall)
+
+
+def __getattr__(name):
+    # `from build_graph import workflow` compiles the default graph on first
+    # use rather than at import, so importing this module stays cheap
+    if name == "workflow":
+        return get_workflow()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
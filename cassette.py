@@ -0,0 +1,136 @@
+"""Record/replay layer for LLM calls.
+
+Wraps a structured-output runnable so each call is keyed by a hash of the
+model name, output schema and prompt. In "record" mode calls go to the real
+model and the response plus its latency are appended to a JSONL cassette.
+In "replay" mode responses come from the cassette, either after the
+recorded latency or immediately, so whole corpora can be re-run through
+`workflow` offline and deterministically.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from pydantic import BaseModel
+
+
+class CassetteMiss(KeyError):
+    """Replay mode found no recording for a request."""
+
+
+def schema_fingerprint(schema) -> str:
+    if isinstance(schema, type) and issubclass(schema, BaseModel):
+        schema = schema.model_json_schema()
+    return json.dumps(schema, sort_keys=True, separators=(",", ":"))
+
+
+def request_key(model_name: str, schema, prompt: str) -> str:
+    h = hashlib.sha256()
+    for part in (model_name, schema_fingerprint(schema), prompt):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+class Cassette:
+
+    def __init__(self, path: str, mode: str = "replay", latency: str = "recorded"):
+
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode!r}")
+        if latency not in ("recorded", "zero"):
+            raise ValueError(f"Unknown cassette latency: {latency!r}")
+
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._entries: dict[str, dict] = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["k"]] = entry  # last recording wins
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key: str) -> dict:
+        try:
+            return self._entries[key]
+        except KeyError:
+            raise CassetteMiss(f"No recording for request {key} in {self.path}") from None
+
+    def store(self, key: str, output, latency_s: float):
+
+        entry = {"k": key, "ms": round(latency_s * 1000, 1), "out": output}
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._entries[key] = entry
+
+    def wrap(self, runnable, schema, model_name: str) -> "CassetteModel":
+        return CassetteModel(self, runnable, schema, model_name)
+
+
+class CassetteModel:
+    """Drop-in for a structured-output runnable: supports `invoke` and `stream`."""
+
+    def __init__(self, cassette: Cassette, runnable, schema, model_name: str):
+        self.cassette = cassette
+        self.runnable = runnable
+        self.schema = schema
+        self.model_name = model_name
+
+    def _decode(self, output):
+        if isinstance(self.schema, type) and issubclass(self.schema, BaseModel):
+            return self.schema.model_validate(output)
+        return output
+
+    @staticmethod
+    def _encode(response):
+        if isinstance(response, BaseModel):
+            return response.model_dump(mode="json")
+        return response
+
+    def _replay(self, key: str):
+        entry = self.cassette.lookup(key)
+        if self.cassette.latency == "recorded":
+            time.sleep(entry["ms"] / 1000)
+        return self._decode(entry["out"])
+
+    def invoke(self, prompt: str, *args, **kwargs):
+
+        key = request_key(self.model_name, self.schema, prompt)
+
+        if self.cassette.mode == "replay":
+            return self._replay(key)
+
+        started = time.perf_counter()
+        response = self.runnable.invoke(prompt, *args, **kwargs)
+        self.cassette.store(key, self._encode(response), time.perf_counter() - started)
+
+        return response
+
+    def stream(self, prompt: str, *args, **kwargs):
+        """Pass chunks through while recording; replay yields the final output once."""
+
+        key = request_key(self.model_name, self.schema, prompt)
+
+        if self.cassette.mode == "replay":
+            yield self._replay(key)
+            return
+
+        started = time.perf_counter()
+        last = None
+        for last in self.runnable.stream(prompt, *args, **kwargs):
+            yield last
+        self.cassette.store(key, self._encode(last), time.perf_counter() - started)
@@ -0,0 +1,240 @@
+"""Circuit breaker around model endpoints, with a fallback profile.
+
+Every call to a primary endpoint is recorded in a rolling window
+(CIRCUIT_WINDOW_S). When, over at least CIRCUIT_MIN_CALLS calls, the share
+of failed calls reaches CIRCUIT_ERROR_RATE or the share of calls slower
+than CIRCUIT_SLOW_CALL_S reaches CIRCUIT_SLOW_RATE, the circuit opens: new
+calls go straight to FALLBACK_PROFILE (for example a locally hosted
+OpenAI-compatible server) instead of each waiting out its own timeout.
+
+After CIRCUIT_OPEN_S the circuit is half-open: the next call is a probe
+sent to the primary. A fast success closes the circuit; anything else
+opens it again. Transitions are logged and kept in `transitions()`.
+
+A call that fails on the primary is retried once on the fallback. Without
+a fallback profile an open circuit fails calls immediately. Calls served by
+the fallback carry its profile as "served_profile" in their callback
+metadata, so usage reports price them at the fallback's rates.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+import config
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """The primary endpoint is unavailable and there is no fallback."""
+
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, window_s: float | None = None, min_calls: int | None = None,
+                 error_rate: float | None = None, slow_rate: float | None = None,
+                 slow_call_s: float | None = None, open_s: float | None = None):
+
+        self.name = name
+        self.window_s = config.CIRCUIT_WINDOW_S if window_s is None else window_s
+        self.min_calls = config.CIRCUIT_MIN_CALLS if min_calls is None else min_calls
+        self.error_rate = config.CIRCUIT_ERROR_RATE if error_rate is None else error_rate
+        self.slow_rate = config.CIRCUIT_SLOW_RATE if slow_rate is None else slow_rate
+        self.slow_call_s = config.CIRCUIT_SLOW_CALL_S if slow_call_s is None else slow_call_s
+        self.open_s = config.CIRCUIT_OPEN_S if open_s is None else open_s
+
+        self.state = CLOSED
+        self._lock = threading.Lock()
+        # (finished at, failed, slow)
+        self._calls: deque[tuple[float, bool, bool]] = deque()
+        self._opened_at = 0.0
+        self._probing = False
+        self._fallbacks = 0
+
+    def _transition(self, state: str, reason: str):
+        # Caller holds the lock
+        logger.warning("Circuit %s: %s -> %s (%s)", self.name, self.state, state, reason)
+        _transitions.append({"circuit": self.name, "from": self.state, "to": state, "reason": reason, "at": time.time()})
+        self.state = state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+        if state == CLOSED:
+            self._calls.clear()
+
+    def allow(self) -> str | None:
+        """"primary" or "probe" if this call may use the primary endpoint, None if not."""
+
+        with self._lock:
+
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_s:
+                    self._fallbacks += 1
+                    return None
+                self._transition(HALF_OPEN, f"{self.open_s:.0f}s elapsed")
+
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    self._fallbacks += 1
+                    return None
+                self._probing = True
+                return "probe"
+
+            return "primary"
+
+    def record(self, ticket: str, ok: bool, latency_s: float):
+
+        slow = latency_s >= self.slow_call_s
+        now = time.monotonic()
+
+        with self._lock:
+
+            if ticket == "probe":
+                self._probing = False
+                if ok and not slow:
+                    self._transition(CLOSED, f"probe succeeded in {latency_s:.1f}s")
+                else:
+                    self._transition(OPEN, "probe failed" if not ok else f"probe took {latency_s:.1f}s")
+                return
+
+            self._calls.append((now, not ok, slow))
+            while self._calls and self._calls[0][0] < now - self.window_s:
+                self._calls.popleft()
+
+            if self.state != CLOSED or len(self._calls) < self.min_calls:
+                return
+
+            n = len(self._calls)
+            failed = sum(c[1] for c in self._calls) / n
+            slowed = sum(c[2] for c in self._calls) / n
+
+            if failed >= self.error_rate:
+                self._transition(OPEN, f"{failed:.0%} of {n} calls failed")
+            elif slowed >= self.slow_rate:
+                self._transition(OPEN, f"{slowed:.0%} of {n} calls slower than {self.slow_call_s:.0f}s")
+
+    def stats(self) -> dict:
+        with self._lock:
+            n = len(self._calls)
+            return {
+                "state": self.state,
+                "calls_in_window": n,
+                "error_rate": round(sum(c[1] for c in self._calls) / n, 3) if n else 0.0,
+                "slow_rate": round(sum(c[2] for c in self._calls) / n, 3) if n else 0.0,
+                "fallback_calls": self._fallbacks,
+            }
+
+    def count_fallback(self):
+        with self._lock:
+            self._fallbacks += 1
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+_transitions: deque[dict] = deque(maxlen=200)
+
+
+def breaker(endpoint: str) -> CircuitBreaker:
+    """The process-wide breaker for one endpoint (base URL)."""
+    with _breakers_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def stats() -> dict[str, dict]:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: b.stats() for name, b in breakers.items()}
+
+
+def transitions() -> list[dict]:
+    """Recent state transitions of every breaker, oldest first."""
+    return list(_transitions)
+
+
+class GuardedModel:
+    """Runnable that sends calls to `primary` while its circuit is closed, otherwise to `fallback`.
+
+    Supports `invoke` and `stream`, like the runnables it wraps.
+    """
+
+    def __init__(self, primary, fallback, circuit: CircuitBreaker, fallback_profile: str | None = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.circuit = circuit
+        self.fallback_profile = fallback_profile
+
+    def _fallback(self, error: Exception | None = None):
+        if self.fallback is None:
+            raise CircuitOpenError(f"Circuit {self.circuit.name} is open and no FALLBACK_PROFILE is set") from error
+        return self.fallback
+
+    def _tagged(self, kwargs: dict) -> dict:
+        # Callback metadata reaches the chat model run, where usage handlers read it
+        run_config = dict(kwargs.get("config") or {})
+        run_config["metadata"] = {**(run_config.get("metadata") or {}), "served_profile": self.fallback_profile}
+        return {**kwargs, "config": run_config}
+
+    def invoke(self, prompt, *args, **kwargs):
+
+        ticket = self.circuit.allow()
+        if ticket is None:
+            return self._fallback().invoke(prompt, *args, **self._tagged(kwargs))
+
+        started = time.monotonic()
+        try:
+            result = self.primary.invoke(prompt, *args, **kwargs)
+        except Exception as e:
+            if not _upstream_failure(e):
+                self.circuit.record(ticket, True, time.monotonic() - started)
+                raise
+            self.circuit.record(ticket, False, time.monotonic() - started)
+            runnable = self._fallback(e)
+            self.circuit.count_fallback()
+            return runnable.invoke(prompt, *args, **self._tagged(kwargs))
+
+        self.circuit.record(ticket, True, time.monotonic() - started)
+        return result
+
+    def stream(self, prompt, *args, **kwargs):
+
+        ticket = self.circuit.allow()
+        if ticket is None:
+            yield from self._fallback().stream(prompt, *args, **self._tagged(kwargs))
+            return
+
+        # Time to first chunk decides "slow"; a failure before it falls back
+        started = time.monotonic()
+        chunks = self.primary.stream(prompt, *args, **kwargs)
+        try:
+            first = next(chunks)
+        except StopIteration:
+            self.circuit.record(ticket, True, time.monotonic() - started)
+            return
+        except Exception as e:
+            if not _upstream_failure(e):
+                self.circuit.record(ticket, True, time.monotonic() - started)
+                raise
+            self.circuit.record(ticket, False, time.monotonic() - started)
+            runnable = self._fallback(e)
+            self.circuit.count_fallback()
+            yield from runnable.stream(prompt, *args, **self._tagged(kwargs))
+            return
+
+        self.circuit.record(ticket, True, time.monotonic() - started)
+        yield first
+        yield from chunks
+
+
+def _upstream_failure(error: Exception) -> bool:
+    """Errors that say the endpoint is unhealthy (not that the request was bad)."""
+
+    import openai
+
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError, openai.RateLimitError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
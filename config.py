@@ -0,0 +1,175 @@
+import os
+import tempfile
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Ask evaluators for the compact wire schema (short keys, enum codes) and
+# expand it back into EvaluationSchema locally.
+COMPACT_OUTPUT = env_flag("COMPACT_OUTPUT")
+
+# Show the model a sentence-numbered essay and let annotations point at a
+# sentence id plus a short anchor phrase instead of a verbatim quote.
+SENTENCE_ANCHORS = env_flag("SENTENCE_ANCHORS")
+
+# Stream evaluator tokens and emit rating, feedback and each annotation as
+# LangGraph custom stream events as soon as they are complete.
+STREAM_EVALUATIONS = env_flag("STREAM_EVALUATIONS")
+
+# Record/replay LLM calls: "record", "replay" or empty (off).
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "").strip().lower()
+LLM_CASSETTE_PATH = os.getenv("LLM_CASSETTE_PATH", "cassettes/llm.jsonl")
+# Replay with the "recorded" latency or "zero" latency.
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "recorded").strip().lower()
+
+# Compute essay_score, strengths and weaknesses locally from the criterion
+# ratings instead of a final LLM call; the prose report is generated on demand.
+FAST_MODE = env_flag("FAST_MODE")
+# Optional JSON overrides for the local scoring weights (see scoring.py).
+SCORING_WEIGHTS_PATH = os.getenv("SCORING_WEIGHTS_PATH", "")
+
+# Optional JSON file adding or overriding model profiles
+# ({"name": {"model": ..., "temperature": ..., "max_tokens": ..., ...}}).
+MODEL_PROFILES_PATH = os.getenv("MODEL_PROFILES_PATH", "")
+
+# Cheap-first cascade: run each criterion on its first cascade profile and
+# escalate only when the result looks unreliable.
+CASCADE = env_flag("CASCADE")
+# Escalate when fewer than this share of annotations resolve in the essay
+CASCADE_MIN_RESOLUTION = float(os.getenv("CASCADE_MIN_RESOLUTION", "0.7"))
+# Escalate an Excellent/Good rating that comes with this many error annotations
+CASCADE_MAX_ERRORS_FOR_GOOD = int(os.getenv("CASCADE_MAX_ERRORS_FOR_GOOD", "3"))
+
+# Execution mode chosen by the planner: "auto" picks the richest of
+# full / context-scoped / fused that fits the budgets; or force one mode.
+PLAN_MODE = os.getenv("PLAN_MODE", "auto").strip().lower()
+# Output budget per criterion of the fused call; its max_tokens is this
+# times the number of criteria (never below the profile's own cap).
+FUSED_OUTPUT_TOKENS_PER_CRITERION = int(os.getenv("FUSED_OUTPUT_TOKENS_PER_CRITERION", "600"))
+# Per-essay limits on predicted usage; 0 means unlimited.
+ESSAY_TOKEN_BUDGET = int(os.getenv("ESSAY_TOKEN_BUDGET", "0"))
+ESSAY_COST_BUDGET = float(os.getenv("ESSAY_COST_BUDGET", "0"))
+# JSON {tenant: daily USD budget}; spend is tracked in the SQLite database
+# TENANT_LEDGER_PATH, shared by all app and worker processes.
+TENANT_BUDGETS_PATH = os.getenv("TENANT_BUDGETS_PATH", "")
+TENANT_LEDGER_PATH = os.getenv("TENANT_LEDGER_PATH", "tenant_ledger.db")
+# JSONL log of predicted vs actual tokens per call; also calibrates estimates.
+PLANNER_LOG_PATH = os.getenv("PLANNER_LOG_PATH", "")
+
+# Structured outputs are parsed and repaired locally (see repair.py); only
+# output that cannot be repaired is re-requested, at most this many times.
+REPAIR_MAX_RETRIES = int(os.getenv("REPAIR_MAX_RETRIES", "1"))
+
+# Run the local rule-based grammar checker (grammar_rules.py) before the
+# model calls; its findings are merged into the grammar evaluation and the
+# grammar prompt is told not to repeat them.
+GRAMMAR_PREPASS = env_flag("GRAMMAR_PREPASS")
+
+# Local off-topic gate after the metadata step (see relevance_gate.py):
+# "off", "flag" (mark only), "stop" (reject before the fan-out) or
+# "relevance" (confirm with one cheap relevance-only call first).
+RELEVANCE_GATE = os.getenv("RELEVANCE_GATE", "off").strip().lower()
+# Calibrated gate parameters (python -m relevance_gate labeled.jsonl)
+RELEVANCE_GATE_PATH = os.getenv("RELEVANCE_GATE_PATH", "")
+RELEVANCE_GATE_PROFILE = os.getenv("RELEVANCE_GATE_PROFILE", "fast")
+
+# Analyse each topic once (dimensions, expected arguments, examples) and add
+# the notes to every evaluator prompt for that topic (see topic_analysis.py).
+TOPIC_ANALYSIS = env_flag("TOPIC_ANALYSIS")
+TOPIC_ANALYSIS_PROFILE = os.getenv("TOPIC_ANALYSIS_PROFILE", "strong")
+TOPIC_CACHE_PATH = os.getenv("TOPIC_CACHE_PATH", "topic_cache.jsonl")
+# Cosine similarity at which a rephrased topic reuses a cached analysis
+TOPIC_MATCH_THRESHOLD = float(os.getenv("TOPIC_MATCH_THRESHOLD", "0.8"))
+
+# Compiled evaluation graphs kept for criteria subsets (build_graph.get_workflow)
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "16"))
+
+# Load the LLM stack and compile the default graph in a background thread
+# when the app starts, so the first evaluation does not pay for it
+# (see warmup.py). The input form renders either way.
+WARMUP_ON_START = env_flag("WARMUP_ON_START", True)
+
+# Shared HTTP connection pool for all model calls (see http_pool.py).
+# One evaluation opens up to ten calls at once; size the pool for the
+# number of concurrent evaluations per process.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "32"))
+# Seconds an idle connection is kept open for reuse
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "120"))
+# Requires the optional h2 package (pip install "httpx[http2]")
+HTTP2 = env_flag("HTTP2")
+# Seconds: read/write timeout per request, connect, and waiting for a free pool slot
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "30"))
+
+# Background evaluation service (service.py, jobs.py). When set, the app
+# submits jobs to this URL and polls for the result instead of evaluating
+# in its own script run, e.g. http://127.0.0.1:8765
+EVALUATION_SERVICE_URL = os.getenv("EVALUATION_SERVICE_URL", "").rstrip("/")
+# SQLite job queue shared by the service and every worker process
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Seconds between queue polls of an idle worker, and between UI status polls
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# A running job whose worker has not sent a heartbeat for this many seconds
+# is requeued, at most JOB_MAX_ATTEMPTS times in total
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Most jobs running at once across every worker sharing JOBS_DB_PATH (all
+# nodes of a batch run); keeps the cluster within a shared rate limit. 0: no cap
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", "0"))
+
+# Weighted fair scheduling of model calls across tenants (scheduler.py):
+# at most this many calls run at once per process; 0 disables scheduling.
+LLM_SLOTS = int(os.getenv("LLM_SLOTS", "0"))
+# JSON {tenant: {"weight": w, "max_concurrency": n}}; "*" for everyone else
+TENANT_WEIGHTS_PATH = os.getenv("TENANT_WEIGHTS_PATH", "")
+
+# Circuit breaker per model endpoint (circuit_breaker.py): when the rolling
+# error rate or slow-call rate of an endpoint crosses its threshold, new
+# calls go to FALLBACK_PROFILE (a profile in MODEL_PROFILES, e.g. a local
+# OpenAI-compatible server) until a probe call succeeds again.
+CIRCUIT_BREAKER = env_flag("CIRCUIT_BREAKER")
+FALLBACK_PROFILE = os.getenv("FALLBACK_PROFILE", "")
+CIRCUIT_WINDOW_S = float(os.getenv("CIRCUIT_WINDOW_S", "60"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+CIRCUIT_ERROR_RATE = float(os.getenv("CIRCUIT_ERROR_RATE", "0.5"))
+CIRCUIT_SLOW_RATE = float(os.getenv("CIRCUIT_SLOW_RATE", "0.5"))
+CIRCUIT_SLOW_CALL_S = float(os.getenv("CIRCUIT_SLOW_CALL_S", "30"))
+# Seconds an open circuit waits before probing the primary again
+CIRCUIT_OPEN_S = float(os.getenv("CIRCUIT_OPEN_S", "30"))
+
+# Append-only results store for student history and statistics
+# (results_store.py); empty: graded results are not kept
+RESULTS_STORE_PATH = os.getenv("RESULTS_STORE_PATH", "")
+# A date's segments of one level under RESULTS_COMPACT_ROWS rows are merged
+# (in a background thread) once there are this many of them
+RESULTS_COMPACT_SEGMENTS = int(os.getenv("RESULTS_COMPACT_SEGMENTS", "32"))
+RESULTS_COMPACT_ROWS = int(os.getenv("RESULTS_COMPACT_ROWS", "200000"))
+
+# Per-topic and global score/rating histograms for percentile ranks next to
+# the score (score_ranks.py), e.g. score_sketches.db; empty: no ranks
+SCORE_SKETCH_PATH = os.getenv("SCORE_SKETCH_PATH", "")
+# Essays a topic needs before its own rank is shown (else the global rank)
+SCORE_RANK_MIN_COUNT = int(os.getenv("SCORE_RANK_MIN_COUNT", "20"))
+
+# Finished results shared by all sessions of the app process, packed
+# (result_cache.py). Past RESULT_CACHE_MB the least recently used results
+# are spilled to RESULT_SPILL_DIR, where they are kept this many seconds
+RESULT_CACHE_MB = float(os.getenv("RESULT_CACHE_MB", "128"))
+RESULT_SPILL_DIR = os.getenv("RESULT_SPILL_DIR", os.path.join(tempfile.gettempdir(), "essay-results"))
+RESULT_SPILL_MAX_AGE_S = float(os.getenv("RESULT_SPILL_MAX_AGE_S", "86400"))
+
+# Trace spans of graph nodes, model calls, scheduler waits and result
+# rendering (tracing.py). Share of evaluations and renders traced (0: off);
+# traces go to TRACE_PATH ("{pid}": process id) in Chrome trace event
+# format, rotated to ".1" past TRACE_MAX_MB
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+TRACE_PATH = os.getenv("TRACE_PATH", "traces/trace-{pid}.json")
+TRACE_MAX_MB = float(os.getenv("TRACE_MAX_MB", "100"))
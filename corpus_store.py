@@ -0,0 +1,251 @@
+"""Compact, memory-mapped essay corpus.
+
+A corpus directory holds:
+
+    essays.bin   every item's id and essay, UTF-8, concatenated
+    index.bin    header + one fixed-size record per essay: offset, id and
+                 essay lengths, topic id, tenant id, BLAKE2b-128 of the essay
+    meta.json    format version, count, and the topic and tenant tables
+
+Both binary files are read through mmap, so opening a corpus of tens of
+thousands of essays costs a few page mappings; an essay is decoded only when
+it is accessed. `shard(k, n)` is a view of the k-th of n contiguous index
+ranges, for spreading one corpus across batch workers or nodes.
+
+    python -m corpus_store build corpus.jsonl corpus/
+    python -m corpus_store info corpus/
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+
+FORMAT_VERSION = 1
+MAGIC = b"ESSAYIDX"
+
+# magic, version, count
+HEADER = struct.Struct("<8sIQ")
+# offset, id length, essay length, topic id, tenant id (0: none), essay hash
+RECORD = struct.Struct("<QIIII16s")
+
+
+@dataclass(frozen=True, slots=True)
+class CorpusItem:
+    id: str
+    topic: str
+    essay: str
+    tenant: str | None
+    hash: str
+
+
+def essay_hash(essay: str) -> bytes:
+    return hashlib.blake2b(essay.encode("utf-8"), digest_size=16).digest()
+
+
+# ----------------------- WRITING -----------------------
+
+def write_corpus(path: str, items) -> int:
+    """Write `items` (dicts with "topic", "essay" and optionally "id", "tenant") as a corpus at `path`.
+
+    Items are streamed to disk, so the input can be larger than memory.
+    Returns the number of essays written.
+    """
+
+    os.makedirs(path, exist_ok=True)
+    topics: dict[str, int] = {}
+    tenants: dict[str, int] = {"": 0}
+    count = offset = 0
+
+    with open(os.path.join(path, "essays.bin"), "wb") as blob, open(os.path.join(path, "index.bin"), "wb") as index:
+
+        index.write(HEADER.pack(MAGIC, FORMAT_VERSION, 0))
+
+        for item in items:
+            item_id = str(item.get("id") or "").encode("utf-8")
+            essay = item["essay"].encode("utf-8")
+            topic = topics.setdefault(item["topic"], len(topics))
+            tenant = tenants.setdefault(item.get("tenant") or "", len(tenants))
+
+            blob.write(item_id)
+            blob.write(essay)
+            index.write(RECORD.pack(offset, len(item_id), len(essay), topic, tenant,
+                                    hashlib.blake2b(essay, digest_size=16).digest()))
+            offset += len(item_id) + len(essay)
+            count += 1
+
+        index.seek(0)
+        index.write(HEADER.pack(MAGIC, FORMAT_VERSION, count))
+
+    with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": FORMAT_VERSION,
+            "count": count,
+            "topics": list(topics),
+            "tenants": list(tenants),
+        }, f, ensure_ascii=False)
+
+    return count
+
+
+# ----------------------- READING -----------------------
+
+def _map(path: str) -> mmap.mmap | bytes:
+    with open(path, "rb") as f:
+        # mmap cannot map an empty file
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+
+class CorpusStore:
+    """Read-only view of a corpus directory (or of an index range of it, see `shard`)."""
+
+    def __init__(self, path: str):
+
+        self.path = path
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format version {meta['version']} in {path}")
+
+        self.topics: list[str] = meta["topics"]
+        self.tenants: list[str] = meta["tenants"]
+        self._blob = _map(os.path.join(path, "essays.bin"))
+        self._index = _map(os.path.join(path, "index.bin"))
+
+        magic, _, count = HEADER.unpack_from(self._index, 0)
+        if magic != MAGIC or count != meta["count"]:
+            raise ValueError(f"Corrupt corpus index in {path}")
+
+        self.start, self.stop = 0, count
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def _position(self, i: int) -> int:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        return self.start + i
+
+    def _record(self, position: int) -> tuple[int, int, int, int, int, bytes]:
+        return RECORD.unpack_from(self._index, HEADER.size + position * RECORD.size)
+
+    def record(self, i: int) -> tuple[int, int, int, int, int, bytes]:
+        """Raw index record of item `i`, without touching the essay text."""
+        return self._record(self._position(i))
+
+    def essay(self, i: int) -> str:
+        offset, id_len, essay_len, *_ = self.record(i)
+        return self._blob[offset + id_len:offset + id_len + essay_len].decode("utf-8")
+
+    def __getitem__(self, i: int) -> CorpusItem:
+
+        position = self._position(i)
+        offset, id_len, essay_len, topic, tenant, digest = self._record(position)
+        item_id = self._blob[offset:offset + id_len].decode("utf-8") if id_len else str(position + 1)
+
+        return CorpusItem(
+            id=item_id,
+            topic=self.topics[topic],
+            essay=self._blob[offset + id_len:offset + id_len + essay_len].decode("utf-8"),
+            tenant=self.tenants[tenant] or None,
+            hash=digest.hex(),
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def shard(self, k: int, n: int) -> "CorpusStore":
+        """The k-th (0-based) of `n` contiguous, near-equal index ranges."""
+
+        if not 0 <= k < n:
+            raise ValueError(f"Shard {k} out of range for {n} shards")
+
+        view = copy.copy(self)
+        size = len(self)
+        view.start = self.start + size * k // n
+        view.stop = self.start + size * (k + 1) // n
+        return view
+
+    def verify(self) -> list[int]:
+        """Positions whose essay no longer matches its stored hash."""
+        return [i for i in range(len(self)) if essay_hash(self.essay(i)) != self.record(i)[5]]
+
+    def close(self):
+        for m in (self._blob, self._index):
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_corpus(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "index.bin"))
+
+
+def parse_shard(text: str) -> tuple[int, int]:
+    """"k/n" (0-based k) as a tuple, for --shard options."""
+    k, _, n = text.partition("/")
+    return int(k), int(n)
+
+
+def read_items(path: str, shard: tuple[int, int] | None = None):
+    """Corpus items as dicts from either a corpus directory or a JSONL file, one at a time."""
+
+    if is_corpus(path):
+        with CorpusStore(path) as store:
+            for item in store.shard(*shard) if shard else store:
+                yield {"id": item.id, "topic": item.topic, "essay": item.essay, "tenant": item.tenant}
+        return
+
+    if shard:
+        raise ValueError("Sharding needs a corpus directory (python -m corpus_store build)")
+
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                item = json.loads(line)
+                yield {**item, "id": str(item.get("id") or number)}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = commands.add_parser("build", help="Convert a JSONL corpus")
+    build_parser.add_argument("source", help="JSONL file with topic/essay objects")
+    build_parser.add_argument("path", help="Corpus directory to write")
+
+    info_parser = commands.add_parser("info", help="Size and tables of a corpus")
+    info_parser.add_argument("path")
+    info_parser.add_argument("--verify", action="store_true", help="Check every essay against its hash")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        count = write_corpus(args.path, read_items(args.source))
+        print(f"Wrote {count} essays to {args.path}")
+        return
+
+    with CorpusStore(args.path) as store:
+        size = os.path.getsize(os.path.join(args.path, "essays.bin"))
+        print(f"{len(store)} essays, {len(store.topics)} topics, {len(store.tenants) - 1} tenants, {size / 1e6:.1f} MB text")
+        if args.verify:
+            bad = store.verify()
+            print(f"{len(bad)} essays do not match their hash" + (f": {bad[:10]}" if bad else ""))
+
+
+if __name__ == "__main__":
+    main()
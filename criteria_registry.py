@@ -6,6 +6,16 @@ class Criterion:
     name: str
     instruction: str
     rubric: str
+    # Relative weight in the fast-mode local score (see scoring.py)
+    weight: float = 1.0
+    # Key into models.MODEL_PROFILES
+    model_profile: str = "default"
+    # Profiles tried in order in cascade mode, escalating on unreliable results
+    cascade_profiles: tuple[str, ...] = ("fast", "default")
+    # Part of the essay sent in context-scoped plans: "essay", "outline" or "conclusion"
+    context: str = "essay"
+    # Receives the local rule findings (see grammar_rules.py) when GRAMMAR_PREPASS is on
+    rule_prepass: bool = False
 
 
 CRITERIA: tuple[Criterion, ...] = (
@@ -39,7 +49,8 @@ Good: Demonstrates solid analysis with reasonably developed arguments, though so
 Average: Contains basic explanation but relies heavily on surface-level observations.
 
 Poor: Largely descriptive or generic with minimal reasoning.
-"""
+""",
+        weight=1.5
     ),
 
     Criterion(
@@ -71,7 +82,8 @@ Good: Clearly relevant with only minor digressions.
 Average: Broadly related but generic enough to fit multiple topics.
 
 Poor: Weak alignment or substantially off-topic.
-"""
+""",
+        weight=1.5
     ),
 
     Criterion(
@@ -101,7 +113,9 @@ Good: Recognizable structure with mostly logical flow, though transitions may oc
 Average: Basic structure exists but progression feels uneven or mechanical.
 
 Poor: Disjointed, poorly ordered, or missing major structural elements.
-"""
+""",
+        model_profile="fast",
+        context="outline"
     ),
 
     Criterion(
@@ -238,7 +252,8 @@ Good: Mostly coherent with minor reasoning gaps.
 Average: Several logical jumps or partially supported claims.
 
 Poor: Contradictory or unstable reasoning.
-"""
+""",
+        weight=1.2
     ),
 
     Criterion(
@@ -267,7 +282,8 @@ Good: Solid ending that reinforces the essay's message.
 Average: Functional but predictable summary-style ending.
 
 Poor: Abrupt, underdeveloped, or missing conclusion.
-"""
+""",
+        context="conclusion"
     ),
 
     Criterion(
@@ -312,7 +328,27 @@ Good: Generally clear with minor grammatical or stylistic errors that do not hin
 Average: Noticeable language issues or awkward phrasing that occasionally disrupt flow.
 
 Poor: Frequent grammatical errors that disrupt readability or understandability.
-"""
+""",
+        weight=0.8,
+        model_profile="fast",
+        rule_prepass=True
     ),
 
-)
\ No newline at end of file
+)
+
+CRITERIA_BY_KEY: dict[str, Criterion] = {c.key: c for c in CRITERIA}
+
+
+def select_criteria(keys=None) -> tuple[Criterion, ...]:
+    """Criteria for `keys` in registry order; every criterion when `keys` is None."""
+
+    if keys is None:
+        return CRITERIA
+
+    unknown = set(keys) - CRITERIA_BY_KEY.keys()
+    if unknown:
+        raise ValueError(f"Unknown criteria: {', '.join(sorted(unknown))}")
+    if not keys:
+        raise ValueError("Select at least one criterion")
+
+    return tuple(c for c in CRITERIA if c.key in keys)
@@ -0,0 +1,274 @@
+"""Rule-based grammar pre-pass.
+
+Finds mechanical issues locally before the `grammar` evaluator runs:
+doubled words, spacing around punctuation, common misspellings, a/an
+slips, subject-verb slips and redundant particles ("discuss about").
+Findings are `Annotation` objects; the grammar prompt lists them as
+already detected so the model spends its output on what rules miss.
+
+Word rules are dictionaries indexed by word or word pair, intersected
+with the essay's token set, so an essay is scanned once and offsets are
+only searched for actual hits.
+"""
+
+import re
+from bisect import bisect_right
+
+from schemas import Annotation
+
+# ----------------------- BUNDLED DICTIONARY -----------------------
+
+# Frequent misspellings in UPSC answer scripts -> correct spelling
+MISSPELLINGS = {
+    "accomodate": "accommodate", "accomodation": "accommodation", "acheive": "achieve",
+    "acheived": "achieved", "acheivement": "achievement", "accross": "across",
+    "adress": "address", "agressive": "aggressive", "alot": "a lot", "amoung": "among",
+    "apparant": "apparent", "arguement": "argument", "athiest": "atheist",
+    "basicly": "basically", "begining": "beginning", "beleive": "believe",
+    "belive": "believe", "buisness": "business", "calender": "calendar",
+    "catagory": "category", "cheif": "chief", "collegue": "colleague",
+    "comittee": "committee", "commitee": "committee", "committment": "commitment",
+    "completly": "completely", "concious": "conscious", "consensous": "consensus",
+    "constitition": "constitution", "critisism": "criticism", "curriculam": "curriculum",
+    "definately": "definitely", "definitly": "definitely", "democarcy": "democracy",
+    "dependant": "dependent", "develope": "develop", "developement": "development",
+    "devlopment": "development", "dilemna": "dilemma", "disapoint": "disappoint",
+    "discrimation": "discrimination", "economicaly": "economically", "effeciency": "efficiency",
+    "efficent": "efficient", "embarass": "embarrass", "enviroment": "environment",
+    "enviornment": "environment", "enviromental": "environmental", "equiptment": "equipment",
+    "exagerate": "exaggerate", "excercise": "exercise", "existance": "existence",
+    "experiance": "experience", "explaination": "explanation", "familar": "familiar",
+    "finaly": "finally", "foriegn": "foreign", "fourty": "forty", "freind": "friend",
+    "fullfil": "fulfil", "goverment": "government", "govermental": "governmental",
+    "goverance": "governance", "gaurantee": "guarantee", "guarentee": "guarantee",
+    "harrass": "harass", "heirarchy": "hierarchy", "happend": "happened",
+    "immediatly": "immediately", "independance": "independence", "independant": "independent",
+    "infrastucture": "infrastructure", "intrest": "interest", "irrelevent": "irrelevant",
+    "knowlege": "knowledge", "liason": "liaison", "libary": "library", "lisence": "licence",
+    "maintainance": "maintenance", "maintenence": "maintenance", "millenium": "millennium",
+    "mischievious": "mischievous", "neccessary": "necessary", "necesary": "necessary",
+    "noticable": "noticeable", "occassion": "occasion", "occured": "occurred",
+    "occurence": "occurrence", "oppurtunity": "opportunity", "oppertunity": "opportunity",
+    "parliment": "parliament", "paralell": "parallel", "peice": "piece",
+    "percieve": "perceive", "persue": "pursue", "posession": "possession",
+    "potrayed": "portrayed", "powerfull": "powerful", "prefered": "preferred",
+    "priviledge": "privilege", "probaly": "probably", "proffesional": "professional",
+    "propoganda": "propaganda", "publically": "publicly", "realy": "really",
+    "recieve": "receive", "recieved": "received", "reccomend": "recommend",
+    "recomend": "recommend", "refered": "referred", "relevent": "relevant",
+    "religous": "religious", "remeber": "remember", "resistence": "resistance",
+    "responsibilty": "responsibility", "responsiblity": "responsibility",
+    "rythm": "rhythm", "secratary": "secretary", "seperate": "separate",
+    "seperately": "separately", "sieze": "seize", "similiar": "similar",
+    "sincerly": "sincerely", "soveriegn": "sovereign", "succesful": "successful",
+    "successfull": "successful", "sucess": "success", "suprise": "surprise",
+    "sustainabilty": "sustainability", "tecnology": "technology", "technolgy": "technology",
+    "tendancy": "tendency", "therefor": "therefore", "threshhold": "threshold",
+    "tommorow": "tomorrow", "tounge": "tongue", "truely": "truly", "unforseen": "unforeseen",
+    "untill": "until", "usefull": "useful", "vaccum": "vacuum", "vechicle": "vehicle",
+    "wich": "which", "wether": "whether", "wierd": "weird", "wellfare": "welfare",
+}
+
+# Word pairs, indexed by the first word: second word -> (issue, suggestion)
+PAIR_RULES: dict[str, dict[str, tuple[str, str]]] = {}
+
+
+def _pair(firsts, seconds: dict[str, str], issue: str):
+    for first in firsts:
+        for second, fix in seconds.items():
+            PAIR_RULES.setdefault(first, {})[second] = (issue, f'Use "{first} {fix}"')
+
+
+_pair(("he", "she", "it"), {"have": "has", "do": "does", "don't": "doesn't", "are": "is"}, "Subject-verb agreement")
+_pair(("they", "we", "you"), {"has": "have", "does": "do", "doesn't": "don't", "is": "are", "was": "were"}, "Subject-verb agreement")
+_pair(("i",), {"has": "have", "is": "am", "does": "do"}, "Subject-verb agreement")
+
+for first, second, fix in (
+    ("discuss", "about", "discuss"),
+    ("discussed", "about", "discussed"),
+    ("emphasise", "on", "emphasise"),
+    ("emphasize", "on", "emphasize"),
+    ("cope", "up", "cope"),
+    ("revert", "back", "revert"),
+    ("return", "back", "return"),
+    ("comprises", "of", "comprises"),
+):
+    PAIR_RULES.setdefault(first, {})[second] = ("Redundant particle", f'Use "{fix}" alone')
+
+# "an" before these consonant-letter words is correct (silent h)
+SILENT_H = {"hour", "hours", "honest", "honestly", "honour", "honor", "honourable", "honorable", "heir"}
+
+# After these words a bare verb is correct: "did he have", "let it do"
+AUXILIARIES = {
+    "do", "does", "did", "can", "could", "will", "would", "shall", "should",
+    "may", "might", "must", "to", "let", "lets", "make", "makes", "made",
+    "help", "helps", "see", "saw", "watch", "hear", "heard",
+}
+
+# "a" before these vowel-letter words is correct ("a one-time", "a European")
+VOWEL_LETTER_CONSONANT_SOUND = {"one", "once", "eu", "european", "euro", "eucalyptus"}
+
+
+# ----------------------- CHECKER -----------------------
+
+# Stripped from token edges before dictionary lookups
+_EDGE = ".,;:!?()[]{}\"'“”‘’"
+
+_SPACE_BEFORE_RE = re.compile(r"[A-Za-z]+ +[,;:.!?](?!\d)")
+_NO_SPACE_AFTER_RE = re.compile(r"[A-Za-z]+[,;][A-Za-z]+")
+_MULTI_SPACE_RE = re.compile(r"[A-Za-z]+ {2,}[A-Za-z]+")
+
+# "had had" and "that that" are grammatical
+DOUBLING_ALLOWED = {"had", "that"}
+
+_PAIR_KEYS = {(first, second) for first, seconds in PAIR_RULES.items() for second in seconds}
+
+
+def _lower(text: str) -> str:
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    # A few characters lowercase to two; keep offsets aligned with `text`
+    return "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == "'"
+
+
+def _occurrences(lower: str, phrase: str):
+    """(start, end) of every whole-word occurrence of `phrase`."""
+
+    i = lower.find(phrase)
+    while i != -1:
+        end = i + len(phrase)
+        if (i == 0 or not _is_word_char(lower[i - 1])) and (end == len(lower) or not _is_word_char(lower[end])):
+            yield i, end
+        i = lower.find(phrase, i + 1)
+
+
+def _match_case(fix: str, word: str) -> str:
+    return fix[0].upper() + fix[1:] if word[0].isupper() else fix
+
+
+_NUMERAL_RE = re.compile(r"\d[\d,]*")
+
+
+def _numeral_vowel_sound(word: str) -> bool:
+    """Whether a numeral is read with a leading vowel sound: 8, 11, 18, 80-89, 800, 11,000, 18th..."""
+
+    digits = _NUMERAL_RE.match(word).group().rstrip(",")
+    # The leading group is what is read first ("18,000", "18000": eighteen thousand)
+    lead = digits.split(",")[0] if "," in digits else digits[:len(digits) % 3 or 3]
+    return digits[0] == "8" or lead in ("11", "18")
+
+
+def _article_issue(article: str, word: str) -> tuple[str, str] | None:
+
+    lower = word.lower()
+
+    if word.isupper() and len(word) > 1:
+        return None  # acronyms follow pronunciation ("an MP", "a UN body")
+
+    if lower[0].isdigit():
+        vowel = _numeral_vowel_sound(lower)
+        if article == "a" and vowel:
+            return "Article before a vowel sound", f'Use "an {word}"'
+        if article == "an" and not vowel:
+            return "Article before a consonant sound", f'Use "a {word}"'
+        return None
+
+    vowel = lower[0] in "aeiou"
+    # "a one-time", "an hour-long": the first part of a compound decides
+    head = lower.split("-")[0]
+
+    if article == "a" and vowel and lower[0] != "u" and head not in VOWEL_LETTER_CONSONANT_SOUND:
+        return "Article before a vowel sound", f'Use "an {word}"'
+    if article == "an" and not vowel and head not in SILENT_H:
+        return "Article before a consonant sound", f'Use "a {word}"'
+
+    return None
+
+
+_WORD_RE = re.compile(r"[a-z']+")
+
+
+def _after_auxiliary(lower: str, start: int) -> bool:
+    before = _WORD_RE.findall(lower, max(0, start - 24), start)
+    return bool(before) and before[-1] in AUXILIARIES
+
+
+def check_text(text: str) -> list[tuple[int, int, str, str, str]]:
+    """(start, end, issue, suggestion, severity) for every rule match, in text order.
+
+    Candidates come from set operations on the token stream; text offsets
+    are only looked up for the (rare) hits.
+    """
+
+    lower = _lower(text)
+    tokens = lower.split()
+    words = [t.strip(_EDGE) for t in tokens]
+    # A raw first token ending in punctuation never matches a rule key,
+    # so pairs never span a sentence or clause break
+    pairs = set(zip(tokens, words[1:]))
+
+    found = []
+
+    for word in MISSPELLINGS.keys() & set(words):
+        fix = MISSPELLINGS[word]
+        for start, end in _occurrences(lower, word):
+            found.append((start, end, f'Misspelling of "{fix}"', f'Write "{_match_case(fix, text[start:end])}"', "error"))
+
+    for first, second in _PAIR_KEYS & pairs:
+        issue, suggestion = PAIR_RULES[first][second]
+        for start, end in _occurrences(lower, f"{first} {second}"):
+            if issue == "Subject-verb agreement" and _after_auxiliary(lower, start):
+                continue
+            found.append((start, end, issue, suggestion, "warning"))
+
+    for first, second in pairs:
+
+        if first == second and first.isalpha() and first not in DOUBLING_ALLOWED:
+            for start, end in _occurrences(lower, f"{first} {first}"):
+                found.append((start, end, f'Repeated word "{first}"', f'Delete the second "{first}"', "error"))
+
+        elif first in ("a", "an") and second:
+            for start, end in _occurrences(lower, f"{first} {second}"):
+                if text[start] == "A" and first == "a":
+                    continue  # "Plan A is", not an article
+                hit = _article_issue(first, text[start + len(first) + 1:end])
+                if hit:
+                    found.append((start, end, hit[0], hit[1], "warning"))
+
+    if any(f" {p}" in text for p in ",;:.!?"):
+        for m in _SPACE_BEFORE_RE.finditer(text):
+            found.append((m.start(), m.end(), "Space before punctuation", "Remove the space before the punctuation mark", "warning"))
+
+    if any("," in t[:-1] or ";" in t[:-1] for t in tokens):
+        for m in _NO_SPACE_AFTER_RE.finditer(text):
+            found.append((m.start(), m.end(), "Missing space after punctuation", "Add a space after the punctuation mark", "warning"))
+
+    if "  " in text:
+        for m in _MULTI_SPACE_RE.finditer(text):
+            found.append((m.start(), m.end(), "Multiple spaces between words", "Use a single space", "warning"))
+
+    found.sort()
+    return found
+
+
+def check_essay(text: str, sentence_index=None) -> list[Annotation]:
+    """Rule findings as annotations, tied to sentence ids when an index is given."""
+
+    starts = [s for s, _ in sentence_index] if sentence_index else None
+    annotations = []
+
+    for start, end, issue, suggestion, severity in check_text(text):
+        annotations.append(Annotation(
+            quote=text[start:end],
+            issue=issue,
+            suggestion=suggestion,
+            severity=severity,
+            sentence_id=bisect_right(starts, start) if starts else None,
+        ))
+
+    return annotations
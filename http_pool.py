@@ -0,0 +1,140 @@
+"""One pooled, keep-alive HTTP client per process for every model call.
+
+Each evaluation fans out up to ten simultaneous calls. All model clients in
+`models.py` share the client built here, so those calls (and those of every
+other Streamlit session or batch thread in the process) reuse warm TLS
+connections instead of opening new ones.
+
+Pool size, keep-alive, HTTP/2 and timeouts come from the HTTP_* settings in
+config.py. `stats()` reports pool utilization and connection reuse; a
+request is counted as reused when it completed without opening a TCP
+connection (from httpcore's trace events).
+"""
+
+import threading
+from collections import Counter
+
+import httpx
+
+import config
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+_in_flight = 0
+_peak_in_flight = 0
+
+
+def _count(key: str, n: int = 1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def _enter():
+    global _in_flight, _peak_in_flight
+    with _stats_lock:
+        _in_flight += 1
+        _peak_in_flight = max(_peak_in_flight, _in_flight)
+
+
+def _leave():
+    global _in_flight
+    with _stats_lock:
+        _in_flight -= 1
+
+
+class _TrackedStream(httpx.SyncByteStream):
+    """Response body that marks the request finished when it is closed."""
+
+    def __init__(self, stream, on_close):
+        self._stream = stream
+        self._on_close = on_close
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if self._on_close:
+                self._on_close()
+                self._on_close = None
+
+
+class PooledTransport(httpx.HTTPTransport):
+    """HTTPTransport that counts requests, new connections and requests in flight."""
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+
+        connected = []
+
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.complete":
+                connected.append(True)
+
+        request.extensions["trace"] = trace
+        _enter()
+
+        try:
+            response = super().handle_request(request)
+        except Exception:
+            _leave()
+            _count("errors")
+            raise
+        finally:
+            _count("requests")
+            _count("new_connections" if connected else "reused_connections")
+
+        response.stream = _TrackedStream(response.stream, _leave)
+        return response
+
+
+def timeout() -> httpx.Timeout:
+    return httpx.Timeout(
+        config.HTTP_TIMEOUT,
+        connect=config.HTTP_CONNECT_TIMEOUT,
+        pool=config.HTTP_POOL_TIMEOUT,
+    )
+
+
+def limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+    )
+
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def http_client() -> httpx.Client:
+    """The process-wide pooled client (built on first use)."""
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            # http2=True needs the optional h2 package (pip install "httpx[http2]")
+            transport = PooledTransport(limits=limits(), http2=config.HTTP2)
+            _client = httpx.Client(transport=transport, timeout=timeout(), follow_redirects=True)
+        return _client
+
+
+def stats() -> dict:
+    """Pool counters: requests, new/reused connections, in-flight and utilization."""
+
+    with _stats_lock:
+        requests = _stats["requests"]
+        return {
+            "max_connections": config.HTTP_MAX_CONNECTIONS,
+            "requests": requests,
+            "errors": _stats["errors"],
+            "new_connections": _stats["new_connections"],
+            "reused_connections": _stats["reused_connections"],
+            "reuse_rate": round(_stats["reused_connections"] / requests, 3) if requests else 0.0,
+            "in_flight": _in_flight,
+            "peak_in_flight": _peak_in_flight,
+            "utilization": round(_in_flight / config.HTTP_MAX_CONNECTIONS, 3),
+            "peak_utilization": round(_peak_in_flight / config.HTTP_MAX_CONNECTIONS, 3),
+        }
@@ -0,0 +1,470 @@
+"""Persistent evaluation job queue and worker pool.
+
+Jobs live in a SQLite database (JOBS_DB_PATH), so they survive page
+reloads and restarts of both the app and the workers. Any number of worker
+processes, on any number of nodes sharing the database file, can use one
+queue: a worker claims the next job (interactive before batch, oldest
+first) in a write transaction, runs `workflow` on it and stores the result.
+
+A claim is a lease of JOB_STALE_AFTER seconds that the worker's pool
+renews while the job runs. Jobs whose lease expired (the worker died, was
+restarted or lost its node) go back to the queue, up to JOB_MAX_ATTEMPTS
+attempts. Only the current lease holder can store a result, so each job's
+result is written exactly once even if a presumed-dead worker finishes late.
+
+JOB_MAX_RUNNING caps the jobs running across all workers, to keep the
+whole cluster within a shared rate limit.
+"""
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from pydantic import BaseModel
+
+from schemas import Annotation, EvaluationSchema
+import config
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Attempts at a job store call that fails with a locked or busy database
+STORE_ATTEMPTS = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    heartbeat REAL
+);
+"""
+
+# Columns added after the first release, with their definitions
+MIGRATIONS = {
+    "priority": "INTEGER NOT NULL DEFAULT 0",
+    "batch": "TEXT",
+    "item": "TEXT",
+}
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created);
+CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch, status);
+"""
+
+# Claim order: interactive jobs before batch jobs
+PRIORITY_ORDER = {"interactive": 0, "batch": 1}
+
+# Job fields returned by `JobStore.get` (the result is fetched separately)
+STATUS_FIELDS = ("id", "status", "error", "attempts", "created", "started", "finished", "priority")
+
+
+# ----------------------- RESULT SERIALIZATION -----------------------
+
+def _encode(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def dump_result(result: dict) -> str:
+    return json.dumps(result, default=_encode, ensure_ascii=False)
+
+
+def load_result(text: str) -> dict:
+    """Inverse of `dump_result`: evaluations and rule findings become models again."""
+
+    result = json.loads(text)
+    result["evaluations"] = {
+        key: EvaluationSchema.model_validate(e) for key, e in (result.get("evaluations") or {}).items()
+    }
+    if result.get("rule_annotations"):
+        result["rule_annotations"] = [Annotation.model_validate(a) for a in result["rule_annotations"]]
+    return result
+
+
+# ----------------------- JOB STORE -----------------------
+
+class JobStore:
+
+    def __init__(self, path: str | None = None):
+
+        self.path = path or config.JOBS_DB_PATH
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            columns = {row["name"] for row in db.execute("PRAGMA table_info(jobs)")}
+            for name, definition in MIGRATIONS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {definition}")
+            db.executescript(INDEXES)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived autocommit connection per operation: safe across threads and processes
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def submit(self, request: dict) -> str:
+
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, status, request, priority, created) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(request, ensure_ascii=False), _priority(request), time.time()),
+            )
+        return job_id
+
+    def submit_batch(self, batch: str, items) -> int:
+        """Queue (item id, request) pairs under `batch`; returns how many were new.
+
+        Job ids derive from batch and item id, so submitting the same corpus
+        again only adds the items that are not queued yet.
+        """
+
+        now = time.time()
+        rows = [
+            (batch_job_id(batch, item), json.dumps(request, ensure_ascii=False), _priority(request), batch, item, now)
+            for item, request in items
+        ]
+
+        with self._connect() as db:
+            before = db.total_changes
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(
+                "INSERT OR IGNORE INTO jobs (id, status, request, priority, batch, item, created) "
+                "VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                rows,
+            )
+            db.execute("COMMIT")
+            return db.total_changes - before
+
+    def get(self, job_id: str) -> dict | None:
+
+        with self._connect() as db:
+            row = db.execute(f"SELECT {', '.join(STATUS_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            if job["status"] == "queued":
+                job["position"] = db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' "
+                    "AND (priority < ?1 OR (priority = ?1 AND created < ?2))",
+                    (job["priority"], job["created"]),
+                ).fetchone()[0]
+            del job["priority"]
+        return job
+
+    def result_json(self, job_id: str) -> str | None:
+        with self._connect() as db:
+            row = db.execute("SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+        return row["result"] if row else None
+
+    def result(self, job_id: str) -> dict | None:
+        text = self.result_json(job_id)
+        return load_result(text) if text is not None else None
+
+    def claim(self, worker: str, max_running: int | None = None) -> tuple[str, dict] | None:
+        """Atomically lease the next queued job: (id, request).
+
+        None if the queue is empty or `max_running` (default JOB_MAX_RUNNING,
+        0 for no cap) jobs are already running across all workers.
+        """
+
+        max_running = config.JOB_MAX_RUNNING if max_running is None else max_running
+        now = time.time()
+
+        with self._connect() as db:
+            # IMMEDIATE: the running count and the update see the same state
+            db.execute("BEGIN IMMEDIATE")
+            if max_running and db.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0] >= max_running:
+                db.execute("COMMIT")
+                return None
+            row = db.execute(
+                """
+                UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ?, attempts = attempts + 1
+                WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority, created LIMIT 1)
+                RETURNING id, request
+                """,
+                (worker, now, now),
+            ).fetchone()
+            db.execute("COMMIT")
+        return (row["id"], json.loads(row["request"])) if row else None
+
+    def heartbeat(self, workers: list[str]):
+        # Renews the lease of every job held by `workers`
+        if not workers:
+            return
+        with self._connect() as db:
+            db.execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND worker IN ({', '.join('?' * len(workers))})",
+                (time.time(), *workers),
+            )
+
+    def complete(self, job_id: str, result: dict, worker: str) -> bool:
+        """Store the result if `worker` still holds the lease; False if it was lost."""
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, finished = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (dump_result(result), time.time(), job_id, worker),
+            ).rowcount == 1
+
+    def fail(self, job_id: str, error: str, worker: str) -> bool:
+        with self._connect() as db:
+            return db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, time.time(), job_id, worker),
+            ).rowcount == 1
+
+    def requeue_stale(self, stale_after: float | None = None, max_attempts: int | None = None) -> int:
+        """Return jobs of dead workers to the queue (or fail them after too many attempts)."""
+
+        stale_after = config.JOB_STALE_AFTER if stale_after is None else stale_after
+        max_attempts = config.JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        cutoff = time.time() - stale_after
+
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'Worker lost too many times', finished = ? "
+                "WHERE status = 'running' AND heartbeat < ? AND attempts >= ?",
+                (time.time(), cutoff, max_attempts),
+            )
+            return db.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL WHERE status = 'running' AND heartbeat < ?",
+                (cutoff,),
+            ).rowcount
+
+    def counts(self, batch: str | None = None) -> dict[str, int]:
+        query = "SELECT status, COUNT(*) AS n FROM jobs" + (" WHERE batch = ?" if batch else "") + " GROUP BY status"
+        with self._connect() as db:
+            return {row["status"]: row["n"] for row in db.execute(query, (batch,) if batch else ())}
+
+    def progress(self, batch: str, window_s: float = 600) -> dict:
+        """Counts by status, recent throughput, ETA and running jobs per node for `batch`."""
+
+        now = time.time()
+        counts = self.counts(batch)
+        total = sum(counts.values())
+        remaining = counts.get("queued", 0) + counts.get("running", 0)
+
+        with self._connect() as db:
+            # Throughput over the last `window_s`, or since the batch started if that is shorter
+            # (at least a second: the batch may have just started, or node clocks may differ)
+            first_start = db.execute("SELECT MIN(started) FROM jobs WHERE batch = ?", (batch,)).fetchone()[0]
+            window_s = max(min(window_s, now - first_start), 1.0) if first_start else window_s
+            recent = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch = ? AND status = 'done' AND finished >= ?",
+                (batch, now - window_s),
+            ).fetchone()[0]
+            nodes = {
+                row["node"]: row["n"] for row in db.execute(
+                    "SELECT substr(worker, 1, instr(worker, ':') - 1) AS node, COUNT(*) AS n "
+                    "FROM jobs WHERE batch = ? AND status = 'running' GROUP BY node",
+                    (batch,),
+                )
+            }
+            retried = db.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch = ? AND attempts > 1", (batch,)
+            ).fetchone()[0]
+
+        per_minute = recent / (window_s / 60)
+
+        return {
+            "batch": batch,
+            "total": total,
+            "counts": counts,
+            "retried": retried,
+            "per_minute": round(per_minute, 2),
+            "eta_s": round(remaining / per_minute * 60) if per_minute and remaining else None,
+            "running_by_node": nodes,
+        }
+
+    def batch_results(self, batch: str):
+        """(item id, status, result JSON or None, error) for every job in `batch`, in item order."""
+        with self._connect() as db:
+            yield from (
+                (row["item"], row["status"], row["result"], row["error"])
+                for row in db.execute(
+                    "SELECT item, status, result, error FROM jobs WHERE batch = ? ORDER BY created, item", (batch,)
+                )
+            )
+
+
+def batch_job_id(batch: str, item: str) -> str:
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"essay-batch/{batch}/{item}").hex
+
+
+def _priority(request: dict) -> int:
+    priority = request.get("priority")
+    if priority and priority not in PRIORITY_ORDER:
+        raise ValueError(f"priority must be one of: {', '.join(PRIORITY_ORDER)}")
+    return PRIORITY_ORDER.get(priority, 0)
+
+
+# ----------------------- WORKERS -----------------------
+
+def evaluate(request: dict) -> dict:
+    """Run one job request through the evaluation graph."""
+
+    from build_graph import get_workflow
+
+    workflow = get_workflow(request.get("criteria"), request.get("overall", True))
+    state = {"topic": request["topic"], "essay": request["essay"], "overall": ""}
+    for key in ("tenant", "priority"):
+        if request.get(key):
+            state[key] = request[key]
+
+    with tracing.trace("evaluate", "job", tenant=request.get("tenant"), priority=request.get("priority")):
+        return workflow.invoke(state)
+
+
+def _transient(error: Exception) -> bool:
+    # Another process holds the write lock; the same call can succeed later
+    return isinstance(error, sqlite3.OperationalError) and any(
+        word in str(error).lower() for word in ("locked", "busy")
+    )
+
+
+class WorkerPool:
+    """`workers` threads pulling jobs from `store` until `stop()`.
+
+    Only the leases of jobs a worker is still handling are renewed: a job
+    whose result could not be stored is left to expire and be requeued.
+    """
+
+    def __init__(self, store: JobStore, workers: int | None = None):
+
+        self.store = store
+        self.workers = config.JOB_WORKERS if workers is None else workers
+        self.prefix = f"{socket.gethostname()}:{os.getpid()}:"
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        # Names of the workers currently running a job
+        self._busy: set[str] = set()
+
+    def start(self) -> "WorkerPool":
+
+        self._threads = [
+            threading.Thread(target=self._work, args=(f"{self.prefix}{i}",), name=f"job-worker-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(threading.Thread(target=self._maintain, name="job-heartbeat", daemon=True))
+
+        self.store.requeue_stale()  # jobs left running by a previous run
+
+        for t in self._threads:
+            t.start()
+        return self
+
+    def stop(self, timeout: float | None = None):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _retry(self, action, *args):
+        """`action(*args)`, retried with back-off while the database is locked or busy.
+
+        Other errors, and a lock that outlasts STORE_ATTEMPTS attempts, are
+        raised. Returns False if the pool stops while waiting.
+        """
+
+        delay = config.JOB_POLL_INTERVAL
+        for attempt in range(1, STORE_ATTEMPTS + 1):
+            try:
+                return action(*args)
+            except Exception as e:
+                if not _transient(e) or attempt == STORE_ATTEMPTS:
+                    raise
+                logger.warning("Job store call %s failed (%s); retrying in %.1fs", action.__name__, e, delay)
+                if self._stop.wait(delay):
+                    return False
+                delay = min(delay * 2, config.JOB_STALE_AFTER / 4)
+
+    def _finish(self, job_id: str, worker: str, result: dict | None = None, error: str | None = None) -> bool:
+        """Store the job's result, or its error; True if the result was stored.
+
+        A result that cannot be stored for a lasting reason (e.g. it does not
+        serialize) fails the job instead. If the store stays unavailable the
+        job is given up on: its lease is no longer renewed, so it expires and
+        the job is requeued.
+        """
+
+        if error is None:
+            try:
+                return self._retry(self.store.complete, job_id, result, worker)
+            except Exception as e:
+                if _transient(e):
+                    logger.exception("Could not store the result of job %s", job_id)
+                    return False
+                error = f"Could not store result: {type(e).__name__}: {e}"
+
+        try:
+            self._retry(self.store.fail, job_id, error, worker)
+        except Exception:
+            logger.exception("Could not record the failure of job %s", job_id)
+        return False
+
+    def _work(self, name: str):
+
+        while not self._stop.is_set():
+
+            try:
+                job = self.store.claim(name)
+            except Exception:
+                logger.exception("Worker %s could not claim a job", name)
+                job = None
+            if job is None:
+                self._stop.wait(config.JOB_POLL_INTERVAL)
+                continue
+
+            job_id, request = job
+            started = time.perf_counter()
+            self._busy.add(name)
+            try:
+                try:
+                    result = evaluate(request)
+                except Exception as e:
+                    self._finish(job_id, name, error=f"{type(e).__name__}: {e}")
+                    continue
+
+                # False also when the lease expired and another worker owns the job now
+                if not self._finish(job_id, name, result):
+                    continue
+            finally:
+                self._busy.discard(name)
+
+            import score_ranks
+            score_ranks.record(result)
+            if config.RESULTS_STORE_PATH:
+                import results_store
+                results_store.record(result, request.get("student"), request.get("tenant"), time.perf_counter() - started)
+
+    def _maintain(self):
+        # Renew the leases of this process's jobs; requeue jobs whose lease expired
+        while not self._stop.wait(config.JOB_STALE_AFTER / 4):
+            try:
+                self.store.heartbeat(list(self._busy.copy()))
+                self.store.requeue_stale()
+            except Exception:
+                logger.exception("Could not renew job leases")
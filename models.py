@@ -1,8 +1,241 @@
-from langchain_openai import ChatOpenAI
-from schemas import EvaluationSchema, OverallEvaluationSchema
+import json
+import os
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from schemas import OverallEvaluationSchema
+from cassette import Cassette
+from repair import RepairingModel
+from tracing import TracedModel
+import config
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+if config.LLM_CASSETTE == "replay":
+    # Replay never reaches the API, but the client still wants a key.
+    os.environ.setdefault("OPENAI_API_KEY", "cassette-replay")
+
+
+# ----------------------- MODEL PROFILES -----------------------
+
+@dataclass(frozen=True)
+class ModelProfile:
+    model: str
+    temperature: float = 0
+    max_tokens: int | None = None
+    # USD per million tokens, used for cost reporting only
+    input_cost: float = 0.0
+    output_cost: float = 0.0
+    # OpenAI-compatible endpoint (e.g. a local server) and the env var holding
+    # its API key; None uses the OpenAI API and OPENAI_API_KEY
+    base_url: str | None = None
+    api_key_env: str | None = None
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.input_cost + output_tokens * self.output_cost) / 1_000_000
+
 
 # Set temperature=0 for consistent, deterministic outputs
-model = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+MODEL_PROFILES: dict[str, ModelProfile] = {
+    "default": ModelProfile("gpt-4o-mini", 0, 2000, 0.15, 0.60),
+    "fast": ModelProfile("gpt-4.1-nano", 0, 1500, 0.10, 0.40),
+    "strong": ModelProfile("gpt-4.1", 0, 2000, 2.00, 8.00),
+}
+
+if config.MODEL_PROFILES_PATH:
+    with open(config.MODEL_PROFILES_PATH, encoding="utf-8") as f:
+        for name, fields in json.load(f).items():
+            MODEL_PROFILES[name] = ModelProfile(**fields)
+
+
+cassette = (
+    Cassette(config.LLM_CASSETTE_PATH, config.LLM_CASSETTE, config.LLM_CASSETTE_LATENCY)
+    if config.LLM_CASSETTE else None
+)
+
+
+# Clients are built on first use (or by `warmup`), not at import: importing
+# langchain_openai and the OpenAI SDK dominates cold start.
+
+@lru_cache(maxsize=None)
+def _chat_model(profile: ModelProfile) -> "ChatOpenAI":
+    # Keyed by the profile's settings, so profiles that resolve to the same
+    # model and parameters share one client.
+    from langchain_openai import ChatOpenAI
+    import http_pool
+
+    return ChatOpenAI(
+        model=profile.model,
+        temperature=profile.temperature,
+        max_tokens=profile.max_tokens,
+        stream_usage=True,
+        # Every client shares one keep-alive connection pool
+        http_client=http_pool.http_client(),
+        timeout=http_pool.timeout(),
+        **({"base_url": profile.base_url} if profile.base_url else {}),
+        **({"api_key": os.environ[profile.api_key_env]} if profile.api_key_env else {}),
+    )
+
+
+def get_chat_model(profile: str = "default", max_tokens: int | None = None) -> "ChatOpenAI":
+    # `max_tokens` overrides the profile's cap, e.g. for a call that answers for several criteria
+    p = MODEL_PROFILES[profile]
+    return _chat_model(replace(p, max_tokens=max_tokens) if max_tokens else p)
+
+
+def response_format(schema) -> dict:
+    # Strict JSON schema passed as a plain dict: the client returns the raw
+    # text instead of validating it, so `repair` can fix it locally.
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+
+    function = convert_to_openai_tool(schema, strict=True)["function"]
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": function["name"], "schema": function["parameters"], "strict": True},
+    }
+
+
+def guarded(profile: str, build):
+    """`build(profile)` behind its endpoint's circuit breaker, falling back to FALLBACK_PROFILE."""
+
+    if not config.CIRCUIT_BREAKER or profile == config.FALLBACK_PROFILE:
+        return build(profile)
+
+    from circuit_breaker import GuardedModel, breaker
+
+    fallback = build(config.FALLBACK_PROFILE) if config.FALLBACK_PROFILE else None
+    endpoint = MODEL_PROFILES[profile].base_url or "openai"
+    return GuardedModel(build(profile), fallback, breaker(endpoint), config.FALLBACK_PROFILE)
+
+
+@lru_cache(maxsize=None)
+def get_structured_model(profile: str, schema, max_tokens: int | None = None):
+    chat = get_chat_model(profile)
+    fmt = response_format(schema)
+    runnable = RepairingModel(
+        guarded(profile, lambda p: get_chat_model(p, max_tokens).bind(response_format=fmt)), schema
+    )
+    if cassette:
+        runnable = cassette.wrap(runnable, schema, chat.model_name)
+    return TracedModel(runnable, f"llm:{profile}", profile=profile, model=chat.model_name, schema=schema.__name__)
+
+
+@lru_cache(maxsize=None)
+def get_streaming_model(profile: str, schema):
+    # Same wire schema as a plain JSON schema: the JSON parser yields partial
+    # dicts while tokens stream, the Pydantic parser only parses the final message.
+    # The final dict is repaired and validated by the caller.
+    chat = get_chat_model(profile)
+    json_schema = schema.model_json_schema()
+    runnable = guarded(profile, lambda p: get_chat_model(p).with_structured_output(json_schema, method="json_schema"))
+    if cassette:
+        runnable = cassette.wrap(runnable, json_schema, chat.model_name)
+    return TracedModel(runnable, f"llm:{profile}", profile=profile, model=chat.model_name, schema=schema.__name__)
+
+
+@lru_cache(maxsize=1)
+def _usage_handler_class():
+    # Defined on first use: langchain_core is part of the deferred LLM stack
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+    class UsageHandler(UsageMetadataCallbackHandler):
+        """Token usage per model response, with the profile that served it.
+
+        Responses from the circuit breaker's fallback carry "served_profile" in
+        their run metadata; the others were served by the profile asked for.
+        """
+
+        def __init__(self):
+            super().__init__()
+            self._served: dict = {}
+            # (served profile or None, input tokens, output tokens) per response
+            self.responses: list[tuple[str | None, int, int]] = []
+
+        def on_chat_model_start(self, serialized, messages, *, run_id=None, metadata=None, **kwargs):
+            if metadata and metadata.get("served_profile"):
+                with self._lock:
+                    self._served[run_id] = metadata["served_profile"]
+
+        def on_llm_end(self, response, *, run_id=None, **kwargs):
+            super().on_llm_end(response, run_id=run_id, **kwargs)
+            try:
+                usage = response.generations[0][0].message.usage_metadata or {}
+            except (IndexError, AttributeError):
+                usage = {}
+            with self._lock:
+                self.responses.append((self._served.pop(run_id, None), usage.get("input_tokens", 0), usage.get("output_tokens", 0)))
+
+    return UsageHandler
+
+
+def call_usage(profile: str, handler, latency_s: float) -> dict:
+    """Per-call report from a UsageHandler: tokens, latency and cost.
+
+    Each response is priced at the rates of the profile that served it; when
+    the fallback served the call, "profile" and "model" are the fallback's
+    and "fallback_from" is `profile`.
+    """
+
+    if isinstance(handler, _usage_handler_class()):
+        responses = [(served or profile, i, o) for served, i, o in handler.responses]
+    else:
+        responses = [(profile, u.get("input_tokens", 0), u.get("output_tokens", 0)) for u in handler.usage_metadata.values()]
+
+    served = responses[-1][0] if responses else profile
+    p = MODEL_PROFILES[served]
+
+    return {
+        "profile": served,
+        "model": p.model,
+        "latency_s": round(latency_s, 3),
+        "input_tokens": sum(i for _, i, _ in responses),
+        "output_tokens": sum(o for _, _, o in responses),
+        "cost_usd": round(sum(MODEL_PROFILES[s].cost(i, o) for s, i, o in responses), 6),
+        **({"fallback_from": profile} if served != profile else {}),
+    }
+
+
+def cascade_usage(calls: list[dict], strong_profile: str, reasons: list[str]) -> dict:
+    """Merge the usage reports of one cascade into a single report.
+
+    `saved_usd` compares the actual spend with running the same prompt only
+    on the strongest profile, estimated from the first stage's token counts.
+    """
+
+    strong = MODEL_PROFILES[strong_profile]
+    first = calls[0]
+    final = calls[-1]
+
+    total_cost = sum(c["cost_usd"] for c in calls)
+    strong_only = strong.cost(first["input_tokens"], first["output_tokens"])
+
+    return {
+        **final,
+        "latency_s": round(sum(c["latency_s"] for c in calls), 3),
+        "input_tokens": sum(c["input_tokens"] for c in calls),
+        "output_tokens": sum(c["output_tokens"] for c in calls),
+        "cost_usd": round(total_cost, 6),
+        "repairs": [kind for c in calls for kind in c.get("repairs", [])],
+        "retries": sum(c.get("retries", 0) for c in calls),
+        **({"queue_s": round(sum(c["queue_s"] for c in calls), 3)} if "queue_s" in final else {}),
+        "cascade": {
+            "stages": [c["profile"] for c in calls],
+            "escalated": len(reasons) > 0,
+            "reasons": reasons,
+            "saved_usd": round(strong_only - total_cost, 6),
+        },
+    }
+
+
+def get_overall_model():
+    return get_structured_model("default", OverallEvaluationSchema)
+
 
-structured_model = model.with_structured_output(EvaluationSchema)
-overall_model = model.with_structured_output(OverallEvaluationSchema)
\ No newline at end of file
+def __getattr__(name):
+    # `from models import UsageHandler` builds the class on first use, so
+    # importing this module does not load langchain_core
+    if name == "UsageHandler":
+        return _usage_handler_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
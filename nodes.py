@@ -1,7 +1,33 @@
-from criteria_registry import Criterion, CRITERIA
-from schemas import EssayState
-from utils import count_words, extract_paragraphs, normalize_text
-from models import structured_model, overall_model
+from criteria_registry import Criterion, CRITERIA, select_criteria
+from schemas import (
+    EssayState,
+    EvaluationSchema,
+    CompactEvaluationSchema,
+    AnchoredEvaluationSchema,
+    CompactAnchoredEvaluationSchema,
+    RATING_CODES,
+)
+from utils import (
+    count_words,
+    extract_paragraphs,
+    normalize_text,
+    build_sentence_index,
+    number_sentences,
+    excerpt_sentences,
+    select_sentences,
+    annotation_dict,
+    resolve_annotations,
+)
+from models import MODEL_PROFILES, get_overall_model, get_structured_model, get_streaming_model, call_usage, cascade_usage
+from scoring import ScoringWeights, local_score, local_strengths_weaknesses
+from grammar_rules import check_essay
+from pydantic import ValidationError, Field, create_model
+from functools import lru_cache
+from typing import get_args
+import config
+import repair
+import scheduler
+import time
 
 def metadata_node(state: EssayState):
 
@@ -27,12 +53,17 @@ def metadata_node(state: EssayState):
             "weaknesses": []
         }
     else:
+        # Sentence index and rule findings are computed once, here, ahead of
+        # the planner, which counts them into its estimates
+        sentences = build_sentence_index(state["essay"])
         return {
             "metadata": {
                 "word_count": total_words,
                 "paragraph_count": para_count,
                 "avg_paragraph_words": round(total_words / max(para_count, 1), 1),
-            }
+            },
+            "sentences": sentences,
+            "rule_annotations": check_essay(state["essay"], sentences) if config.GRAMMAR_PREPASS else [],
         }
 
 def introConclusion_extractor(state: EssayState):
@@ -46,32 +77,109 @@ def introConclusion_extractor(state: EssayState):
 
     return {
         "intro": intro,
-        "conclusion": conclusion
+        "conclusion": conclusion,
     }
 
-def build_evaluator(criterion: Criterion):
+COMPACT_OUTPUT_NOTE = """
+OUTPUT FORMAT (compact keys):
+r = rating code (E/G/A/P), f = feedback,
+a = annotations, each with q = quote, i = issue, s = suggestion, v = severity (e/w).
+"""
 
-    key = criterion.key
-    name = criterion.name
-    instruction = criterion.instruction
-    rubric = criterion.rubric
+COMPACT_ANCHORED_OUTPUT_NOTE = """
+OUTPUT FORMAT (compact keys):
+r = rating code (E/G/A/P), f = feedback,
+a = annotations, each with n = sentence number, q = anchor, i = issue, s = suggestion, v = severity (e/w).
+"""
 
-    def evaluator(state: EssayState):
+QUOTE_RULE = "- Quote: 3-15 words MAX, exact phrase from essay"
 
-        topic = state["topic"]
-        essay = state["essay"]
-        meta = state["metadata"]
+ANCHOR_RULE = """- Sentence: the [n] number of the sentence containing the issue
+- Anchor: 2-6 words copied exactly from that sentence (NOT the whole sentence)"""
+
+
+# Rule findings listed in the prompt; the rest are summarized by count
+MAX_PREPASS_LISTED = 40
 
-        prompt = f"""
-You are a STRICT UPSC examiner. Rate honestly — NOT generously.
 
-Criterion: {name}
+def criterion_block(criterion: Criterion, state: EssayState | None = None) -> str:
+    return f"""Criterion: {criterion.name}
 
 Focus:
-{instruction}
+{criterion.instruction}
 
 Rating Rubric:
-{rubric}
+{criterion.rubric}""" + prepass_note(criterion, state)
+
+
+def rule_findings(criterion: Criterion, state: EssayState | None) -> list:
+    if not criterion.rule_prepass or state is None:
+        return []
+    return state.get("rule_annotations") or []
+
+
+def prepass_note(criterion: Criterion, state: EssayState | None) -> str:
+    """Tell the model which mechanical issues the local checker already reported."""
+
+    found = rule_findings(criterion, state)
+    if not found:
+        return ""
+
+    listed = "\n".join(f'- "{a.quote}": {a.issue}' for a in found[:MAX_PREPASS_LISTED])
+    if len(found) > MAX_PREPASS_LISTED:
+        listed += f"\n- ...and {len(found) - MAX_PREPASS_LISTED} more of the same kinds"
+
+    return f"""
+
+ALREADY DETECTED by an automatic checker (reported separately, count them in your rating):
+{listed}
+Do NOT annotate these or other mechanical slips (spelling, doubled words, spacing, a/an).
+Use your annotations for issues rules cannot catch: sentence construction, tense, word choice, clarity."""
+
+
+def with_rule_findings(criterion: Criterion, response: EvaluationSchema, state: EssayState) -> EvaluationSchema:
+    found = rule_findings(criterion, state)
+    if not found:
+        return response
+    return response.model_copy(update={"annotations": [*found, *response.annotations]})
+
+
+def essay_context(state: EssayState, scope: str = "essay") -> str:
+    """Essay text as the model sees it, limited to `scope` in context-scoped plans."""
+
+    essay = state["essay"]
+    sentences = state.get("sentences") or build_sentence_index(essay)
+
+    if state.get("plan", {}).get("mode") != "context-scoped":
+        scope = "essay"
+
+    selected = None if scope == "essay" else select_sentences(essay, sentences, scope)
+
+    if config.SENTENCE_ANCHORS:
+        return number_sentences(essay, sentences, selected)
+    if selected is None:
+        return essay
+    return excerpt_sentences(essay, sentences, selected)
+
+
+def examiner_prompt(criteria_text: str, state: EssayState, essay: str) -> str:
+
+    topic = state["topic"]
+    meta = state["metadata"]
+
+    quote_rule = ANCHOR_RULE if config.SENTENCE_ANCHORS else QUOTE_RULE
+
+    topic_notes = state.get("topic_notes")
+    if topic_notes:
+        topic += f"""
+
+Examiner notes for this topic (shared across all candidates; a reference, NOT a checklist):
+{topic_notes}"""
+
+    return f"""
+You are a STRICT UPSC examiner. Rate honestly — NOT generously.
+
+{criteria_text}
 
 Essay metadata:
 - Word count: {meta['word_count']}
@@ -126,7 +234,7 @@ ANNOTATION RULES (CRITICAL):
 Identify MAJOR issues. Focus on HIGH-IMPACT problems that directly relate to the rating.
 
 Annotation Requirements:
-- Quote: 3-15 words MAX, exact phrase from essay
+{quote_rule}
 - Issue: 1 sentence, specific problem
 - Suggestion: 1 sentence, concrete fix
 - Severity: "error" (major) or "warning" (minor)
@@ -156,18 +264,308 @@ Essay:
 {essay}
 """
 
-        response = structured_model.invoke(prompt)
+
+def evaluator_prompt(criterion: Criterion, state: EssayState) -> str:
+    return examiner_prompt(criterion_block(criterion, state), state, essay_context(state, criterion.context))
+
+
+def state_criteria(state: EssayState) -> tuple[Criterion, ...]:
+    """Criteria selected for this run (all of them unless the state narrows it)."""
+    return select_criteria(state.get("criteria"))
+
+
+def fused_prompt(state: EssayState) -> str:
+    """All criteria in one request: the shared instructions and essay are sent once."""
+
+    criteria_text = (
+        "Evaluate the essay SEPARATELY on EACH criterion below and return one result per criterion.\n\n"
+        + "\n\n---\n\n".join(criterion_block(c, state) for c in state_criteria(state))
+    )
+    return examiner_prompt(criteria_text, state, essay_context(state))
+
+
+@lru_cache(maxsize=None)
+def fused_schema(schema, keys: tuple[str, ...] | None = None):
+    """One field per criterion key, each holding the per-criterion wire schema."""
+    return create_model(
+        f"Fused{schema.__name__}",
+        **{c.key: (schema, Field(description=c.name)) for c in select_criteria(keys)},
+    )
+
+
+def wire_format():
+    """(wire schema, prompt suffix) for the configured output mode."""
+
+    if config.SENTENCE_ANCHORS and config.COMPACT_OUTPUT:
+        return CompactAnchoredEvaluationSchema, COMPACT_ANCHORED_OUTPUT_NOTE
+    if config.SENTENCE_ANCHORS:
+        return AnchoredEvaluationSchema, ""
+    if config.COMPACT_OUTPUT:
+        return CompactEvaluationSchema, COMPACT_OUTPUT_NOTE
+    return EvaluationSchema, ""
+
+
+def to_evaluation(response) -> EvaluationSchema:
+    return response if isinstance(response, EvaluationSchema) else response.expand()
+
+
+def stream_evaluation(key: str, runnable, schema, prompt: str, emit, callbacks=()) -> EvaluationSchema:
+    """Run one evaluator with token streaming and emit fields as they complete.
+
+    Events passed to `emit` (all carry "criterion": key):
+    {"rating": str}, {"feedback": str}, {"annotation": Annotation}.
+    A field counts as complete once the model has started another one, in
+    whatever order it writes them; an annotation once the next annotation
+    has started. Fields the stream never completed are emitted from the
+    repaired response.
+    """
+    from langchain_core.exceptions import OutputParserException
+
+    compact = issubclass(schema, CompactEvaluationSchema)
+    rating_key, feedback_key, annotations_key = ("r", "f", "a") if compact else ("rating", "feedback", "annotations")
+    annotation_schema = schema.model_fields[annotations_key].annotation.__args__[0]
+    ratings = get_args(schema.model_fields[rating_key].annotation)
+
+    # Streamed fields go through the same local repair as whole responses
+    essay = repair.current_essay()
+    fixes = []
+
+    sent_rating = sent_feedback = False
+    sent_annotations = 0
+
+    def emit_annotations(items):
+        nonlocal sent_annotations
+        for item in items[sent_annotations:]:
+            try:
+                # Fixes are counted once, when the final response is repaired
+                annotation = repair.repair_data(dict(item), annotation_schema, essay)
+            except repair.IrreparableOutput as e:
+                raise OutputParserException(f"Irreparable streamed annotation: {e}") from e
+            if hasattr(annotation, "expand"):
+                annotation = annotation.expand()
+            emit({"criterion": key, "annotation": annotation})
+            sent_annotations += 1
+
+    partial = {}
+
+    for partial in runnable.stream(prompt, config={"callbacks": list(callbacks)}):
+
+        if not isinstance(partial, dict):
+            continue
+
+        # Every field but the one being written
+        complete = set(list(partial)[:-1])
+
+        if not sent_rating and rating_key in complete:
+            rating = repair.normalize_enum(partial[rating_key], ratings)
+            if rating in ratings:
+                emit({"criterion": key, "rating": RATING_CODES.get(rating, rating) if compact else rating})
+                sent_rating = True
+
+        if not sent_feedback and feedback_key in complete and isinstance(partial[feedback_key], str):
+            emit({"criterion": key, "feedback": partial[feedback_key]})
+            sent_feedback = True
+
+        items = partial.get(annotations_key)
+        if isinstance(items, list):
+            emit_annotations(items if annotations_key in complete else items[:-1])
+
+    try:
+        response = to_evaluation(repair.repair_data(partial, schema, essay, fixes))
+    except repair.IrreparableOutput as e:
+        raise OutputParserException(f"Irreparable streamed {schema.__name__} output: {e}") from e
+
+    repair.record(fixes)
+
+    if not sent_rating:
+        emit({"criterion": key, "rating": response.rating})
+    if not sent_feedback:
+        emit({"criterion": key, "feedback": response.feedback})
+    for annotation in response.annotations[sent_annotations:]:
+        emit({"criterion": key, "annotation": annotation})
+
+    return response
+
+
+def llm_slot(state: EssayState):
+    # Scheduler slot for one model call made on behalf of this essay's tenant
+    return scheduler.slot(state.get("tenant"), state.get("priority"))
+
+
+def queue_usage(usage: dict, queued: float | None) -> dict:
+    return usage if queued is None else {**usage, "queue_s": round(queued, 3)}
+
+
+def run_evaluation(key: str, profile: str, schema, prompt: str, stream: bool, state: EssayState):
+    """One evaluator call on `profile`; returns (EvaluationSchema, usage report).
+
+    An irreparable streamed response is re-requested once without streaming.
+    """
+    from langchain_core.exceptions import OutputParserException
+    from langgraph.config import get_stream_writer
+    from models import UsageHandler
+
+    usage = UsageHandler()
+
+    with llm_slot(state) as queued, repair.tracking(state["essay"]) as report:
+
+        started = time.perf_counter()
+        response = None
+
+        if stream:
+            try:
+                response = stream_evaluation(
+                    key, get_streaming_model(profile, schema), schema, prompt, get_stream_writer(), [usage]
+                )
+            except OutputParserException:
+                repair.record_retry()
+
+        if response is None:
+            structured = get_structured_model(profile, schema)
+            response = to_evaluation(structured.invoke(prompt, config={"callbacks": [usage]}))
+
+    usage = repair_usage(call_usage(profile, usage, time.perf_counter() - started), report)
+    return response, queue_usage(usage, queued)
+
+
+def repair_usage(usage: dict, report: repair.RepairReport) -> dict:
+    return {**usage, "repairs": report.fixes, "retries": report.retries}
+
+
+def escalation_reason(response: EvaluationSchema, state: EssayState) -> str | None:
+    """Why a cheap-model result looks unreliable, or None if it can be kept."""
+
+    errors = sum(a.severity == "error" for a in response.annotations)
+
+    # Borderline: the rating and the annotations it produced disagree
+    if response.rating in ("Excellent", "Good") and errors >= config.CASCADE_MAX_ERRORS_FOR_GOOD:
+        return "borderline_rating"
+    if response.rating == "Poor" and errors == 0:
+        return "borderline_rating"
+
+    if response.annotations:
+        raw = [annotation_dict("", a) for a in response.annotations]
+        resolved = resolve_annotations(state["essay"], raw, allow_overlaps=True, sentence_index=state.get("sentences"))
+        if len(resolved) / len(raw) < config.CASCADE_MIN_RESOLUTION:
+            return "low_resolution"
+
+    return None
+
+
+def run_cascade(criterion: Criterion, schema, prompt: str, state: EssayState):
+    """Cheap-first cascade over `criterion.cascade_profiles`.
+
+    Only the last stage streams, so the UI never shows a result that is
+    about to be replaced.
+    """
+    from langchain_core.exceptions import OutputParserException
+
+    stages = criterion.cascade_profiles
+    calls, reasons = [], []
+
+    for i, profile in enumerate(stages):
+
+        last = i == len(stages) - 1
+
+        try:
+            response, usage = run_evaluation(
+                criterion.key, profile, schema, prompt, config.STREAM_EVALUATIONS and last, state
+            )
+        except (OutputParserException, ValidationError):
+            if last:
+                raise
+            reasons.append("schema_error")
+            continue
+
+        calls.append(usage)
+
+        if last:
+            reason = None
+        elif usage["repairs"] or usage["retries"]:
+            # Output needed local fixes: the cheap model struggled with the format
+            reason = "schema_repair"
+        else:
+            reason = escalation_reason(response, state)
+        if reason is None:
+            break
+        reasons.append(reason)
+
+    return response, cascade_usage(calls, stages[-1], reasons)
+
+
+def build_evaluator(criterion: Criterion):
+
+    key = criterion.key
+    profile = criterion.model_profile
+
+    def evaluator(state: EssayState):
+
+        schema, output_note = wire_format()
+        prompt = evaluator_prompt(criterion, state) + output_note
+
+        if config.STREAM_EVALUATIONS:
+            from langgraph.config import get_stream_writer
+
+            # Rule findings are known up front; show them before the model answers
+            emit = get_stream_writer()
+            for annotation in rule_findings(criterion, state):
+                emit({"criterion": key, "annotation": annotation})
+
+        if config.CASCADE:
+            response, usage = run_cascade(criterion, schema, prompt, state)
+        else:
+            response, usage = run_evaluation(key, profile, schema, prompt, config.STREAM_EVALUATIONS, state)
 
         return {
             "evaluations": {
-                key: response
+                key: with_rule_findings(criterion, response, state)
+            },
+            "usage": {
+                key: usage
             }
         }
 
     return evaluator
 
 
-def overall_evaluation(state: EssayState):
+def fused_keys(state: EssayState) -> tuple[str, ...] | None:
+    # None for the full set keeps one cached schema (and cassette key) for it
+    criteria = state_criteria(state)
+    return None if criteria == CRITERIA else tuple(c.key for c in criteria)
+
+
+def fused_max_tokens(criteria) -> int:
+    """Output cap of the fused call: room for every criterion's result."""
+    return max(MODEL_PROFILES["default"].max_tokens or 0, config.FUSED_OUTPUT_TOKENS_PER_CRITERION * len(criteria))
+
+
+def fused_evaluator(state: EssayState):
+    """Evaluate every criterion in a single call (the planner's "fused" mode)."""
+    from models import UsageHandler
+
+    schema, output_note = wire_format()
+    prompt = fused_prompt(state) + output_note
+
+    usage = UsageHandler()
+
+    criteria = state_criteria(state)
+
+    structured = get_structured_model("default", fused_schema(schema, fused_keys(state)), fused_max_tokens(criteria))
+    with llm_slot(state) as queued, repair.tracking(state["essay"]) as report:
+        started = time.perf_counter()
+        response = structured.invoke(prompt, config={"callbacks": [usage]})
+
+    return {
+        "evaluations": {
+            c.key: with_rule_findings(c, to_evaluation(getattr(response, c.key)), state) for c in criteria
+        },
+        "usage": {
+            "fused": queue_usage(repair_usage(call_usage("default", usage, time.perf_counter() - started), report), queued)
+        }
+    }
+
+
+def overall_prompt(state: EssayState) -> str:
 
     evaluations = state["evaluations"]
     metadata = state["metadata"]
@@ -176,6 +574,8 @@ def overall_evaluation(state: EssayState):
     evaluation_block = ""
 
     for criterion in CRITERIA:
+        if criterion.key not in evaluations:
+            continue  # not selected for this run
         e = evaluations[criterion.key]
 
         evaluation_block += f"""
@@ -184,7 +584,10 @@ Rating: {e.rating}
 Feedback: {e.feedback}
 """
 
-    prompt = f"""
+    if len(evaluations) < len(CRITERIA):
+        evaluation_block += "\n(Only the criteria above were evaluated for this run; judge the essay on them alone.)\n"
+
+    return f"""
 You are a SENIOR UPSC examiner writing the final assessment. Be consistent, precise, and authoritative.
 
 Essay Metadata:
@@ -241,11 +644,36 @@ If most ratings are "Average" or "Poor", the final assessment should reflect lim
 Do NOT write an encouraging tone if scores don't support it.
 """
 
-    overall_result = overall_model.invoke(prompt)
+
+def generate_final_assessment(state: EssayState) -> str:
+    """On-demand prose report for fast-mode results."""
+    return get_overall_model().invoke(overall_prompt(state)).final_assessment
+
+
+def overall_evaluation(state: EssayState):
+
+    if config.FAST_MODE:
+        weights = ScoringWeights.load()
+        strengths, weaknesses = local_strengths_weaknesses(state["evaluations"], weights)
+        return {
+            "overall": "",
+            "strengths": strengths,
+            "weaknesses": weaknesses,
+            "score": local_score(state["evaluations"], weights),
+        }
+
+    from models import UsageHandler
+
+    usage = UsageHandler()
+
+    with llm_slot(state) as queued, repair.tracking(state["essay"]) as report:
+        started = time.perf_counter()
+        overall_result = get_overall_model().invoke(overall_prompt(state), config={"callbacks": [usage]})
 
     return {
     "overall": overall_result.final_assessment,
     "strengths": overall_result.overall_strengths,
     "weaknesses": overall_result.overall_weaknesses,
     "score": overall_result.essay_score,
+    "usage": {"overall_evaluation": queue_usage(repair_usage(call_usage("default", usage, time.perf_counter() - started), report), queued)},
     }
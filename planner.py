@@ -0,0 +1,350 @@
+"""Pre-flight token budget planner.
+
+Runs after `metadata_node`. For each execution mode it builds the prompts
+the graph would send, counts their tokens locally with tiktoken, adds an
+expected output size, and picks the richest mode that fits the per-essay
+and per-tenant budgets:
+
+- "full": one call per criterion, each with the whole essay
+- "context-scoped": criteria with a narrower `Criterion.context` only get
+  the part of the essay they need
+- "fused": a single call that evaluates every criterion at once
+
+After the overall evaluation, `planner_feedback` compares the prediction
+with the usage actually reported by each call, logs both, and uses the
+recent history to correct future estimates.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from collections import deque
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+import tiktoken
+
+from models import MODEL_PROFILES
+from nodes import (
+    evaluator_prompt, fused_prompt, fused_schema, fused_keys, fused_max_tokens, overall_prompt, wire_format, state_criteria,
+)
+from schemas import (
+    EssayState,
+    EvaluationSchema,
+    CompactEvaluationSchema,
+    AnchoredEvaluationSchema,
+    CompactAnchoredEvaluationSchema,
+    OverallEvaluationSchema,
+)
+from grammar_rules import check_essay
+from utils import build_sentence_index
+import config
+
+MODES = ("full", "context-scoped", "fused")
+
+# Typical output size per call before history-based correction
+OUTPUT_TOKENS = {
+    EvaluationSchema: 450,
+    CompactEvaluationSchema: 320,
+    AnchoredEvaluationSchema: 380,
+    CompactAnchoredEvaluationSchema: 260,
+}
+OVERALL_OUTPUT_TOKENS = 350
+
+# Chat-format framing added around each request
+MESSAGE_OVERHEAD_TOKENS = 7
+
+_lock = threading.Lock()
+_history: deque | None = None
+
+
+# ----------------------- TOKEN COUNTING -----------------------
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # BPE files are fetched on first use; offline hosts without a
+        # tiktoken cache fall back to the character heuristic below.
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+@lru_cache(maxsize=None)
+def schema_tokens(schema, model: str) -> int:
+    # The JSON schema travels in response_format and is billed as input
+    return count_tokens(json.dumps(schema.model_json_schema()), model)
+
+
+# ----------------------- CALIBRATION HISTORY -----------------------
+
+def _load_history() -> deque:
+    global _history
+    if _history is None:
+        _history = deque(maxlen=500)
+        if config.PLANNER_LOG_PATH and os.path.exists(config.PLANNER_LOG_PATH):
+            with open(config.PLANNER_LOG_PATH, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        _history.append(json.loads(line))
+    return _history
+
+
+def correction_factors() -> dict[str, float]:
+    """Mean actual/predicted ratio of recent calls, for input and output tokens."""
+
+    factors = {}
+    with _lock:
+        rows = list(_load_history())
+
+    for kind in ("input_tokens", "output_tokens"):
+        ratios = [
+            r["actual"][kind] / r["predicted"][kind]
+            for r in rows
+            if r["predicted"].get(kind) and r["actual"].get(kind)
+        ]
+        factors[kind] = sum(ratios) / len(ratios) if ratios else 1.0
+
+    return factors
+
+
+# ----------------------- ESTIMATION -----------------------
+
+def _estimate(profile: str, prompt: str, schema, output_tokens: int, factors: dict, max_tokens: int | None = None) -> dict:
+    """Predicted usage of one call; "max_tokens" is the output cap it will run with.
+
+    The output is not clamped to the cap: a prediction above it means the
+    response would be cut off, and `planner_node` rejects the mode.
+    """
+
+    p = MODEL_PROFILES[profile]
+    input_tokens = round(
+        (count_tokens(prompt, p.model) + schema_tokens(schema, p.model) + MESSAGE_OVERHEAD_TOKENS)
+        * factors["input_tokens"]
+    )
+    output_tokens = round(output_tokens * factors["output_tokens"])
+
+    return {
+        "profile": profile,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "max_tokens": max_tokens or p.max_tokens,
+        "cost_usd": round(p.cost(input_tokens, output_tokens), 6),
+    }
+
+
+def _placeholder_evaluations(criteria) -> dict:
+    feedback = " ".join(["feedback"] * 45)
+    return {c.key: EvaluationSchema(rating="Average", feedback=feedback, annotations=[]) for c in criteria}
+
+
+def prepass_state(state: EssayState) -> dict:
+    """`state` with the sentence index and rule findings, reusing those already computed."""
+
+    if "sentences" in state and ("rule_annotations" in state or not config.GRAMMAR_PREPASS):
+        return state
+
+    sentences = state.get("sentences") or build_sentence_index(state["essay"])
+    rules = state.get("rule_annotations")
+    if rules is None:
+        rules = check_essay(state["essay"], sentences) if config.GRAMMAR_PREPASS else []
+    return {**state, "sentences": sentences, "rule_annotations": rules}
+
+
+def estimate_calls(state: EssayState, mode: str) -> dict[str, dict]:
+    """Predicted tokens and cost of every model call `mode` would make."""
+
+    plan_state = {**prepass_state(state), "plan": {"mode": mode}}
+    schema, output_note = wire_format()
+    factors = correction_factors()
+    criteria = state_criteria(state)
+    calls = {}
+
+    if mode == "fused":
+        calls["fused"] = _estimate(
+            "default",
+            fused_prompt(plan_state) + output_note,
+            fused_schema(schema, fused_keys(state)),
+            OUTPUT_TOKENS[schema] * len(criteria),
+            factors,
+            fused_max_tokens(criteria),
+        )
+    else:
+        for c in criteria:
+            calls[c.key] = _estimate(
+                c.model_profile,
+                evaluator_prompt(c, plan_state) + output_note,
+                schema,
+                OUTPUT_TOKENS[schema],
+                factors,
+            )
+
+    if not config.FAST_MODE and not state.get("skip_overall"):
+        calls["overall_evaluation"] = _estimate(
+            "default",
+            overall_prompt({**plan_state, "evaluations": _placeholder_evaluations(criteria)}),
+            OverallEvaluationSchema,
+            OVERALL_OUTPUT_TOKENS,
+            factors,
+        )
+
+    return calls
+
+
+def totals(calls: dict[str, dict]) -> dict:
+    return {
+        "input_tokens": sum(c["input_tokens"] for c in calls.values()),
+        "output_tokens": sum(c["output_tokens"] for c in calls.values()),
+        "cost_usd": round(sum(c["cost_usd"] for c in calls.values()), 6),
+    }
+
+
+# ----------------------- BUDGETS -----------------------
+
+@lru_cache(maxsize=1)
+def _tenant_budgets() -> dict[str, float]:
+    if not config.TENANT_BUDGETS_PATH:
+        return {}
+    with open(config.TENANT_BUDGETS_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+LEDGER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spend (
+    day TEXT NOT NULL,
+    tenant TEXT NOT NULL,
+    spent REAL NOT NULL,
+    PRIMARY KEY (day, tenant)
+) WITHOUT ROWID;
+"""
+
+
+@contextmanager
+def _ledger():
+    # Shared by every app and worker process: charges are added in SQL, never rewritten
+    db = sqlite3.connect(config.TENANT_LEDGER_PATH, timeout=30, isolation_level=None)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(LEDGER_SCHEMA)
+        yield db
+    finally:
+        db.close()
+
+
+def tenant_remaining(tenant: str | None) -> float | None:
+    """USD left in today's budget for `tenant`, or None if it has no budget."""
+
+    budget = _tenant_budgets().get(tenant) if tenant else None
+    if budget is None:
+        return None
+
+    with _ledger() as db:
+        row = db.execute("SELECT spent FROM spend WHERE day = ? AND tenant = ?", (date.today().isoformat(), tenant)).fetchone()
+
+    return budget - (row[0] if row else 0.0)
+
+
+def charge_tenant(tenant: str | None, cost_usd: float):
+
+    if not tenant or tenant not in _tenant_budgets():
+        return
+
+    with _ledger() as db:
+        db.execute(
+            "INSERT INTO spend (day, tenant, spent) VALUES (?, ?, ?) "
+            "ON CONFLICT (day, tenant) DO UPDATE SET spent = spent + excluded.spent",
+            (date.today().isoformat(), tenant, cost_usd),
+        )
+
+
+def _over_budget(calls: dict[str, dict], predicted: dict, remaining: float | None) -> str | None:
+
+    if any(c["max_tokens"] and c["output_tokens"] > c["max_tokens"] for c in calls.values()):
+        return "output above max_tokens"
+    if config.ESSAY_TOKEN_BUDGET and predicted["input_tokens"] + predicted["output_tokens"] > config.ESSAY_TOKEN_BUDGET:
+        return "per-essay token budget"
+    if config.ESSAY_COST_BUDGET and predicted["cost_usd"] > config.ESSAY_COST_BUDGET:
+        return "per-essay cost budget"
+    if remaining is not None and predicted["cost_usd"] > remaining:
+        return "tenant budget"
+    return None
+
+
+# ----------------------- GRAPH NODES -----------------------
+
+def planner_node(state: EssayState):
+
+    tenant = state.get("tenant")
+    remaining = tenant_remaining(tenant)
+    modes = MODES if config.PLAN_MODE == "auto" else (config.PLAN_MODE,)
+
+    reasons = {}
+
+    for mode in modes:
+        calls = estimate_calls(state, mode)
+        predicted = totals(calls)
+        reason = _over_budget(calls, predicted, remaining)
+        if reason is None:
+            return {
+                "plan": {
+                    "mode": mode,
+                    "tenant": tenant,
+                    "predicted": predicted,
+                    "calls": calls,
+                }
+            }
+        reasons[mode] = reason
+
+    return {
+        "overall": "This essay cannot be evaluated within the current usage budget. Please try a shorter essay or contact your administrator.",
+        "strengths": [],
+        "weaknesses": [],
+        "plan": {"mode": None, "tenant": tenant, "rejected": reasons},
+    }
+
+
+def planner_feedback(state: EssayState):
+    """Record predicted vs actual usage, charge the tenant, and learn from the error."""
+
+    plan = state.get("plan") or {}
+    usage = state.get("usage") or {}
+    calls = plan.get("calls", {})
+
+    rows = []
+    for name, predicted in calls.items():
+        actual = usage.get(name)
+        if not actual:
+            continue
+        rows.append({
+            "call": name,
+            "mode": plan["mode"],
+            "predicted": {k: predicted[k] for k in ("input_tokens", "output_tokens")},
+            "actual": {k: actual[k] for k in ("input_tokens", "output_tokens")},
+        })
+
+    actual_totals = totals({name: usage[name] for name in usage})
+
+    with _lock:
+        history = _load_history()
+        history.extend(rows)
+        if config.PLANNER_LOG_PATH and rows:
+            os.makedirs(os.path.dirname(config.PLANNER_LOG_PATH) or ".", exist_ok=True)
+            with open(config.PLANNER_LOG_PATH, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row) + "\n")
+
+    charge_tenant(plan.get("tenant"), actual_totals["cost_usd"])
+
+    return {"plan": {**plan, "actual": actual_totals}}
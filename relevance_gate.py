@@ -0,0 +1,227 @@
+"""Local off-topic gate, run after `metadata_node` and before any model call.
+
+relevance = w * cosine(topic, essay) + (1 - w) * topic term coverage
+
+Both sides are hashed term vectors (stemmed unigrams and bigrams, NumPy
+`bincount` into a fixed number of buckets); coverage is the share of the
+topic's terms that appear anywhere in the essay. Essays scoring below
+`threshold` are flagged. What happens next depends on RELEVANCE_GATE:
+
+- "flag": continue as usual; the result carries the flag for the UI
+- "stop": reject before the fan-out, like an essay that is too short
+- "relevance": run only the relevance criterion on a cheap profile; stop
+  if it confirms Poor relevance, otherwise evaluate the essay fully
+
+`w` and `threshold` are calibrated on a labeled sample:
+
+    python -m relevance_gate labeled.jsonl --out relevance_gate.json
+"""
+
+import argparse
+import json
+import os
+import re
+import zlib
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+from criteria_registry import CRITERIA
+from nodes import evaluator_prompt, run_evaluation, wire_format
+from schemas import EssayState
+from scoring import ScoringWeights, local_score
+import config
+
+DIM = 1 << 16
+
+# Criterion the "relevance" action runs on its own
+GATE_CRITERION = "relevance_focus"
+
+OFF_TOPIC_MESSAGE = "This essay does not appear to address the given topic. UPSC essays must respond directly to the topic; please check that you have answered the question asked."
+
+STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have having
+he her here hers herself him himself his how i if in into is it its itself just let may me might more most
+must my myself no nor not now of off on once only or other ought our ours ourselves out over own same
+shall she should so some such than that the their theirs them themselves then there these they this those
+through to too under until up upon very was we were what when where which while who whom why will with
+would you your yours yourself yourselves one every many much well yet thus hence therefore however
+""".split())
+
+_WORD_RE = re.compile(r"[a-z]+")
+_SUFFIXES = ("ations", "ation", "ments", "ment", "ings", "ing", "ness", "ies", "ity", "es", "ed", "al", "ly", "s")
+
+
+def _stem(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text: str) -> list[str]:
+    stems = [_stem(w) for w in _WORD_RE.findall(text.lower()) if len(w) > 2 and w not in STOPWORDS]
+    return stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+
+
+def hashed_vector(items: list[str], dim: int = DIM) -> np.ndarray:
+    """Unit-length sublinear term-frequency vector over `dim` (a power of two) hashed buckets."""
+
+    # crc32 rather than hash(): buckets must not change between processes
+    idx = np.fromiter((zlib.crc32(t.encode()) & (dim - 1) for t in items), dtype=np.int64, count=len(items))
+    v = np.log1p(np.bincount(idx, minlength=dim).astype(np.float32))
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def relevance_features(topic: str, essay: str) -> tuple[float, float]:
+    """(cosine similarity, topic term coverage) between topic and essay."""
+
+    topic_terms = terms(topic)
+    essay_terms = terms(essay)
+
+    cosine = float(hashed_vector(topic_terms) @ hashed_vector(essay_terms))
+
+    topic_words = {t for t in topic_terms if " " not in t}
+    coverage = len(topic_words & set(essay_terms)) / len(topic_words) if topic_words else 1.0
+
+    return cosine, coverage
+
+
+@dataclass
+class RelevanceGate:
+    cosine_weight: float = 0.5
+    threshold: float = 0.15
+
+    @classmethod
+    def load(cls, path: str | None = None) -> "RelevanceGate":
+        path = path or config.RELEVANCE_GATE_PATH
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return cls(**json.load(f))
+        return cls()
+
+    def score(self, topic: str, essay: str) -> float:
+        cosine, coverage = relevance_features(topic, essay)
+        return self.cosine_weight * cosine + (1 - self.cosine_weight) * coverage
+
+
+# ----------------------- GRAPH NODES -----------------------
+
+def relevance_gate_node(state: EssayState):
+
+    if config.RELEVANCE_GATE == "off":
+        return {}
+
+    gate = RelevanceGate.load()
+    score = gate.score(state["topic"], state["essay"])
+    off_topic = score < gate.threshold
+
+    relevance = {"score": round(score, 4), "threshold": gate.threshold, "off_topic": off_topic}
+
+    if off_topic and config.RELEVANCE_GATE == "stop":
+        return {
+            "overall": OFF_TOPIC_MESSAGE,
+            "evaluations": {},
+            "strengths": [],
+            "weaknesses": [],
+            "relevance": relevance,
+        }
+
+    return {"relevance": relevance}
+
+
+def relevance_check(state: EssayState):
+    """Cheap relevance-only evaluation of an essay the gate flagged.
+
+    A Poor rating confirms the flag and produces the final result here;
+    anything else sends the essay on to the full evaluation.
+    """
+
+    criterion = next(c for c in CRITERIA if c.key == GATE_CRITERION)
+    schema, output_note = wire_format()
+    prompt = evaluator_prompt(criterion, state) + output_note
+
+    response, usage = run_evaluation(
+        criterion.key, config.RELEVANCE_GATE_PROFILE, schema, prompt, config.STREAM_EVALUATIONS, state
+    )
+
+    confirmed = response.rating == "Poor"
+    update = {
+        "usage": {"relevance_check": usage},
+        "relevance": {**state["relevance"], "confirmed": confirmed},
+    }
+
+    if not confirmed:
+        return update  # the full evaluation rates relevance again
+
+    evaluations = {criterion.key: response}
+
+    return {
+        **update,
+        "evaluations": evaluations,
+        "overall": f"{OFF_TOPIC_MESSAGE}\n\n{response.feedback}",
+        "strengths": [],
+        "weaknesses": [response.feedback],
+        "score": local_score(evaluations, ScoringWeights.load()),
+    }
+
+
+def gated(state: EssayState) -> bool:
+    """Whether the flagged essay should only get the cheap relevance check."""
+    return config.RELEVANCE_GATE == "relevance" and (state.get("relevance") or {}).get("off_topic", False)
+
+
+# ----------------------- CALIBRATION -----------------------
+
+def calibrate(samples: list[dict], max_false_flag: float = 0.02) -> tuple[RelevanceGate, dict]:
+    """Fit the cosine weight and threshold on essays labeled "on_topic": true/false.
+
+    The threshold flags at most `max_false_flag` of the on-topic essays;
+    the weight is the one that then catches the most off-topic essays.
+    """
+
+    features = np.array([relevance_features(s["topic"], s["essay"]) for s in samples])
+    labels = np.array([bool(s["on_topic"]) for s in samples])
+
+    if labels.all() or not labels.any():
+        raise ValueError("Need both on-topic and off-topic samples")
+
+    best = None
+
+    for w in np.linspace(0, 1, 21):
+        scores = w * features[:, 0] + (1 - w) * features[:, 1]
+        threshold = float(np.quantile(scores[labels], max_false_flag, method="lower"))
+        caught = float(np.mean(scores[~labels] < threshold))
+        false_flag = float(np.mean(scores[labels] < threshold))
+        if best is None or caught > best[1]["off_topic_caught"]:
+            gate = RelevanceGate(cosine_weight=round(float(w), 2), threshold=round(threshold, 4))
+            best = (gate, {"off_topic_caught": caught, "on_topic_flagged": false_flag})
+
+    return best
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Calibrate the off-topic gate")
+    parser.add_argument("samples", help='JSONL with "topic", "essay" and boolean "on_topic"')
+    parser.add_argument("--max-false-flag", type=float, default=0.02, help="Allowed share of on-topic essays flagged")
+    parser.add_argument("--out", default="relevance_gate.json")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    gate, rates = calibrate(samples, args.max_false_flag)
+
+    print(f"Calibrated on {len(samples)} essays: cosine_weight {gate.cosine_weight}, threshold {gate.threshold}")
+    print(f"Off-topic caught {rates['off_topic_caught']:.0%}, on-topic flagged {rates['on_topic_flagged']:.0%}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(asdict(gate), f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
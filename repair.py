@@ -0,0 +1,345 @@
+"""Local repair of structured model outputs.
+
+Model responses are parsed here instead of inside the API client, so a
+slightly broken answer can be fixed without sending the whole essay again:
+
+- lenient JSON: code fences, surrounding prose, trailing commas and
+  truncated output are tolerated
+- enum normalization: case, prefixes and common synonyms are mapped onto
+  the allowed `Literal` values (e.g. "major" -> "error", "good" -> "Good")
+- quote trimming: annotation quotes longer than 15 words, or not found
+  verbatim, are cut down to the longest window that appears in the essay
+- score clamping: `essay_score` is coerced to an int in 0-100
+
+Only output that is still invalid after this triggers a new request.
+"""
+
+import json
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Literal, get_args, get_origin
+
+from pydantic import BaseModel, ValidationError
+
+from schemas import Annotation, CompactAnnotation, OverallEvaluationSchema
+import config
+
+MAX_QUOTE_WORDS = 15
+
+# Output cap of a call re-requested after hitting max_tokens (twice the tokens
+# the cut-off answer used, at most this)
+MAX_RETRY_OUTPUT_TOKENS = 16384
+
+# Model classes whose field holds a verbatim essay quote
+QUOTE_FIELDS = {Annotation: "quote", CompactAnnotation: "q"}
+
+# Model classes whose field holds the 0-100 essay score
+SCORE_FIELDS = {OverallEvaluationSchema: "essay_score"}
+
+ENUM_SYNONYMS = {
+    "major": "error",
+    "critical": "error",
+    "high": "error",
+    "minor": "warning",
+    "low": "warning",
+    "very good": "Good",
+    "fair": "Average",
+    "satisfactory": "Average",
+    "mediocre": "Average",
+    "weak": "Poor",
+    "bad": "Poor",
+}
+
+
+class IrreparableOutput(ValueError):
+    """Output that could not be repaired into the expected schema."""
+
+
+# ----------------------- PER-CALL REPORTS AND COUNTERS -----------------------
+
+@dataclass
+class RepairReport:
+    essay: str = ""
+    fixes: list[str] = field(default_factory=list)
+    retries: int = 0
+
+    @property
+    def repaired(self) -> bool:
+        return bool(self.fixes)
+
+
+_current: ContextVar[RepairReport | None] = ContextVar("repair_report", default=None)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+@contextmanager
+def tracking(essay: str = ""):
+    """Collect the repairs and retries of calls made inside the block.
+
+    `essay` enables quote trimming for annotations returned in the block.
+    """
+    report = RepairReport(essay=essay)
+    token = _current.set(report)
+    try:
+        yield report
+    finally:
+        _current.reset(token)
+
+
+def _count(*keys: str):
+    with _stats_lock:
+        for key in keys:
+            _stats[key] += 1
+
+
+def stats() -> dict[str, int]:
+    """Process-wide counters: calls, clean, repaired, retried, truncated, failed, fix:<kind>."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+# ----------------------- REPAIR STEPS -----------------------
+
+def parse_lenient(text: str, fixes: list[str]) -> dict:
+
+    text = (text or "").strip()
+
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            return data
+    except json.JSONDecodeError:
+        pass
+
+    fixes.append("json")
+
+    fenced = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+
+    start = text.find("{")
+    if start == -1:
+        raise IrreparableOutput("No JSON object in model output")
+    text = text[start:text.rfind("}") + 1 or len(text)]
+    text = re.sub(r",\s*([}\]])", r"\1", text)
+
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        from langchain_core.utils.json import parse_partial_json
+
+        data = parse_partial_json(text)  # closes truncated strings, lists and objects
+
+    if not isinstance(data, dict):
+        raise IrreparableOutput("Model output is not a JSON object")
+
+    return data
+
+
+def normalize_enum(value, allowed: tuple):
+
+    if value in allowed or not isinstance(value, str):
+        return value
+
+    v = value.strip().lower()
+
+    for a in allowed:
+        if a.lower() == v:
+            return a
+
+    synonym = ENUM_SYNONYMS.get(v)
+    if synonym in allowed:
+        return synonym
+
+    candidates = [a for a in allowed if a.lower().startswith(v) or v.startswith(a.lower())]
+    if len(candidates) == 1:
+        return candidates[0]
+
+    return value
+
+
+def trim_quote(quote: str, essay: str) -> str:
+
+    words = quote.split()
+
+    if len(words) <= MAX_QUOTE_WORDS and (not essay or quote in essay):
+        return quote
+
+    if essay:
+        for n in range(min(MAX_QUOTE_WORDS, len(words)), 2, -1):
+            for i in range(len(words) - n + 1):
+                candidate = " ".join(words[i:i + n])
+                if candidate in essay:
+                    return candidate
+
+    return " ".join(words[:MAX_QUOTE_WORDS])
+
+
+def clamp_score(value) -> int:
+    if isinstance(value, str):
+        match = re.search(r"-?\d+(?:\.\d+)?", value)
+        if not match:
+            raise IrreparableOutput(f"Unreadable score: {value!r}")
+        value = match.group()
+    return max(0, min(100, round(float(value))))
+
+
+def _model_of(annotation):
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def normalize(data: dict, model: type[BaseModel], essay: str, fixes: list[str]) -> dict:
+    """Recursively normalize `data` towards `model` before validation."""
+
+    for name, info in model.model_fields.items():
+
+        if name not in data:
+            if get_origin(info.annotation) is list:
+                data[name] = []
+                fixes.append("missing_list")
+            continue
+
+        value = data[name]
+        annotation = info.annotation
+        origin = get_origin(annotation)
+
+        if origin is Literal:
+            fixed = normalize_enum(value, get_args(annotation))
+            if fixed != value:
+                data[name] = fixed
+                fixes.append("enum")
+
+        elif _model_of(annotation) and isinstance(value, dict):
+            normalize(value, annotation, essay, fixes)
+
+        elif origin is list and _model_of(get_args(annotation)[0]) and isinstance(value, list):
+            item_model = get_args(annotation)[0]
+            for item in value:
+                if isinstance(item, dict):
+                    normalize(item, item_model, essay, fixes)
+
+    quote_field = QUOTE_FIELDS.get(model)
+    if quote_field and isinstance(data.get(quote_field), str):
+        trimmed = trim_quote(data[quote_field], essay)
+        if trimmed != data[quote_field]:
+            data[quote_field] = trimmed
+            fixes.append("quote")
+
+    score_field = SCORE_FIELDS.get(model)
+    if score_field and score_field in data:
+        clamped = clamp_score(data[score_field])
+        if clamped != data[score_field]:
+            data[score_field] = clamped
+            fixes.append("score")
+
+    return data
+
+
+def repair_data(data: dict, schema: type[BaseModel], essay: str = "", fixes: list[str] | None = None):
+    """Normalize and validate an already-parsed dict."""
+
+    fixes = [] if fixes is None else fixes
+
+    try:
+        return schema.model_validate(normalize(data, schema, essay, fixes))
+    except ValidationError as e:
+        raise IrreparableOutput(str(e)) from e
+
+
+def repair_output(text: str, schema: type[BaseModel], essay: str = ""):
+    """Parse raw model text into `schema`; returns (instance, list of fixes)."""
+
+    fixes = []
+    data = parse_lenient(text, fixes)
+    return repair_data(data, schema, essay, fixes), fixes
+
+
+def record(fixes: list[str]):
+    """Count one successfully parsed call and report its fixes to the active tracker."""
+
+    report = _current.get()
+    if fixes:
+        _count("calls", "repaired", *(f"fix:{kind}" for kind in fixes))
+        if report is not None:
+            report.fixes.extend(fixes)
+    else:
+        _count("calls", "clean")
+
+
+def record_retry():
+    report = _current.get()
+    _count("retried")
+    if report is not None:
+        report.retries += 1
+
+
+def current_essay() -> str:
+    report = _current.get()
+    return report.essay if report is not None else ""
+
+
+# ----------------------- MODEL WRAPPER -----------------------
+
+class RepairingModel:
+    """Structured-output runnable that parses and repairs locally.
+
+    `runnable` returns a raw AIMessage whose content is JSON for `schema`.
+    Irreparable output is re-requested up to REPAIR_MAX_RETRIES times. So is
+    output cut off at max_tokens, with twice the budget: repairing it would
+    silently drop the rest of the answer. The last attempt is repaired even
+    if it was cut off.
+    """
+
+    def __init__(self, runnable, schema):
+        self.runnable = runnable
+        self.schema = schema
+
+    def invoke(self, prompt, config=None, **kwargs):
+        from langchain_core.exceptions import OutputParserException
+
+        error = None
+        retries = _max_retries()
+
+        for attempt in range(retries + 1):
+
+            if attempt:
+                record_retry()
+
+            message = self.runnable.invoke(prompt, config=config, **kwargs)
+            text = message.content
+            refusal = message.additional_kwargs.get("refusal")
+
+            if message.response_metadata.get("finish_reason") == "length" and attempt < retries:
+                _count("truncated")
+                used = (message.usage_metadata or {}).get("output_tokens")
+                kwargs = {**kwargs, "max_tokens": min(2 * used, MAX_RETRY_OUTPUT_TOKENS) if used else MAX_RETRY_OUTPUT_TOKENS}
+                error = IrreparableOutput(f"Output cut off at {used or 'max'} tokens")
+                continue
+
+            if refusal:
+                error = IrreparableOutput(f"Model refused: {refusal}")
+                continue
+
+            try:
+                result, fixes = repair_output(text, self.schema, current_essay())
+            except IrreparableOutput as e:
+                error = e
+                continue
+
+            record(fixes)
+            return result
+
+        _count("calls", "failed")
+        raise OutputParserException(f"Irreparable {self.schema.__name__} output: {error}")
+
+
+def _max_retries() -> int:
+    return config.REPAIR_MAX_RETRIES
@@ -0,0 +1,203 @@
+"""Compact, shared storage of finished results for Streamlit sessions.
+
+A session keeps only a handle (`st.session_state.result_handle`); the result
+itself lives once per process in a byte-capped LRU as a packed blob:
+annotations of all criteria stored column-wise (one list per field instead
+of one object per annotation), the rest of the state as plain values, all
+msgpack-encoded and zstd-compressed. `get` decodes it into a fresh dict for
+the current script run, with evaluations rebuilt as models without
+re-validation.
+
+When the cache exceeds RESULT_CACHE_MB, least recently used results are
+spilled to RESULT_SPILL_DIR and read back on their next access, so an idle
+session never loses its result; spill files of sessions that never came
+back are removed after RESULT_SPILL_MAX_AGE_S.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import ormsgpack
+import zstandard
+from pydantic import BaseModel
+
+from schemas import Annotation, EvaluationSchema
+import config
+
+FORMAT_VERSION = 1
+
+ANNOTATION_FIELDS = tuple(Annotation.model_fields)
+EVALUATION_FIELDS = tuple(f for f in EvaluationSchema.model_fields if f != "annotations")
+
+
+# ----------------------- PACKING -----------------------
+
+def _encode(value):
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Cannot pack {type(value).__name__}")
+
+
+def _columns(annotations) -> dict[str, list]:
+    return {field: [getattr(a, field) for a in annotations] for field in ANNOTATION_FIELDS}
+
+
+def _rows(columns: dict[str, list], start: int = 0, stop: int | None = None) -> list[Annotation]:
+    values = [columns[field][start:stop] for field in ANNOTATION_FIELDS]
+    return [Annotation.model_construct(**dict(zip(ANNOTATION_FIELDS, row))) for row in zip(*values)]
+
+
+def pack(result: dict) -> bytes:
+    """Compact binary form of a result; inverse of `unpack`."""
+
+    evaluations = result.get("evaluations") or {}
+    annotations = [a for e in evaluations.values() for a in e.annotations]
+
+    payload = {
+        "v": FORMAT_VERSION,
+        "state": {k: v for k, v in result.items() if k not in ("evaluations", "rule_annotations")},
+        # key -> [fields..., annotation count]; annotations follow in key order
+        "evaluations": {
+            key: [getattr(e, f) for f in EVALUATION_FIELDS] + [len(e.annotations)] for key, e in evaluations.items()
+        },
+        "annotations": _columns(annotations),
+        "rules": _columns(result["rule_annotations"]) if result.get("rule_annotations") else None,
+    }
+    compressed = zstandard.ZstdCompressor(level=1).compress(
+        ormsgpack.packb(payload, default=_encode, option=ormsgpack.OPT_NON_STR_KEYS)
+    )
+    # Copy into an exact-size object: the compressor's output buffer is sized
+    # for the worst case, and keeping it would hold several times the data
+    return bytes(memoryview(compressed))
+
+
+def unpack(data: bytes) -> dict:
+
+    payload = ormsgpack.unpackb(zstandard.ZstdDecompressor().decompress(data))
+    if payload["v"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed result version {payload['v']}")
+
+    result = payload["state"]
+    columns = payload["annotations"]
+
+    evaluations, start = {}, 0
+    for key, values in payload["evaluations"].items():
+        *fields, count = values
+        evaluations[key] = EvaluationSchema.model_construct(
+            **dict(zip(EVALUATION_FIELDS, fields)), annotations=_rows(columns, start, start + count)
+        )
+        start += count
+    result["evaluations"] = evaluations
+
+    if payload["rules"]:
+        result["rule_annotations"] = _rows(payload["rules"])
+    return result
+
+
+# ----------------------- CACHE -----------------------
+
+class ResultCache:
+
+    def __init__(self, max_bytes: int, spill_dir: str):
+
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counts = {"hits": 0, "spilled": 0, "reloaded": 0, "missing": 0}
+        os.makedirs(spill_dir, exist_ok=True)
+        self._prune_spill()
+        self._pruned_at = time.monotonic()
+
+    def _spill_path(self, handle: str) -> str:
+        return os.path.join(self.spill_dir, f"{handle}.bin")
+
+    def _admit(self, handle: str, data: bytes):
+        # Caller holds the lock
+        old = self._entries.pop(handle, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._entries[handle] = data
+        self._bytes += len(data)
+
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            victim, victim_data = self._entries.popitem(last=False)
+            self._bytes -= len(victim_data)
+            with open(self._spill_path(victim), "wb") as f:
+                f.write(victim_data)
+            self._counts["spilled"] += 1
+
+    def put(self, result: dict, handle: str | None = None) -> str:
+        """Store `result` (under `handle`, replacing it, or a new one); returns the handle."""
+
+        handle = handle or uuid.uuid4().hex
+        data = pack(result)
+        with self._lock:
+            self._admit(handle, data)
+
+        if time.monotonic() - self._pruned_at > 3600:
+            self._pruned_at = time.monotonic()
+            self._prune_spill()
+        return handle
+
+    def get(self, handle: str) -> dict | None:
+        """A fresh copy of the result, or None if it is unknown (or expired from the spill directory)."""
+
+        with self._lock:
+            data = self._entries.get(handle)
+            if data is not None:
+                self._entries.move_to_end(handle)
+                self._counts["hits"] += 1
+            else:
+                try:
+                    with open(self._spill_path(handle), "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    self._counts["missing"] += 1
+                    return None
+                os.remove(self._spill_path(handle))
+                self._admit(handle, data)
+                self._counts["reloaded"] += 1
+
+        return unpack(data)
+
+    def discard(self, handle: str):
+        with self._lock:
+            data = self._entries.pop(handle, None)
+            if data is not None:
+                self._bytes -= len(data)
+        try:
+            os.remove(self._spill_path(handle))
+        except FileNotFoundError:
+            pass
+
+    def _prune_spill(self):
+        cutoff = time.time() - config.RESULT_SPILL_MAX_AGE_S
+        for entry in os.scandir(self.spill_dir):
+            if entry.name.endswith(".bin") and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "max_bytes": self.max_bytes, **self._counts}
+
+
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResultCache:
+    """The process-wide cache shared by every session."""
+
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(int(config.RESULT_CACHE_MB * 2**20), config.RESULT_SPILL_DIR)
+        return _cache
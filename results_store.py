@@ -0,0 +1,465 @@
+"""Append-only columnar store of graded results, for history and dashboards.
+
+Layout under RESULTS_STORE_PATH:
+
+    segments/<date>/<name>.parquet   one row per result: student, tenant, topic,
+                                     date, score, per-criterion rating (4 =
+                                     Excellent ... 1 = Poor) and error/warning
+                                     counts, word count, timings and cost
+    blobs/<date>-<host>-<pid>.zst    full results (annotations, feedback, final
+                                     report), one zstd frame each
+    catalog.db                       live segments per date, the segments that
+                                     hold each student, topic and tenant, and
+                                     where each result's blob is
+
+Queries take the segments from the catalog (date range, then student, topic
+and tenant postings) and read only the columns they need; segments are
+sorted by student and topic, so Parquet row-group statistics skip the rest.
+Every append writes a small segment (level 0). In a background thread,
+once a date has RESULTS_COMPACT_SEGMENTS segments of one level under
+RESULTS_COMPACT_ROWS rows, they are merged into one segment of the next
+level, so each row is rewritten only once per level. Merged segments stay
+on disk for RETIRE_GRACE_S so that running queries can finish reading them.
+
+    python -m results_store history STUDENT
+    python -m results_store stats --by topic --since 2026-01-01
+    python -m results_store compact
+"""
+
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import zstandard
+
+from criteria_registry import CRITERIA
+from jobs import dump_result, load_result
+from scoring import severity_counts
+import config
+
+logger = logging.getLogger(__name__)
+
+RATING_VALUES = {"Excellent": 4, "Good": 3, "Average": 2, "Poor": 1}
+
+# Seconds a merged-away segment is kept for queries that already listed it
+RETIRE_GRACE_S = 300
+ROW_GROUP_SIZE = 65536
+SORT_KEYS = [("student", "ascending"), ("topic", "ascending"), ("created", "ascending")]
+
+# Catalog columns with a posting list per value
+POSTED = ("student", "topic", "tenant")
+
+CATALOG = """
+CREATE TABLE IF NOT EXISTS segments (
+    name TEXT PRIMARY KEY,
+    date TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    level INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    retired REAL
+);
+CREATE INDEX IF NOT EXISTS segments_date ON segments (date, retired);
+CREATE TABLE IF NOT EXISTS postings (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    PRIMARY KEY (kind, key, segment)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_segment ON postings (segment);
+CREATE TABLE IF NOT EXISTS payloads (
+    id TEXT PRIMARY KEY,
+    blob TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    length INTEGER NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Columns added to catalogs created before them
+MIGRATIONS = {"level": "INTEGER NOT NULL DEFAULT 0"}
+
+
+def schema() -> pa.Schema:
+    """Row schema; one rating and two annotation-count columns per registered criterion."""
+
+    fields = [
+        ("id", pa.string()),
+        ("student", pa.string()),
+        ("tenant", pa.string()),
+        ("topic", pa.string()),
+        ("date", pa.date32()),
+        ("created", pa.timestamp("s", tz="UTC")),
+        ("score", pa.int16()),
+        ("criteria", pa.int8()),
+        ("word_count", pa.int32()),
+        ("annotations", pa.int32()),
+        ("wall_s", pa.float32()),
+        ("model_s", pa.float32()),
+        ("queue_s", pa.float32()),
+        ("cost_usd", pa.float32()),
+    ]
+    for c in CRITERIA:
+        fields += [(f"rating_{c.key}", pa.int8()), (f"errors_{c.key}", pa.int16()), (f"warnings_{c.key}", pa.int16())]
+    return pa.schema(fields)
+
+
+def result_row(result: dict, student: str | None = None, tenant: str | None = None,
+               wall_s: float | None = None, created: float | None = None) -> dict:
+    """The columnar row for one graded result."""
+
+    evaluations = result.get("evaluations") or {}
+    usage = list((result.get("usage") or {}).values())
+    created = datetime.fromtimestamp(created or time.time(), timezone.utc)
+
+    row = {
+        "id": uuid.uuid4().hex,
+        "student": student or None,
+        "tenant": tenant or result.get("tenant") or None,
+        "topic": result["topic"],
+        "date": created.date(),
+        "created": created,
+        "score": result.get("score"),
+        "criteria": len(evaluations),
+        "word_count": (result.get("metadata") or {}).get("word_count"),
+        "annotations": sum(len(e.annotations) for e in evaluations.values()),
+        "wall_s": wall_s,
+        "model_s": sum(u.get("latency_s", 0.0) for u in usage),
+        "queue_s": sum(u.get("queue_s", 0.0) for u in usage),
+        "cost_usd": sum(u.get("cost_usd", 0.0) for u in usage),
+    }
+    for key, evaluation in evaluations.items():
+        counts = severity_counts(evaluation)
+        row[f"rating_{key}"] = RATING_VALUES.get(evaluation.rating)
+        row[f"errors_{key}"] = counts["error"]
+        row[f"warnings_{key}"] = counts["warning"]
+    return row
+
+
+def _day(value) -> date | None:
+    return value if value is None or isinstance(value, date) else date.fromisoformat(str(value))
+
+
+# ----------------------- STORE -----------------------
+
+class ResultsStore:
+
+    def __init__(self, path: str | None = None):
+
+        self.path = path or config.RESULTS_STORE_PATH
+        self.schema = schema()
+        self._blob_lock = threading.Lock()
+        self._compressor = zstandard.ZstdCompressor(level=3)
+        # Compaction runs off the append path, in one thread per process
+        self._compactor: ThreadPoolExecutor | None = None
+        self._compaction: Future | None = None
+        self._compaction_lock = threading.Lock()
+        self._compact_days: set[str] = set()
+        os.makedirs(os.path.join(self.path, "segments"), exist_ok=True)
+        os.makedirs(os.path.join(self.path, "blobs"), exist_ok=True)
+
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(CATALOG)
+            columns = {row[1] for row in db.execute("PRAGMA table_info(segments)")}
+            for name, definition in MIGRATIONS.items():
+                if name not in columns:
+                    db.execute(f"ALTER TABLE segments ADD COLUMN {name} {definition}")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.path, "catalog.db"), timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def _segment_path(self, day: str, name: str) -> str:
+        return os.path.join(self.path, "segments", day, f"{name}.parquet")
+
+    def _write_segment(self, day: str, table: pa.Table) -> str:
+        name = uuid.uuid4().hex
+        os.makedirs(os.path.join(self.path, "segments", day), exist_ok=True)
+        pq.write_table(table.sort_by(SORT_KEYS), self._segment_path(day, name),
+                       row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        return name
+
+    def _write_blobs(self, day: str, payloads: list[str]) -> list[tuple[str, int, int]]:
+        # One blob file per date and process, so appends never interleave
+        blob = f"{day}-{socket.gethostname()}-{os.getpid()}.zst"
+        refs = []
+        with self._blob_lock, open(os.path.join(self.path, "blobs", blob), "ab") as f:
+            offset = f.tell()
+            for payload in payloads:
+                frame = self._compressor.compress(payload.encode("utf-8"))
+                f.write(frame)
+                refs.append((blob, offset, len(frame)))
+                offset += len(frame)
+        return refs
+
+    def append(self, entries: list[tuple[dict, str]]):
+        """Add (row, full result JSON) pairs; rows come from `result_row`."""
+
+        by_day: dict[str, list[tuple[dict, str]]] = {}
+        for row, payload in entries:
+            by_day.setdefault(row["date"].isoformat(), []).append((row, payload))
+
+        for day, day_entries in by_day.items():
+
+            rows = [row for row, _ in day_entries]
+            name = self._write_segment(day, pa.Table.from_pylist(rows, schema=self.schema))
+            refs = self._write_blobs(day, [payload for _, payload in day_entries])
+
+            # The segment becomes visible with the catalog commit
+            with self._connect() as db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute("INSERT INTO segments (name, date, rows, created) VALUES (?, ?, ?, ?)",
+                           (name, day, len(rows), time.time()))
+                db.executemany(
+                    "INSERT OR IGNORE INTO postings (kind, key, segment) VALUES (?, ?, ?)",
+                    {(kind, row[kind], name) for row in rows for kind in POSTED if row.get(kind)},
+                )
+                db.executemany(
+                    "INSERT INTO payloads (id, blob, position, length) VALUES (?, ?, ?, ?)",
+                    [(row["id"], *ref) for row, ref in zip(rows, refs)],
+                )
+                db.execute("COMMIT")
+
+            self._compact_later(day)
+
+    def _compact_later(self, day: str):
+        with self._compaction_lock:
+            self._compact_days.add(day)
+            if self._compaction is None:
+                if self._compactor is None:
+                    self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="results-compact")
+                self._compaction = self._compactor.submit(self._compact_pending)
+
+    def _compact_pending(self):
+        # Runs until no append has queued a date since the last pass
+        while True:
+            with self._compaction_lock:
+                if not self._compact_days:
+                    self._compaction = None
+                    return
+                day = self._compact_days.pop()
+            try:
+                self.compact(day, min_segments=config.RESULTS_COMPACT_SEGMENTS)
+            except Exception:
+                logger.exception("Could not compact %s segments in %s", day, self.path)
+
+    def flush(self, timeout: float | None = None):
+        """Wait until the compactions queued by appends have run."""
+        compaction = self._compaction
+        if compaction is not None:
+            compaction.result(timeout)
+
+    def compact(self, day: str | None = None, min_segments: int = 2) -> int:
+        """Merge the small segments of `day` (every date if None); returns the segments merged.
+
+        Each level is merged on its own, lowest first: `min_segments` or more
+        segments of one level under RESULTS_COMPACT_ROWS rows become one
+        segment of the next level.
+        """
+
+        with self._connect() as db:
+            days = [day] if day else [d for (d,) in db.execute("SELECT DISTINCT date FROM segments WHERE retired IS NULL")]
+
+        merged = 0
+        for d in days:
+            level = 0
+            while True:
+                with self._connect() as db:
+                    rows = db.execute(
+                        "SELECT name, level FROM segments WHERE date = ? AND retired IS NULL AND level >= ? AND rows < ?",
+                        (d, level, config.RESULTS_COMPACT_ROWS),
+                    ).fetchall()
+                if not rows:
+                    break
+                level = min(lvl for _, lvl in rows)
+                names = [n for n, lvl in rows if lvl == level]
+                if len(names) >= min_segments and self._merge(d, level, names):
+                    merged += len(names)
+                level += 1
+
+        self._remove_retired()
+        return merged
+
+    def _merge(self, day: str, level: int, names: list[str]) -> bool:
+        """Replace segments `names` of `day` with one segment of the next level; False if another merge took them."""
+
+        # The Parquet merge runs outside the write lock; only the catalog swap holds it
+        table = ds.dataset([self._segment_path(day, n) for n in names], schema=self.schema, format="parquet").to_table()
+        name = self._write_segment(day, table)
+
+        marks = ",".join("?" * len(names))
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            live = db.execute(f"SELECT COUNT(*) FROM segments WHERE retired IS NULL AND name IN ({marks})", names).fetchone()[0]
+            if live < len(names):
+                db.execute("ROLLBACK")
+                os.remove(self._segment_path(day, name))
+                return False
+
+            db.execute("INSERT INTO segments (name, date, rows, level, created) VALUES (?, ?, ?, ?, ?)",
+                       (name, day, table.num_rows, level + 1, time.time()))
+            db.execute(f"INSERT OR IGNORE INTO postings SELECT kind, key, ? FROM postings WHERE segment IN ({marks})",
+                       (name, *names))
+            db.execute(f"DELETE FROM postings WHERE segment IN ({marks})", names)
+            db.execute(f"UPDATE segments SET retired = ? WHERE name IN ({marks})", (time.time(), *names))
+            db.execute("COMMIT")
+        return True
+
+    def _remove_retired(self):
+        with self._connect() as db:
+            old = db.execute("SELECT date, name FROM segments WHERE retired < ?", (time.time() - RETIRE_GRACE_S,)).fetchall()
+            for d, name in old:
+                try:
+                    os.remove(self._segment_path(d, name))
+                except FileNotFoundError:
+                    pass
+            db.executemany("DELETE FROM segments WHERE name = ?", [(name,) for _, name in old])
+
+    # ----------------------- QUERIES -----------------------
+
+    def _segments(self, student=None, topic=None, tenant=None, since=None, until=None) -> list[str]:
+
+        query = "SELECT date, name FROM segments WHERE retired IS NULL"
+        params = []
+        if since:
+            query += " AND date >= ?"
+            params.append(_day(since).isoformat())
+        if until:
+            query += " AND date <= ?"
+            params.append(_day(until).isoformat())
+        for kind, key in (("student", student), ("topic", topic), ("tenant", tenant)):
+            if key is not None:
+                query += " AND name IN (SELECT segment FROM postings WHERE kind = ? AND key = ?)"
+                params += [kind, key]
+
+        with self._connect() as db:
+            return [self._segment_path(d, name) for d, name in db.execute(query, params)]
+
+    def query(self, columns: list[str] | None = None, student: str | None = None, topic: str | None = None,
+              tenant: str | None = None, since=None, until=None) -> pa.Table:
+        """Rows matching every given filter (dates inclusive), with only `columns` if given."""
+
+        paths = self._segments(student, topic, tenant, since, until)
+        if not paths:
+            empty = self.schema.empty_table()
+            return empty.select(columns) if columns else empty
+
+        conditions = [ds.field(name) == value for name, value in (("student", student), ("topic", topic), ("tenant", tenant)) if value is not None]
+        if since:
+            conditions.append(ds.field("date") >= _day(since))
+        if until:
+            conditions.append(ds.field("date") <= _day(until))
+
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+
+        return ds.dataset(paths, schema=self.schema, format="parquet").to_table(columns=columns, filter=condition)
+
+    def aggregate(self, by: str = "topic", **filters) -> pa.Table:
+        """Per value of `by`: result count, score mean/min/max, mean annotations and mean rating per criterion."""
+
+        ratings = [f"rating_{c.key}" for c in CRITERIA]
+        table = self.query([by, "score", "annotations", *ratings], **filters)
+        return table.group_by(by).aggregate([
+            ([], "count_all"),
+            ("score", "mean"), ("score", "min"), ("score", "max"),
+            ("annotations", "mean"),
+            *[(r, "mean") for r in ratings],
+        ]).sort_by(by)
+
+    def history(self, student: str) -> list[dict]:
+        """A student's results, oldest first."""
+        return self.query(student=student).sort_by("created").to_pylist()
+
+    def payload(self, result_id: str) -> dict | None:
+        """The full stored result (evaluations with annotations, final report)."""
+
+        with self._connect() as db:
+            ref = db.execute("SELECT blob, position, length FROM payloads WHERE id = ?", (result_id,)).fetchone()
+        if ref is None:
+            return None
+
+        blob, offset, length = ref
+        with open(os.path.join(self.path, "blobs", blob), "rb") as f:
+            f.seek(offset)
+            frame = f.read(length)
+        return load_result(zstandard.ZstdDecompressor().decompress(frame).decode("utf-8"))
+
+
+_store: ResultsStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ResultsStore | None:
+    """The process-wide store, or None when RESULTS_STORE_PATH is not set."""
+
+    global _store
+    if not config.RESULTS_STORE_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+        return _store
+
+
+def record(result: dict, student: str | None = None, tenant: str | None = None, wall_s: float | None = None) -> str | None:
+    """Store one graded result; returns its id. Failures are logged, never raised to the grader."""
+
+    store = get_store()
+    if store is None:
+        return None
+    try:
+        row = result_row(result, student, tenant, wall_s)
+        store.append([(row, dump_result(result))])
+        return row["id"]
+    except Exception:
+        logger.exception("Could not record result in %s", store.path)
+        return None
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", default=None, help="Store directory (default RESULTS_STORE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    history_parser = commands.add_parser("history", help="A student's results")
+    history_parser.add_argument("student")
+
+    stats_parser = commands.add_parser("stats", help="Aggregates per topic, tenant, student or date")
+    stats_parser.add_argument("--by", default="topic", choices=["topic", "tenant", "student", "date"])
+    for name in ("student", "topic", "tenant", "since", "until"):
+        stats_parser.add_argument(f"--{name}")
+
+    commands.add_parser("compact", help="Merge small segments")
+
+    args = parser.parse_args()
+    store = ResultsStore(args.path)
+
+    if args.command == "history":
+        for row in store.history(args.student):
+            print(f"{row['created']:%Y-%m-%d %H:%M}  {row['score'] if row['score'] is not None else '-':>3}  {row['topic']}  ({row['id']})")
+    elif args.command == "stats":
+        filters = {k: getattr(args, k) for k in ("student", "topic", "tenant", "since", "until")}
+        print(store.aggregate(args.by, **filters).to_pandas().to_string(index=False))
+    else:
+        print(f"Merged {store.compact()} segments")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""Weighted fair scheduling of model-call slots across tenants.
+
+At most LLM_SLOTS model calls run at once per process. Waiting calls are
+granted slots by priority class first (interactive before batch), then by
+weighted fair queueing within the class: each call gets a virtual finish
+tag of max(virtual time, tenant's last tag) + 1 / weight, and the smallest
+tag goes next. A tenant with weight 3 therefore gets three slots for every
+one of a weight-1 tenant while both are waiting, and an institute with a
+2000-essay upload cannot push interactive users to the back of the line.
+
+Per-tenant weights and concurrency caps come from TENANT_WEIGHTS_PATH;
+"*" applies to tenants without an entry (including calls without a tenant):
+
+    {"institute-a": {"weight": 3, "max_concurrency": 16}, "*": {"weight": 1, "max_concurrency": 4}}
+
+LLM_SLOTS=0 (the default) disables scheduling.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import config
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# Highest first
+PRIORITIES = ("interactive", "batch")
+
+# Waits kept per tenant for the latency percentiles
+WAIT_WINDOW = 1000
+
+
+def priority_level(priority: str | None) -> int:
+    """Index of `priority` in PRIORITIES; an unknown value runs at the lowest priority."""
+
+    if not priority:
+        return 0
+    if priority not in PRIORITIES:
+        logger.warning("Unknown priority %r; scheduling as %r", priority, PRIORITIES[-1])
+        return len(PRIORITIES) - 1
+    return PRIORITIES.index(priority)
+
+
+@dataclass(frozen=True)
+class TenantPolicy:
+    weight: float = 1.0
+    # 0: limited only by the shared slots
+    max_concurrency: int = 0
+
+
+class _Waiter:
+    __slots__ = ("tenant", "priority", "tag", "enqueued", "granted")
+
+    def __init__(self, tenant: str, priority: int):
+        self.tenant = tenant
+        self.priority = priority
+        self.tag = 0.0
+        self.enqueued = time.monotonic()
+        self.granted = threading.Event()
+
+
+class FairScheduler:
+
+    def __init__(self, slots: int, policies: dict[str, TenantPolicy] | None = None):
+
+        self.slots = slots
+        self.policies = policies or {}
+        self._lock = threading.Lock()
+        self._free = slots
+        self._queues: dict[tuple[int, str], deque[_Waiter]] = defaultdict(deque)
+        self._running = Counter()
+        self._finish: dict[str, float] = {}
+        self._vtime = 0.0
+        self._granted = Counter()
+        self._waits: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=WAIT_WINDOW))
+
+    def policy(self, tenant: str) -> TenantPolicy:
+        return self.policies.get(tenant) or self.policies.get("*") or TenantPolicy()
+
+    def _eligible(self, tenant: str) -> bool:
+        cap = self.policy(tenant).max_concurrency
+        return not cap or self._running[tenant] < cap
+
+    def _dispatch(self):
+        # Caller holds the lock
+        while self._free > 0:
+
+            best = None
+            for queue in self._queues.values():
+                head = queue[0]
+                if self._eligible(head.tenant) and (best is None or (head.priority, head.tag) < (best.priority, best.tag)):
+                    best = head
+            if best is None:
+                return
+
+            queue = self._queues[best.priority, best.tenant]
+            queue.popleft()
+            if not queue:
+                del self._queues[best.priority, best.tenant]
+
+            self._free -= 1
+            self._running[best.tenant] += 1
+            self._vtime = max(self._vtime, best.tag)
+            best.granted.set()
+
+    def acquire(self, tenant: str | None = None, priority: str | None = None) -> float:
+        """Block until a slot is granted; returns the seconds spent waiting."""
+
+        tenant = tenant or ""
+        waiter = _Waiter(tenant, priority_level(priority))
+
+        with self._lock:
+            start = max(self._vtime, self._finish.get(tenant, 0.0))
+            waiter.tag = start + 1.0 / self.policy(tenant).weight
+            self._finish[tenant] = waiter.tag
+            self._queues[waiter.priority, tenant].append(waiter)
+            self._dispatch()
+
+        waiter.granted.wait()
+        waited = time.monotonic() - waiter.enqueued
+
+        with self._lock:
+            self._granted[tenant] += 1
+            self._waits[tenant].append(waited)
+
+        return waited
+
+    def release(self, tenant: str | None = None):
+        with self._lock:
+            self._free += 1
+            self._running[tenant or ""] -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, tenant: str | None = None, priority: str | None = None):
+        with tracing.span("scheduler_wait", "wait", tenant=tenant, priority=priority):
+            waited = self.acquire(tenant, priority)
+        try:
+            yield waited
+        finally:
+            self.release(tenant)
+
+    def stats(self) -> dict[str, dict]:
+        """Per tenant: running, queued, granted calls and queue latency (mean, p50, p95, max)."""
+
+        with self._lock:
+            queued = Counter()
+            for (_, tenant), queue in self._queues.items():
+                queued[tenant] += len(queue)
+
+            report = {}
+            for tenant in set(self._granted) | set(queued) | set(self._running):
+                waits = sorted(self._waits[tenant])
+                report[tenant or "(none)"] = {
+                    "running": self._running[tenant],
+                    "queued": queued[tenant],
+                    "granted": self._granted[tenant],
+                    "wait_mean_s": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "wait_p50_s": round(waits[len(waits) // 2], 3) if waits else 0.0,
+                    "wait_p95_s": round(waits[int(len(waits) * 0.95)], 3) if waits else 0.0,
+                    "wait_max_s": round(waits[-1], 3) if waits else 0.0,
+                }
+            return report
+
+
+def load_policies(path: str | None = None) -> dict[str, TenantPolicy]:
+    path = path or config.TENANT_WEIGHTS_PATH
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {tenant: TenantPolicy(**fields) for tenant, fields in json.load(f).items()}
+
+
+_scheduler: FairScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler | None:
+    """The process-wide scheduler, or None when LLM_SLOTS is 0."""
+
+    global _scheduler
+    if not config.LLM_SLOTS:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler(config.LLM_SLOTS, load_policies())
+        return _scheduler
+
+
+@contextmanager
+def slot(tenant: str | None = None, priority: str | None = None):
+    """One model-call slot for `tenant`; yields the seconds spent queueing (None when disabled)."""
+
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield None
+        return
+    with scheduler.slot(tenant, priority) as waited:
+        yield waited
+
+
+def stats() -> dict[str, dict]:
+    scheduler = get_scheduler()
+    return scheduler.stats() if scheduler else {}
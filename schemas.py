@@ -1,4 +1,5 @@
 from pydantic import BaseModel, Field
+from pydantic.json_schema import SkipJsonSchema
 from typing import Literal, TypedDict, Annotated
 
 
@@ -13,6 +14,8 @@ class Annotation(BaseModel):
         description="1-2 sentences maximum. A concise suggestion or alternative phrasing that fixes the issue."
     )
     severity: Literal["error", "warning"]
+    # Set only in sentence-anchored mode; never requested from the model.
+    sentence_id: SkipJsonSchema[int | None] = None
 
 class EvaluationSchema(BaseModel):
     rating: Literal["Excellent", "Good", "Average", "Poor"] = Field(
@@ -26,6 +29,118 @@ class EvaluationSchema(BaseModel):
         description="List of specific issues identified in the essay related to this criterion."
     )
 
+# ----------------------- COMPACT WIRE SCHEMA -----------------------
+# Short keys and one-letter enum codes so the model spends fewer output
+# tokens per annotation. Always expanded back into the models above.
+
+RATING_CODES = {"E": "Excellent", "G": "Good", "A": "Average", "P": "Poor"}
+SEVERITY_CODES = {"e": "error", "w": "warning"}
+
+
+class CompactAnnotation(BaseModel):
+    q: str = Field(description="Quote: 3-15 words, exact phrase from the essay.")
+    i: str = Field(description="Issue: one sentence.")
+    s: str = Field(description="Suggestion: one sentence.")
+    v: Literal["e", "w"] = Field(description="Severity: e=error, w=warning.")
+
+    def expand(self) -> Annotation:
+        return Annotation(
+            quote=self.q,
+            issue=self.i,
+            suggestion=self.s,
+            severity=SEVERITY_CODES[self.v],
+        )
+
+    @classmethod
+    def compress(cls, annotation: Annotation) -> "CompactAnnotation":
+        return cls(
+            q=annotation.quote,
+            i=annotation.issue,
+            s=annotation.suggestion,
+            v=annotation.severity[0],
+        )
+
+
+class CompactEvaluationSchema(BaseModel):
+    r: Literal["E", "G", "A", "P"] = Field(
+        description="Rating: E=Excellent, G=Good, A=Average, P=Poor."
+    )
+    f: str = Field(description="Feedback: 2-3 sentence examiner summary.")
+    a: list[CompactAnnotation] = Field(description="Annotations.")
+
+    def expand(self) -> EvaluationSchema:
+        return EvaluationSchema(
+            rating=RATING_CODES[self.r],
+            feedback=self.f,
+            annotations=[a.expand() for a in self.a],
+        )
+
+    @classmethod
+    def compress(cls, evaluation: EvaluationSchema) -> "CompactEvaluationSchema":
+        return cls(
+            r=evaluation.rating[0],
+            f=evaluation.feedback,
+            a=[CompactAnnotation.compress(a) for a in evaluation.annotations],
+        )
+
+# ----------------------- SENTENCE-ANCHORED SCHEMA -----------------------
+# The model sees a sentence-numbered essay and points at a sentence id plus a
+# short anchor phrase instead of copying a long verbatim quote.
+
+class AnchoredAnnotation(BaseModel):
+    sentence_id: int = Field(
+        description="Number [n] of the sentence containing the issue."
+    )
+    anchor: str = Field(
+        description="2-6 words copied exactly from that sentence, marking the problem."
+    )
+    issue: str = Field(
+        description="Concise identification of the problem. Be direct and specific."
+    )
+    suggestion: str = Field(
+        description="1-2 sentences maximum. A concise suggestion or alternative phrasing that fixes the issue."
+    )
+    severity: Literal["error", "warning"]
+
+    def expand(self) -> Annotation:
+        return Annotation(
+            quote=self.anchor,
+            issue=self.issue,
+            suggestion=self.suggestion,
+            severity=self.severity,
+            sentence_id=self.sentence_id,
+        )
+
+class AnchoredEvaluationSchema(BaseModel):
+    rating: Literal["Excellent", "Good", "Average", "Poor"] = Field(
+        description="Overall rating for this criterion based strictly on the rubric."
+    )
+    feedback: str = Field(
+        description="2-3 sentence examiner-style summary explaining the evaluation."
+    )
+    annotations: list[AnchoredAnnotation] = Field(
+        description="List of specific issues identified in the essay related to this criterion."
+    )
+
+    def expand(self) -> EvaluationSchema:
+        return EvaluationSchema(
+            rating=self.rating,
+            feedback=self.feedback,
+            annotations=[a.expand() for a in self.annotations],
+        )
+
+class CompactAnchoredAnnotation(CompactAnnotation):
+    n: int = Field(description="Sentence number [n] containing the issue.")
+    q: str = Field(description="Anchor: 2-6 words copied exactly from sentence n.")
+
+    def expand(self) -> Annotation:
+        annotation = super().expand()
+        annotation.sentence_id = self.n
+        return annotation
+
+class CompactAnchoredEvaluationSchema(CompactEvaluationSchema):
+    a: list[CompactAnchoredAnnotation] = Field(description="Annotations.")
+
 class EssayMetadata(TypedDict):
     word_count: int
     paragraphs: int
@@ -49,14 +164,60 @@ class OverallEvaluationSchema(BaseModel):
         description="Overall score out of 100. Independently assessed based on all criterion feedbacks, strengths, and weaknesses. Not a simple average of ratings."
     )
 
+# ----------------------- TOPIC ANALYSIS -----------------------
+# Produced once per topic and shared by every essay written on it.
+
+class AreaExamples(BaseModel):
+    area: str = Field(description="Dimension or area, e.g. economic, ethical, historical.")
+    examples: list[str] = Field(description="2-4 concrete, checkable examples (schemes, cases, data, thinkers).")
+
+
+class TopicAnalysisSchema(BaseModel):
+    dimensions: list[str] = Field(
+        description="4-8 key dimensions a complete answer should cover, a few words each."
+    )
+    expected_arguments: list[str] = Field(
+        description="4-8 central arguments or tensions a strong essay would develop, one sentence each."
+    )
+    examples: list[AreaExamples] = Field(
+        description="Relevant examples grouped by area."
+    )
+
+    def compact(self) -> str:
+        """Short plain-text form injected into evaluator prompts."""
+        lines = ["Dimensions: " + "; ".join(self.dimensions), "Expected arguments:"]
+        lines += [f"- {a}" for a in self.expected_arguments]
+        lines.append("Relevant examples:")
+        lines += [f"- {e.area}: " + "; ".join(e.examples) for e in self.examples]
+        return "\n".join(lines)
+
 class EssayState(TypedDict):
     topic: str
     essay: str
+    # Keys of the criteria to evaluate; all criteria when absent
+    criteria: list[str]
+    # Set when the graph was built without the overall evaluation
+    skip_overall: bool
+    # Optional: who is paying, for per-tenant budgets and scheduling
+    tenant: str
+    # Scheduling class of the model calls: "interactive" (default) or "batch"
+    priority: str
     intro: str
     conclusion: str
+    sentences: list[tuple[int, int]]
+    # Findings of the local grammar pre-pass
+    rule_annotations: list[Annotation]
     metadata: EssayMetadata
     evaluations: Annotated[dict[str, EvaluationSchema], lambda a, b: {**a, **b}]
     strengths: list[str]
     weaknesses: list[str]
     overall: str
-    score: int
\ No newline at end of file
+    score: int
+    # Per-node model usage: profile, model, latency_s, tokens, cost_usd
+    usage: Annotated[dict[str, dict], lambda a, b: {**a, **b}]
+    # Planner output: mode, predicted (and afterwards actual) usage
+    plan: dict
+    # Off-topic gate: score, threshold, off_topic (and confirmed after a relevance check)
+    relevance: dict
+    # Compact shared topic analysis (see topic_analysis.py)
+    topic_notes: str
\ No newline at end of file
@@ -0,0 +1,295 @@
+"""Percentile ranks of essay scores and criterion ratings, per topic and overall.
+
+Every finished evaluation adds its score and criterion ratings to count
+histograms, one per topic and one across all topics. Scores are integers
+from 0 to 100 and ratings have four levels, so one bin per value makes an
+exact quantile sketch in constant memory (at most 101 counters per metric),
+and sketches merge by adding counts; an approximate sketch such as a
+t-digest would only add error here.
+
+Scores from different evaluation paths are not comparable: a fused call,
+a cheap-first cascade and fast mode's local score each have their own
+distribution. Sketches are therefore kept per path (`population`, e.g.
+"full/model"), and only complete evaluations (every criterion rated and a
+score) are recorded or ranked.
+
+Sketches live in SQLite (SCORE_SKETCH_PATH, off by default). Writers add
+their counts with an upsert, so any number of app and worker processes
+update the same sketches; `python -m score_ranks merge other.db` folds in a
+node that kept its own database.
+"""
+
+import argparse
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from criteria_registry import CRITERIA
+from scoring import RATINGS
+import config
+
+logger = logging.getLogger(__name__)
+
+# Scope of the histograms across all topics
+GLOBAL = "*"
+
+# Population of the default configuration, shown by the CLI
+DEFAULT_POPULATION = "full/model"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketches (
+    scope TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (scope, metric, value)
+) WITHOUT ROWID;
+"""
+
+UPSERT = """
+INSERT INTO sketches (scope, metric, value, count) VALUES (?, ?, ?, ?)
+ON CONFLICT (scope, metric, value) DO UPDATE SET count = count + excluded.count
+"""
+
+
+def rating_value(rating: str) -> int:
+    # Poor = 1 ... Excellent = 4, so higher is better as for scores
+    return len(RATINGS) - RATINGS.index(rating)
+
+
+def topic_scope(topic: str) -> str:
+    return "topic:" + re.sub(r"\s+", " ", topic).strip().casefold()
+
+
+def population(result: dict) -> str | None:
+    """Evaluation path behind a result's score and ratings, e.g. "fused+cascade/local".
+
+    None when the result is not a complete evaluation (criteria skipped,
+    no score), whose score is not comparable to any population.
+    """
+
+    evaluations = result.get("evaluations") or {}
+    if result.get("score") is None or any(c.key not in evaluations for c in CRITERIA):
+        return None
+
+    usage = result.get("usage") or {}
+    mode = (result.get("plan") or {}).get("mode") or "full"
+    if any("cascade" in call for call in usage.values()):
+        mode += "+cascade"
+    # Fast mode scores locally, without the overall evaluation call
+    return f"{mode}/{'model' if 'overall_evaluation' in usage else 'local'}"
+
+
+def scopes(population: str, topic: str) -> tuple[str, str]:
+    """(global scope, topic scope) of `population`."""
+    return f"{population}|{GLOBAL}", f"{population}|{topic_scope(topic)}"
+
+
+def metrics(result: dict) -> dict[str, int]:
+    """Sketch values of one result: its score and each criterion rating."""
+
+    values = {}
+    if result.get("score") is not None:
+        values["score"] = int(result["score"])
+    for key, evaluation in (result.get("evaluations") or {}).items():
+        values[f"rating_{key}"] = rating_value(evaluation.rating)
+    return values
+
+
+@dataclass
+class Histogram:
+    counts: dict[int, int]
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    def add(self, value: int, n: int = 1):
+        self.counts[value] = self.counts.get(value, 0) + n
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        merged = Histogram(dict(self.counts))
+        for value, n in other.counts.items():
+            merged.add(value, n)
+        return merged
+
+    def percentile(self, value: int) -> float | None:
+        """Share of values below `value`, counting ties as half (0-100), or None if empty."""
+
+        total = self.total
+        if not total:
+            return None
+        below = sum(n for v, n in self.counts.items() if v < value)
+        return 100.0 * (below + self.counts.get(value, 0) / 2) / total
+
+    def quantile(self, q: float) -> int | None:
+        """Smallest value with at least a `q` share of values at or below it."""
+
+        total = self.total
+        seen = 0
+        for value in sorted(self.counts):
+            seen += self.counts[value]
+            if seen >= q * total:
+                return value
+        return None
+
+
+@dataclass(frozen=True)
+class Rank:
+    """Percentile of one value among essays on the same topic and among all essays."""
+    topic: float | None
+    topic_count: int
+    overall: float | None
+    overall_count: int
+
+    def best(self, min_count: int | None = None) -> tuple[str, float, int] | None:
+        """("topic" or "overall", percentile, count): the topic rank once it has enough essays."""
+
+        min_count = config.SCORE_RANK_MIN_COUNT if min_count is None else min_count
+        if self.topic_count >= min_count:
+            return "topic", self.topic, self.topic_count
+        if self.overall_count >= min_count:
+            return "overall", self.overall, self.overall_count
+        return None
+
+
+class SketchStore:
+
+    def __init__(self, path: str | None = None):
+
+        self.path = path or config.SCORE_SKETCH_PATH
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def add(self, population: str, topic: str, values: dict[str, int]):
+        rows = [(scope, metric, value, 1) for scope in scopes(population, topic) for metric, value in values.items()]
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            db.executemany(UPSERT, rows)
+            db.execute("COMMIT")
+
+    def histograms(self, scope: str) -> dict[str, Histogram]:
+        result: dict[str, Histogram] = {}
+        with self._connect() as db:
+            for metric, value, count in db.execute("SELECT metric, value, count FROM sketches WHERE scope = ?", (scope,)):
+                result.setdefault(metric, Histogram({})).add(value, count)
+        return result
+
+    def ranks(self, population: str, topic: str, values: dict[str, int]) -> dict[str, Rank]:
+        """Rank of each metric value against the population's topic and global sketches."""
+
+        global_scope, scope = scopes(population, topic)
+        by_topic = self.histograms(scope)
+        overall = self.histograms(global_scope)
+        empty = Histogram({})
+
+        ranks = {}
+        for metric, value in values.items():
+            t, o = by_topic.get(metric, empty), overall.get(metric, empty)
+            ranks[metric] = Rank(t.percentile(value), t.total, o.percentile(value), o.total)
+        return ranks
+
+    def merge_file(self, path: str) -> int:
+        """Add every count of another sketch database; returns the rows merged."""
+
+        with self._connect() as db:
+            db.execute("ATTACH DATABASE ? AS other", (path,))
+            db.execute("BEGIN IMMEDIATE")
+            merged = db.execute(
+                "INSERT INTO sketches (scope, metric, value, count) SELECT scope, metric, value, count FROM other.sketches "
+                "WHERE true ON CONFLICT (scope, metric, value) DO UPDATE SET count = count + excluded.count"
+            ).rowcount
+            db.execute("COMMIT")
+            db.execute("DETACH DATABASE other")
+        return merged
+
+
+_store: SketchStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SketchStore | None:
+    """The process-wide sketch store, or None when SCORE_SKETCH_PATH is not set."""
+
+    global _store
+    if not config.SCORE_SKETCH_PATH:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = SketchStore()
+        return _store
+
+
+def record(result: dict):
+    """Add a finished evaluation to the sketches. Failures are logged, never raised to the grader."""
+
+    store = get_store()
+    group = population(result)
+    if store is None or group is None:
+        return
+    try:
+        store.add(group, result["topic"], metrics(result))
+    except Exception:
+        logger.exception("Could not update score sketches in %s", store.path)
+
+
+def ranks(result: dict) -> dict[str, Rank]:
+    """Ranks of the result's score ("score") and ratings ("rating_<key>") within its population.
+
+    Empty when sketches are disabled or the result is not a complete evaluation.
+    """
+
+    store = get_store()
+    group = population(result)
+    if store is None or group is None:
+        return {}
+    try:
+        return store.ranks(group, result["topic"], metrics(result))
+    except Exception:
+        logger.exception("Could not read score sketches in %s", store.path)
+        return {}
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    merge_parser = commands.add_parser("merge", help="Add the counts of other sketch databases")
+    merge_parser.add_argument("paths", nargs="+")
+
+    show_parser = commands.add_parser("show", help="Score quartiles overall or for one topic")
+    show_parser.add_argument("--topic")
+    show_parser.add_argument("--population", default=DEFAULT_POPULATION, help="Evaluation path, e.g. fused/model")
+
+    args = parser.parse_args()
+    store = SketchStore()
+
+    if args.command == "merge":
+        for path in args.paths:
+            print(f"Merged {store.merge_file(path)} counters from {path}")
+        return
+
+    global_scope, scope = scopes(args.population, args.topic or "")
+    score = store.histograms(scope if args.topic else global_scope).get("score", Histogram({}))
+    if not score.total:
+        print("No scores yet")
+        return
+    print(f"{score.total} scores: p25 {score.quantile(0.25)}, median {score.quantile(0.5)}, "
+          f"p75 {score.quantile(0.75)}, p90 {score.quantile(0.9)}")
+
+
+if __name__ == "__main__":
+    main()
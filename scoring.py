@@ -0,0 +1,212 @@
+"""Deterministic local essay score for fast mode.
+
+score = weighted mean of per-criterion rating points
+        - weighted mean of per-criterion annotation penalties (capped)
+
+Criterion weights come from `Criterion.weight`; rating points, severity
+penalties and per-criterion overrides can be replaced with a JSON file
+(SCORING_WEIGHTS_PATH), typically produced by calibrating against
+LLM-scored essays:
+
+    python -m benchmarks.corpus_run corpus.jsonl --out scored.jsonl
+    python -m scoring scored.jsonl --out weights.json
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+from criteria_registry import CRITERIA
+import config
+
+RATINGS = ("Excellent", "Good", "Average", "Poor")
+
+
+@dataclass
+class ScoringWeights:
+    rating_points: dict[str, float] = field(default_factory=lambda: {
+        "Excellent": 90.0, "Good": 77.0, "Average": 62.0, "Poor": 45.0,
+    })
+    severity_penalty: dict[str, float] = field(default_factory=lambda: {
+        "error": 1.0, "warning": 0.3,
+    })
+    max_penalty_per_criterion: float = 4.0
+    criterion_weights: dict[str, float] = field(default_factory=lambda: {
+        c.key: c.weight for c in CRITERIA
+    })
+
+    @classmethod
+    def load(cls, path: str | None = None) -> "ScoringWeights":
+        weights = cls()
+        path = path or config.SCORING_WEIGHTS_PATH
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            for name, value in data.items():
+                current = getattr(weights, name)
+                setattr(weights, name, {**current, **value} if isinstance(current, dict) else value)
+        return weights
+
+
+def severity_counts(evaluation) -> dict[str, int]:
+    counts = {"error": 0, "warning": 0}
+    for a in evaluation.annotations:
+        counts[a.severity] = counts.get(a.severity, 0) + 1
+    return counts
+
+
+def score_from_counts(ratings: dict[str, str], severities: dict[str, dict[str, int]], weights: ScoringWeights) -> int:
+
+    total_weight = base = penalty = 0.0
+
+    for key, rating in ratings.items():
+        w = weights.criterion_weights.get(key, 1.0)
+        counts = severities.get(key, {})
+        annotation_penalty = sum(weights.severity_penalty.get(sev, 0.0) * n for sev, n in counts.items())
+        total_weight += w
+        base += w * weights.rating_points[rating]
+        penalty += w * min(annotation_penalty, weights.max_penalty_per_criterion)
+
+    if not total_weight:
+        return 0
+
+    return max(0, min(100, round((base - penalty) / total_weight)))
+
+
+def local_score(evaluations: dict, weights: ScoringWeights) -> int:
+    return score_from_counts(
+        {key: e.rating for key, e in evaluations.items()},
+        {key: severity_counts(e) for key, e in evaluations.items()},
+        weights,
+    )
+
+
+def _first_sentence(text: str) -> str:
+    text = text.strip()
+    end = text.find(". ")
+    return text if end == -1 else text[:end + 1]
+
+
+def local_strengths_weaknesses(evaluations: dict, weights: ScoringWeights, limit: int = 5):
+    """Strengths from Excellent/Good criteria, weaknesses from Average/Poor, heaviest first."""
+
+    names = {c.key: c.name for c in CRITERIA}
+
+    ranked = sorted(
+        evaluations.items(),
+        key=lambda item: (RATINGS.index(item[1].rating), -weights.criterion_weights.get(item[0], 1.0)),
+    )
+
+    strengths = [
+        f"{names.get(key, key)}: {_first_sentence(e.feedback)}"
+        for key, e in ranked if e.rating in ("Excellent", "Good")
+    ]
+
+    weak = sorted(
+        ((key, e) for key, e in ranked if e.rating in ("Average", "Poor")),
+        key=lambda item: (-RATINGS.index(item[1].rating), -weights.criterion_weights.get(item[0], 1.0)),
+    )
+    weaknesses = []
+    for key, e in weak:
+        errors = [a for a in e.annotations if a.severity == "error"]
+        detail = errors[0].issue if errors else _first_sentence(e.feedback)
+        weaknesses.append(f"{names.get(key, key)} ({e.rating}): {detail}")
+
+    return strengths[:limit], weaknesses[:limit]
+
+
+# ----------------------- CALIBRATION -----------------------
+
+def _features(sample: dict, weights: ScoringWeights, penalty: dict[str, float] | None = None):
+    """Weighted rating fractions and (negated) mean annotation counts per criterion.
+
+    With `penalty` (current severity penalties), criteria whose annotation
+    penalty reaches `max_penalty_per_criterion` add no counts; their capped
+    penalty is returned as an offset, so the features model `score_from_counts`.
+    Returns (row, offset).
+    """
+
+    ratings = sample["ratings"]
+    severities = sample.get("severities", {})
+    total = sum(weights.criterion_weights.get(k, 1.0) for k in ratings)
+
+    row = [0.0] * (len(RATINGS) + 2)
+    offset = 0.0
+    for key, rating in ratings.items():
+        w = weights.criterion_weights.get(key, 1.0) / total
+        row[RATINGS.index(rating)] += w
+        counts = severities.get(key, {})
+        if penalty and sum(penalty.get(sev, 0.0) * n for sev, n in counts.items()) >= weights.max_penalty_per_criterion:
+            offset += w * weights.max_penalty_per_criterion
+            continue
+        row[-2] -= w * counts.get("error", 0)
+        row[-1] -= w * counts.get("warning", 0)
+    return row, offset
+
+
+def calibrate(samples: list[dict], weights: ScoringWeights | None = None, max_rounds: int = 20) -> ScoringWeights:
+    """Least-squares fit of rating points and severity penalties to reference scores.
+
+    Each sample needs "score", "ratings" ({criterion: rating}) and optionally
+    "severities" ({criterion: {"error": n, "warning": n}}), as written by
+    `benchmarks.corpus_run --out`.
+
+    The per-criterion penalty cap makes the score piecewise linear: the fit
+    is repeated with the criteria that the last fit's penalties cap taken
+    as constant, until the set of capped criteria no longer changes.
+    """
+
+    import numpy as np
+
+    weights = weights or ScoringWeights()
+    samples = [s for s in samples if s.get("score") is not None and s.get("ratings")]
+    if len(samples) < len(RATINGS) + 2:
+        raise ValueError(f"Need at least {len(RATINGS) + 2} scored samples, got {len(samples)}")
+
+    y = np.array([s["score"] for s in samples], dtype=float)
+    penalty, previous = None, None
+
+    for _ in range(max_rounds):
+        rows, offsets = zip(*(_features(s, weights, penalty) for s in samples))
+        X = np.array(rows)
+        if previous is not None and np.array_equal(X, previous):
+            break
+        coef, *_ = np.linalg.lstsq(X, y + np.array(offsets), rcond=None)
+        penalty = {"error": max(0.0, float(coef[-2])), "warning": max(0.0, float(coef[-1]))}
+        previous = X
+
+    fitted = ScoringWeights(
+        rating_points={r: round(float(p), 2) for r, p in zip(RATINGS, coef)},
+        severity_penalty={sev: round(value, 3) for sev, value in penalty.items()},
+        max_penalty_per_criterion=weights.max_penalty_per_criterion,
+        criterion_weights=dict(weights.criterion_weights),
+    )
+    return fitted
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Calibrate fast-mode scoring weights")
+    parser.add_argument("samples", help="JSONL of scored essays (benchmarks.corpus_run --out)")
+    parser.add_argument("--out", default="scoring_weights.json")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+
+    fitted = calibrate(samples)
+
+    errors = [
+        abs(score_from_counts(s["ratings"], s.get("severities", {}), fitted) - s["score"])
+        for s in samples if s.get("score") is not None and s.get("ratings")
+    ]
+    print(f"Calibrated on {len(errors)} essays, mean absolute error {sum(errors) / len(errors):.1f} points")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(asdict(fitted), f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
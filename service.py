@@ -0,0 +1,201 @@
+"""Local evaluation service: HTTP endpoints over the persistent job queue.
+
+    POST /jobs                {"topic", "essay", "criteria"?, "overall"?, "tenant"?, "priority"?, "student"?} -> 202 {"id", "status"}
+    GET  /jobs/<id>           status: queued (with queue position), running, done or failed
+    GET  /jobs/<id>/result    the evaluation result once done (409 before that)
+    GET  /health              job counts, per-tenant scheduler queues and latency, circuit states
+
+Run the endpoints together with a worker pool, or scale workers separately;
+every process shares the queue in JOBS_DB_PATH:
+
+    python -m service serve --port 8765 --workers 4
+    python -m service serve --workers 0          # endpoints only
+    python -m service worker --workers 8         # workers only, any number of processes
+
+The app uses this service instead of evaluating in its own script run when
+EVALUATION_SERVICE_URL is set (see `submit_job`, `job_status`, `job_result`).
+"""
+
+import argparse
+import json
+import re
+import signal
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from criteria_registry import select_criteria
+from jobs import JobStore, WorkerPool, load_result
+import circuit_breaker
+import config
+import scheduler
+
+_JOB_PATH = re.compile(r"^/jobs/([0-9a-f]{32})(/result)?$")
+
+
+def validate_request(body: dict) -> dict:
+    """The job request in `body`; raises ValueError when it is incomplete or invalid."""
+
+    topic = (body.get("topic") or "").strip()
+    essay = (body.get("essay") or "").strip()
+    if not topic or not essay:
+        raise ValueError("Both topic and essay are required")
+
+    request = {"topic": topic, "essay": essay, "overall": bool(body.get("overall", True))}
+
+    if body.get("criteria") is not None:
+        request["criteria"] = [c.key for c in select_criteria(set(body["criteria"]))]
+    for key in ("tenant", "student"):
+        if body.get(key):
+            request[key] = str(body[key])
+    if body.get("priority"):
+        if body["priority"] not in scheduler.PRIORITIES:
+            raise ValueError(f"priority must be one of: {', '.join(scheduler.PRIORITIES)}")
+        request["priority"] = body["priority"]
+
+    return request
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+
+    store: JobStore  # set by `serve`
+
+    def _send(self, status: int, body: dict | str):
+        data = (body if isinstance(body, str) else json.dumps(body)).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+
+        if self.path != "/jobs":
+            return self._send(404, {"error": "Not found"})
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            request = validate_request(body)
+        except (ValueError, AttributeError) as e:
+            return self._send(400, {"error": str(e)})
+
+        self._send(202, {"id": self.store.submit(request), "status": "queued"})
+
+    def do_GET(self):
+
+        if self.path == "/health":
+            return self._send(200, {
+                "jobs": self.store.counts(),
+                "scheduler": scheduler.stats(),
+                "circuits": circuit_breaker.stats(),
+            })
+
+        match = _JOB_PATH.match(self.path)
+        job = self.store.get(match.group(1)) if match else None
+        if job is None:
+            return self._send(404, {"error": "Unknown job"})
+
+        if not match.group(2):
+            return self._send(200, job)
+
+        result = self.store.result_json(job["id"])
+        if result is None:
+            return self._send(409, job)
+        self._send(200, result)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(port: int, workers: int, host: str = "127.0.0.1"):
+
+    store = JobStore()
+    pool = WorkerPool(store, workers).start() if workers else None
+
+    handler = type("Handler", (ServiceHandler,), {"store": store})
+    server = ThreadingHTTPServer((host, port), handler)
+
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"Evaluation service on http://{host}:{port} with {workers} workers ({store.path})")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if pool:
+            pool.stop()
+
+
+def work(workers: int):
+
+    pool = WorkerPool(JobStore(), workers).start()
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+    print(f"{workers} evaluation workers on {pool.store.path}")
+
+    try:
+        stopped.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+# ----------------------- CLIENT -----------------------
+
+def _client():
+    import httpx
+    return httpx.Client(base_url=config.EVALUATION_SERVICE_URL, timeout=30)
+
+
+def submit_job(topic: str, essay: str, criteria=None, overall: bool = True, tenant: str | None = None,
+               priority: str | None = None, student: str | None = None) -> str:
+    with _client() as client:
+        response = client.post("/jobs", json={
+            "topic": topic, "essay": essay, "criteria": criteria, "overall": overall, "tenant": tenant,
+            "priority": priority, "student": student,
+        })
+        response.raise_for_status()
+        return response.json()["id"]
+
+
+def job_status(job_id: str) -> dict | None:
+    with _client() as client:
+        response = client.get(f"/jobs/{job_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+
+def job_result(job_id: str) -> dict:
+    with _client() as client:
+        response = client.get(f"/jobs/{job_id}/result")
+        response.raise_for_status()
+        return load_result(response.text)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local evaluation service")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="HTTP endpoints (plus workers unless --workers 0)")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8765)
+    serve_parser.add_argument("--workers", type=int, default=config.JOB_WORKERS)
+
+    worker_parser = commands.add_parser("worker", help="Workers only")
+    worker_parser.add_argument("--workers", type=int, default=config.JOB_WORKERS)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.port, args.workers, args.host)
+    else:
+        work(args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+# Modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+
+def make_result(topic: str = "Development and welfare", score: int = 64, annotations: int = 3) -> dict:
+    """A finished evaluation of every criterion, as the graph returns it."""
+
+    from criteria_registry import CRITERIA
+    from schemas import Annotation, EvaluationSchema
+
+    def annotation(i: int, severity: str) -> Annotation:
+        return Annotation(quote=f"quote {i}", issue=f"issue {i}", suggestion=f"fix {i}", severity=severity, sentence_id=i + 1)
+
+    return {
+        "topic": topic,
+        "essay": "First sentence. Second sentence. Third sentence.",
+        "overall": "",
+        "score": score,
+        "metadata": {"word_count": 1100, "paragraph_count": 8, "avg_paragraph_words": 137.5},
+        "sentences": [(0, 15), (16, 32), (33, 48)],
+        "evaluations": {
+            c.key: EvaluationSchema(
+                rating=("Excellent", "Good", "Average", "Poor")[n % 4],
+                feedback=f"Feedback on {c.name}.",
+                annotations=[annotation(i, "error" if i % 2 else "warning") for i in range(annotations)],
+            )
+            for n, c in enumerate(CRITERIA)
+        },
+        "rule_annotations": [annotation(9, "error")],
+        "usage": {c.key: {"latency_s": 1.0, "cost_usd": 0.001, "queue_s": 0.5} for c in CRITERIA},
+    }
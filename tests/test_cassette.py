@@ -0,0 +1,87 @@
+import pytest
+
+from cassette import Cassette, CassetteMiss, request_key
+from schemas import EvaluationSchema, OverallEvaluationSchema
+
+
+class Model:
+    """Structured-output runnable that answers with a fixed evaluation and counts its calls."""
+
+    def __init__(self, rating: str = "Good"):
+        self.rating = rating
+        self.calls = 0
+
+    def invoke(self, prompt, *args, **kwargs):
+        self.calls += 1
+        return EvaluationSchema(rating=self.rating, feedback=f"On: {prompt}", annotations=[])
+
+    def stream(self, prompt, *args, **kwargs):
+        self.calls += 1
+        yield {"rating": self.rating}
+        yield {"rating": self.rating, "feedback": f"On: {prompt}", "annotations": []}
+
+
+def test_request_key_depends_on_model_schema_and_prompt():
+
+    key = request_key("gpt-4o-mini", EvaluationSchema, "prompt")
+
+    assert key == request_key("gpt-4o-mini", EvaluationSchema, "prompt")
+    assert key == request_key("gpt-4o-mini", EvaluationSchema.model_json_schema(), "prompt")
+    assert len({
+        key,
+        request_key("gpt-4.1", EvaluationSchema, "prompt"),
+        request_key("gpt-4o-mini", OverallEvaluationSchema, "prompt"),
+        request_key("gpt-4o-mini", EvaluationSchema, "prompt "),
+    }) == 4
+
+
+def test_recorded_calls_replay_without_the_model(tmp_path):
+
+    path = str(tmp_path / "cassettes" / "llm.jsonl")
+    model = Model()
+    recorder = Cassette(path, "record").wrap(model, EvaluationSchema, "gpt-4o-mini")
+    recorded = recorder.invoke("essay one")
+
+    offline = Model(rating="Poor")
+    player = Cassette(path, "replay", latency="zero").wrap(offline, EvaluationSchema, "gpt-4o-mini")
+
+    assert player.invoke("essay one") == recorded
+    assert offline.calls == 0
+
+    # Another prompt, or the same one for another model, was never recorded
+    with pytest.raises(CassetteMiss, match="No recording"):
+        player.invoke("essay two")
+    with pytest.raises(CassetteMiss):
+        Cassette(path, "replay").wrap(offline, EvaluationSchema, "gpt-4.1").invoke("essay one")
+
+
+def test_streams_record_their_final_chunk(tmp_path):
+
+    path = str(tmp_path / "llm.jsonl")
+    schema = EvaluationSchema.model_json_schema()
+    chunks = list(Cassette(path, "record").wrap(Model(), schema, "m").stream("essay"))
+
+    replayed = list(Cassette(path, "replay", latency="zero").wrap(Model(), schema, "m").stream("essay"))
+
+    assert len(chunks) == 2
+    assert replayed == chunks[-1:]
+
+
+def test_last_recording_wins(tmp_path):
+
+    path = str(tmp_path / "llm.jsonl")
+    Cassette(path, "record").wrap(Model("Good"), EvaluationSchema, "m").invoke("essay")
+    Cassette(path, "record").wrap(Model("Average"), EvaluationSchema, "m").invoke("essay")
+
+    cassette = Cassette(path, "replay", latency="zero")
+
+    assert len(cassette) == 1
+    assert cassette.wrap(Model(), EvaluationSchema, "m").invoke("essay").rating == "Average"
+
+
+def test_rejects_unknown_modes(tmp_path):
+
+    with pytest.raises(ValueError, match="mode"):
+        Cassette(str(tmp_path / "llm.jsonl"), "playback")
+    with pytest.raises(ValueError, match="latency"):
+        Cassette(str(tmp_path / "llm.jsonl"), "replay", latency="fast")
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from corpus_store import CorpusStore, RECORD, HEADER, essay_hash, parse_shard, read_items, write_corpus
+
+ITEMS = [
+    {"id": "a-1", "topic": "Welfare", "essay": "Roads bring doctors closer.", "tenant": "inst"},
+    {"topic": "Welfare", "essay": "Growth is not welfare — नीति matters."},
+    {"id": "c-3", "topic": "Technology", "essay": "Data is the new commons.", "tenant": "inst"},
+    {"id": "d-4", "topic": "Federalism", "essay": "States need fiscal room.", "tenant": "other"},
+    {"id": "e-5", "topic": "Technology", "essay": ""},
+]
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    path = str(tmp_path / "corpus")
+    assert write_corpus(path, iter(ITEMS)) == len(ITEMS)
+    with CorpusStore(path) as store:
+        yield store
+
+
+def test_items_read_back_through_the_index(corpus):
+
+    assert len(corpus) == 5
+    assert corpus.topics == ["Welfare", "Technology", "Federalism"]
+
+    first, second = corpus[0], corpus[1]
+    assert (first.id, first.topic, first.essay, first.tenant) == ("a-1", "Welfare", "Roads bring doctors closer.", "inst")
+    # Items without an id are numbered by position; non-ASCII text survives the byte offsets
+    assert (second.id, second.essay, second.tenant) == ("2", ITEMS[1]["essay"], None)
+    assert corpus[-1].essay == "" and corpus[-1].id == "e-5"
+    assert [item.essay for item in corpus] == [item["essay"] for item in ITEMS]
+    assert first.hash == essay_hash(first.essay).hex()
+
+    with pytest.raises(IndexError):
+        corpus[5]
+
+
+def test_shards_cover_the_corpus_once(corpus):
+
+    shards = [corpus.shard(k, 3) for k in range(3)]
+
+    assert [len(s) for s in shards] == [1, 2, 2]
+    assert [item.id for s in shards for item in s] == [item.id for item in corpus]
+    assert shards[2][0].id == corpus[3].id
+    assert [item.id for item in corpus.shard(1, 2).shard(1, 2)] == ["d-4", "e-5"]
+
+    with pytest.raises(ValueError):
+        corpus.shard(3, 3)
+
+
+def test_read_items_from_corpus_or_jsonl(tmp_path, corpus):
+
+    jsonl = tmp_path / "corpus.jsonl"
+    jsonl.write_text("\n".join(json.dumps(item) for item in ITEMS) + "\n", encoding="utf-8")
+
+    from_jsonl = list(read_items(str(jsonl)))
+    from_corpus = list(read_items(corpus.path))
+
+    assert [i["id"] for i in from_jsonl] == [i["id"] for i in from_corpus] == ["a-1", "2", "c-3", "d-4", "e-5"]
+    assert [i["id"] for i in read_items(corpus.path, parse_shard("0/2"))] == ["a-1", "2"]
+    with pytest.raises(ValueError, match="corpus directory"):
+        list(read_items(str(jsonl), (0, 2)))
+
+
+def test_verify_finds_changed_essays(corpus):
+
+    offset, id_len, *_ = corpus.record(2)
+    with open(os.path.join(corpus.path, "essays.bin"), "r+b") as f:
+        f.seek(offset + id_len)
+        f.write(b"X")
+
+    with CorpusStore(corpus.path) as reopened:
+        assert reopened.verify() == [2]
+
+
+def test_mismatched_index_is_rejected(corpus):
+
+    with open(os.path.join(corpus.path, "index.bin"), "r+b") as f:
+        f.truncate(HEADER.size + RECORD.size)
+        f.seek(0)
+        f.write(b"NOTINDEX")
+
+    with pytest.raises(ValueError, match="Corrupt"):
+        CorpusStore(corpus.path)
+
+    meta = os.path.join(corpus.path, "meta.json")
+    with open(meta, encoding="utf-8") as f:
+        data = json.load(f)
+    with open(meta, "w", encoding="utf-8") as f:
+        json.dump({**data, "version": 99}, f)
+
+    with pytest.raises(ValueError, match="version 99"):
+        CorpusStore(corpus.path)
+
+
+def test_empty_corpus(tmp_path):
+
+    path = str(tmp_path / "empty")
+    assert write_corpus(path, []) == 0
+    with CorpusStore(path) as store:
+        assert len(store) == 0 and list(store) == []
@@ -0,0 +1,59 @@
+import pytest
+
+from grammar_rules import check_essay, check_text
+from utils import build_sentence_index
+
+
+def issues(text: str) -> list[tuple[str, str]]:
+    return [(text[start:end], issue) for start, end, issue, _, _ in check_text(text)]
+
+
+@pytest.mark.parametrize("text", [
+    "an apple", "a university", "a one-time grant", "an hour", "an hour-long debate", "an MP", "a UN body",
+    "Plan A is late", "an 8% rise", "an 18th century reform", "an 11,000 strong force", "an 80-year-old law",
+    "an 800 km road", "a 1990s trend", "a 180-day plan", "a 5.5% rise", "a 100 crore scheme",
+])
+def test_correct_articles_are_not_flagged(text):
+    assert issues(text) == []
+
+
+@pytest.mark.parametrize("text, suggestion", [
+    ("a apple", 'Use "an apple"'),
+    ("an policy", 'Use "a policy"'),
+    ("a 8% rise", 'Use "an 8%"'),
+    ("a 18th century reform", 'Use "an 18th"'),
+    ("an 1990s trend", 'Use "a 1990s"'),
+    ("an 100 crore scheme", 'Use "a 100"'),
+])
+def test_wrong_articles_are_flagged(text, suggestion):
+    (_, _, _, found, severity), = check_text(text)
+    assert found == suggestion
+    assert severity == "warning"
+
+
+def test_repeated_word():
+    assert issues("The the state acts. He had had enough.") == [("The the", 'Repeated word "the"')]
+
+
+def test_spacing():
+    found = issues("Growth is slow , and jobs,wages lag.")
+    assert ("slow ,", "Space before punctuation") in found
+    assert ("jobs,wages", "Missing space after punctuation") in found
+
+
+def test_rules_do_not_span_sentences():
+    assert issues("It was a. Apple trees grew.") == []
+
+
+def test_check_essay_ties_findings_to_sentences():
+
+    text = "Policy matters. It is an policy failure. The the end."
+    annotations = check_essay(text, build_sentence_index(text))
+
+    assert [(a.quote, a.sentence_id) for a in annotations] == [("an policy", 2), ("The the", 3)]
+    assert all(a.suggestion for a in annotations)
+
+
+def test_findings_are_in_text_order():
+    starts = [start for start, *_ in check_text("The the cat saw a apple , then an dog.")]
+    assert starts == sorted(starts)
@@ -0,0 +1,188 @@
+import sqlite3
+import time
+
+import pytest
+
+import config
+import jobs
+from jobs import JobStore, WorkerPool
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+
+def request(topic="Topic", **extra):
+    return {"topic": topic, "essay": "Essay", **extra}
+
+
+def test_claim_leases_jobs_interactive_first_then_oldest(store):
+
+    first = store.submit(request("batch", priority="batch"))
+    second = store.submit(request("one"))
+    third = store.submit(request("two"))
+
+    assert store.get(first)["position"] == 2
+    assert [store.claim("w")[0] for _ in range(3)] == [second, third, first]
+    assert store.claim("w") is None
+    assert store.get(second)["status"] == "running"
+    assert store.get(second)["attempts"] == 1
+
+
+def test_claim_honours_max_running(store):
+
+    store.submit(request())
+    store.submit(request())
+
+    assert store.claim("w", max_running=1) is not None
+    assert store.claim("w", max_running=1) is None
+    assert store.claim("w", max_running=0) is not None
+
+
+def test_only_the_lease_holder_completes(store):
+
+    job_id = store.submit(request())
+    store.claim("node:1:0")
+
+    assert not store.complete(job_id, {"topic": "Topic", "score": 1}, "node:2:0")
+    assert store.complete(job_id, {"topic": "Topic", "score": 70}, "node:1:0")
+    assert store.get(job_id)["status"] == "done"
+    assert store.result(job_id)["score"] == 70
+    assert not store.fail(job_id, "late", "node:1:0")
+
+
+def test_expired_lease_is_requeued_and_old_holder_loses_it(store):
+
+    job_id = store.submit(request())
+    store.claim("node:1:0")
+
+    # Renewed leases are not stale
+    store.heartbeat(["node:1:0"])
+    assert store.requeue_stale(stale_after=60) == 0
+
+    assert store.requeue_stale(stale_after=0) == 1
+    assert store.get(job_id)["status"] == "queued"
+
+    assert store.claim("node:2:0")[0] == job_id
+    assert store.get(job_id)["attempts"] == 2
+    assert not store.complete(job_id, {"topic": "Topic"}, "node:1:0")
+    assert store.complete(job_id, {"topic": "Topic"}, "node:2:0")
+
+
+def test_requeue_fails_jobs_after_max_attempts(store):
+
+    job_id = store.submit(request())
+    for _ in range(2):
+        store.claim("w")
+        store.requeue_stale(stale_after=0, max_attempts=2)
+
+    job = store.get(job_id)
+    assert job["status"] == "failed"
+    assert job["error"] == "Worker lost too many times"
+
+
+def test_submit_batch_is_idempotent_and_reports_progress(store):
+
+    items = [(str(i), request(priority="batch")) for i in range(5)]
+    assert store.submit_batch("b", items) == 5
+    assert store.submit_batch("b", items) == 0
+
+    # A node whose clock runs ahead started the batch "in the future"
+    job_id, _ = store.claim("node:1:0")
+    store.complete(job_id, {"topic": "Topic"}, "node:1:0")
+    with store._connect() as db:
+        db.execute("UPDATE jobs SET started = ? WHERE id = ?", (time.time() + 30, job_id))
+    progress = store.progress("b")
+
+    assert progress["counts"] == {"done": 1, "queued": 4}
+    assert progress["per_minute"] > 0
+    assert progress["eta_s"] is not None
+    assert [item for item, *_ in store.batch_results("b")] == ["0", "1", "2", "3", "4"]
+
+
+def test_worker_survives_store_errors(store, monkeypatch):
+
+    monkeypatch.setattr(config, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(config, "RESULTS_STORE_PATH", "")
+    monkeypatch.setattr(config, "SCORE_SKETCH_PATH", "")
+    monkeypatch.setattr(jobs, "evaluate", lambda r: {"topic": r["topic"], "score": 50})
+
+    failures = {"claim": 1, "complete": 1}
+    for name in failures:
+        real = getattr(store, name)
+
+        def flaky(*args, _name=name, _real=real):
+            if failures[_name]:
+                failures[_name] -= 1
+                raise sqlite3.OperationalError("database is locked")
+            return _real(*args)
+
+        flaky.__name__ = name
+        monkeypatch.setattr(store, name, flaky)
+
+    job_id = store.submit(request())
+    pool = WorkerPool(store, workers=1).start()
+    try:
+        deadline = time.monotonic() + 5
+        while store.get(job_id)["status"] != "done" and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.stop(timeout=5)
+
+    assert store.get(job_id)["status"] == "done"
+    assert failures == {"claim": 0, "complete": 0}
+    assert not any(t.is_alive() for t in pool._threads)
+
+
+def run_one(store, monkeypatch, result) -> str:
+    """Run one job whose evaluation returns `result` on a one-worker pool; its final status."""
+
+    monkeypatch.setattr(config, "JOB_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(config, "JOB_STALE_AFTER", 0.2)
+    monkeypatch.setattr(config, "JOB_MAX_ATTEMPTS", 1)
+    monkeypatch.setattr(jobs, "evaluate", lambda r: result)
+
+    job_id = store.submit(request())
+    pool = WorkerPool(store, workers=1).start()
+    try:
+        deadline = time.monotonic() + 5
+        while store.get(job_id)["status"] in ("queued", "running") and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.stop(timeout=5)
+
+    assert not pool._busy
+    return store.get(job_id)
+
+
+def test_result_that_cannot_be_stored_fails_the_job(store, monkeypatch):
+
+    job = run_one(store, monkeypatch, {"topic": "Topic", "score": object()})
+
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Could not store result: TypeError")
+
+
+def test_job_is_released_when_the_store_keeps_failing(store, monkeypatch):
+
+    def broken(*args):
+        raise sqlite3.IntegrityError("constraint failed")
+
+    monkeypatch.setattr(store, "complete", broken)
+    monkeypatch.setattr(store, "fail", broken)
+
+    # Neither outcome could be written: the lease is no longer renewed and expires
+    job = run_one(store, monkeypatch, {"topic": "Topic"})
+
+    assert job["status"] == "failed"
+    assert job["error"] == "Worker lost too many times"
+
+
+def test_submit_rejects_unknown_priority(store):
+
+    with pytest.raises(ValueError, match="priority"):
+        store.submit(request(priority="urgent"))
+    with pytest.raises(ValueError, match="priority"):
+        store.submit_batch("b", [("1", request(priority="urgent"))])
+    assert store.counts() == {}
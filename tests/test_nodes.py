@@ -0,0 +1,101 @@
+import pytest
+
+import repair
+from nodes import stream_evaluation
+from schemas import Annotation, CompactEvaluationSchema, EvaluationSchema
+
+ESSAY = "Growth is not welfare. Roads matter less than the doctors they bring closer."
+
+
+class Stream:
+    """Runnable whose `stream` yields the given partial dicts."""
+
+    def __init__(self, *partials):
+        self.partials = partials
+
+    def stream(self, prompt, config=None):
+        yield from self.partials
+
+
+def annotation(quote: str, **fields) -> dict:
+    return {"quote": quote, "issue": "Vague", "suggestion": "Be specific", "severity": "warning", **fields}
+
+
+def run(schema, *partials) -> tuple[EvaluationSchema, list[dict]]:
+    events = []
+    with repair.tracking(ESSAY):
+        response = stream_evaluation("argument", Stream(*partials), schema, "prompt", events.append)
+    return response, events
+
+
+def test_fields_are_emitted_as_they_complete():
+
+    first, second = annotation("Growth is not welfare"), annotation("Roads matter less")
+    response, events = run(
+        EvaluationSchema,
+        {"rating": "Good"},
+        {"rating": "Good", "feedback": "Clear"},
+        {"rating": "Good", "feedback": "Clear thesis.", "annotations": [first]},
+        {"rating": "Good", "feedback": "Clear thesis.", "annotations": [first, second]},
+    )
+
+    assert [next(k for k in e if k != "criterion") for e in events] == ["rating", "feedback", "annotation", "annotation"]
+    assert events[0]["rating"] == "Good"
+    assert events[1]["feedback"] == "Clear thesis."
+    assert [e["annotation"].quote for e in events[2:]] == ["Growth is not welfare", "Roads matter less"]
+    assert response.rating == "Good"
+
+
+def test_out_of_order_fields_wait_until_complete():
+
+    first = annotation("Growth is not welfare")
+    response, events = run(
+        EvaluationSchema,
+        {"feedback": "Clear"},
+        {"feedback": "Clear thesis.", "annotations": [first]},
+        {"feedback": "Clear thesis.", "annotations": [first], "rating": "go"},
+        {"feedback": "Clear thesis.", "annotations": [first], "rating": "good"},
+    )
+
+    assert [e for e in events if "feedback" in e] == [{"criterion": "argument", "feedback": "Clear thesis."}]
+    assert [e["rating"] for e in events if "rating" in e] == ["Good"]
+    assert len([e for e in events if "annotation" in e]) == 1
+    assert response.rating == "Good"
+
+
+def test_missing_fields_come_from_the_repaired_response():
+
+    # No annotations at all, and the rating spelled out: repair fills both in
+    response, events = run(
+        CompactEvaluationSchema,
+        {"f": "Thin"},
+        {"f": "Thin argument.", "r": "poor"},
+    )
+
+    assert response.rating == "Poor"
+    assert response.annotations == []
+    assert {"criterion": "argument", "rating": "Poor"} in events
+    assert {"criterion": "argument", "feedback": "Thin argument."} in events
+    assert not [e for e in events if "annotation" in e]
+
+
+def test_annotations_left_in_the_stream_are_emitted_once():
+
+    items = [annotation("Growth is not welfare"), annotation("Roads matter less", severity="major")]
+    response, events = run(
+        EvaluationSchema,
+        {"rating": "Average", "feedback": "Fine.", "annotations": items[:1]},
+        {"rating": "Average", "feedback": "Fine.", "annotations": items},
+    )
+
+    streamed = [e["annotation"] for e in events if "annotation" in e]
+    assert streamed == response.annotations
+    assert isinstance(streamed[1], Annotation) and streamed[1].severity == "error"
+
+
+def test_irreparable_stream_raises_for_a_retry():
+
+    from langchain_core.exceptions import OutputParserException
+
+    with pytest.raises(OutputParserException):
+        run(EvaluationSchema, {"rating": "Good"})
@@ -0,0 +1,44 @@
+import config
+import planner
+from criteria_registry import CRITERIA
+from models import MODEL_PROFILES
+from schemas import EvaluationSchema
+
+ESSAY = " ".join(["Development must reach the poorest districts first."] * 120)
+
+
+def state(**extra) -> dict:
+    return {"topic": "Development and welfare", "essay": ESSAY, "metadata": {"word_count": 840, "paragraph_count": 1, "avg_paragraph_words": 840}, **extra}
+
+
+def test_fused_call_has_room_for_every_criterion(monkeypatch):
+
+    monkeypatch.setattr(config, "SENTENCE_ANCHORS", False)
+    monkeypatch.setattr(config, "COMPACT_OUTPUT", False)
+
+    call = planner.estimate_calls(state(), "fused")["fused"]
+
+    assert call["output_tokens"] == planner.OUTPUT_TOKENS[EvaluationSchema] * len(CRITERIA)
+    assert call["output_tokens"] > MODEL_PROFILES["default"].max_tokens
+    assert call["max_tokens"] == config.FUSED_OUTPUT_TOKENS_PER_CRITERION * len(CRITERIA)
+    assert call["output_tokens"] <= call["max_tokens"]
+
+
+def test_mode_whose_output_exceeds_the_cap_is_rejected(monkeypatch):
+
+    monkeypatch.setattr(config, "PLAN_MODE", "fused")
+    monkeypatch.setattr(config, "FUSED_OUTPUT_TOKENS_PER_CRITERION", 100)
+
+    plan = planner.planner_node(state())["plan"]
+
+    assert plan["mode"] is None
+    assert plan["rejected"] == {"fused": "output above max_tokens"}
+
+
+def test_auto_mode_skips_a_truncated_mode(monkeypatch):
+
+    monkeypatch.setattr(config, "PLAN_MODE", "auto")
+    monkeypatch.setattr(config, "FUSED_OUTPUT_TOKENS_PER_CRITERION", 100)
+    monkeypatch.setattr(planner, "MODES", ("fused", "full"))
+
+    assert planner.planner_node(state())["plan"]["mode"] == "full"
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+import config
+import relevance_gate
+from relevance_gate import OFF_TOPIC_MESSAGE, RelevanceGate, calibrate, gated, relevance_check, relevance_gate_node
+from schemas import EvaluationSchema
+
+TOPIC = "Welfare schemes and rural development in India"
+ON_TOPIC = ("Rural development in India depends on welfare schemes that reach villages. "
+            "Schemes for rural employment and welfare have changed how development is measured. ") * 6
+OFF_TOPIC = ("Cricket grew from a colonial pastime into a national obsession. "
+             "Stadiums, leagues and broadcasting rights now shape the sport. ") * 6
+
+
+def state(essay: str, **extra) -> dict:
+    return {
+        "topic": TOPIC, "essay": essay, "overall": "",
+        "metadata": {"word_count": 170, "paragraph_count": 1, "avg_paragraph_words": 170},
+        **extra,
+    }
+
+
+def test_on_topic_essays_score_higher():
+
+    gate = RelevanceGate()
+
+    assert gate.score(TOPIC, ON_TOPIC) > gate.threshold > gate.score(TOPIC, OFF_TOPIC)
+
+
+@pytest.mark.parametrize("action", ["flag", "relevance"])
+def test_flagged_essays_continue(monkeypatch, action):
+
+    monkeypatch.setattr(config, "RELEVANCE_GATE", action)
+
+    update = relevance_gate_node(state(OFF_TOPIC))
+
+    assert update["relevance"]["off_topic"] and "overall" not in update
+    assert gated({**state(OFF_TOPIC), **update}) == (action == "relevance")
+    assert not relevance_gate_node(state(ON_TOPIC))["relevance"]["off_topic"]
+
+
+def test_stop_rejects_off_topic_essays_before_any_call(monkeypatch):
+
+    monkeypatch.setattr(config, "RELEVANCE_GATE", "stop")
+
+    assert relevance_gate_node(state(OFF_TOPIC))["overall"] == OFF_TOPIC_MESSAGE
+    assert "overall" not in relevance_gate_node(state(ON_TOPIC))
+
+
+def test_gate_off_does_nothing(monkeypatch):
+
+    monkeypatch.setattr(config, "RELEVANCE_GATE", "off")
+
+    assert relevance_gate_node(state(OFF_TOPIC)) == {}
+    assert not gated(state(OFF_TOPIC, relevance={"off_topic": True}))
+
+
+def test_calibrated_gate_is_loaded_from_its_file(tmp_path, monkeypatch):
+
+    path = tmp_path / "gate.json"
+    path.write_text(json.dumps({"cosine_weight": 0.3, "threshold": 0.9}))
+    monkeypatch.setattr(config, "RELEVANCE_GATE_PATH", str(path))
+    monkeypatch.setattr(config, "RELEVANCE_GATE", "flag")
+
+    assert RelevanceGate.load() == RelevanceGate(0.3, 0.9)
+    # The strict threshold flags even the on-topic essay
+    assert relevance_gate_node(state(ON_TOPIC))["relevance"]["off_topic"]
+
+
+def check(monkeypatch, rating: str) -> dict:
+    response = EvaluationSchema(rating=rating, feedback="The essay discusses cricket.", annotations=[])
+    monkeypatch.setattr(relevance_gate, "run_evaluation", lambda *args: (response, {"cost_usd": 0.0001}))
+    return relevance_check(state(OFF_TOPIC, relevance={"score": 0.05, "threshold": 0.15, "off_topic": True}))
+
+
+def test_confirmed_off_topic_essay_ends_with_the_relevance_result(monkeypatch):
+
+    update = check(monkeypatch, "Poor")
+
+    assert update["relevance"]["confirmed"]
+    assert update["overall"].startswith(OFF_TOPIC_MESSAGE)
+    assert list(update["evaluations"]) == [relevance_gate.GATE_CRITERION]
+    assert update["score"] is not None
+    assert update["usage"] == {"relevance_check": {"cost_usd": 0.0001}}
+
+
+def test_unconfirmed_flag_sends_the_essay_on(monkeypatch):
+
+    update = check(monkeypatch, "Average")
+
+    assert not update["relevance"]["confirmed"]
+    assert set(update) == {"usage", "relevance"}
+
+
+def test_calibration_catches_off_topic_essays():
+
+    samples = [{"topic": TOPIC, "essay": ON_TOPIC[:n], "on_topic": True} for n in (300, 600, 900)]
+    samples += [{"topic": TOPIC, "essay": OFF_TOPIC[:n], "on_topic": False} for n in (300, 600, 900)]
+
+    gate, rates = calibrate(samples, max_false_flag=0)
+
+    assert rates == {"off_topic_caught": 1.0, "on_topic_flagged": 0.0}
+    assert gate.score(TOPIC, OFF_TOPIC) < gate.threshold <= gate.score(TOPIC, ON_TOPIC)
+
+    with pytest.raises(ValueError, match="both"):
+        calibrate([s for s in samples if s["on_topic"]])
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+
+import config
+import repair
+from repair import RepairingModel
+from schemas import EvaluationSchema
+
+ESSAY = "Growth is not welfare. Roads matter less than the doctors they bring closer."
+
+FULL = json.dumps({
+    "rating": "good",
+    "feedback": "Clear thesis.",
+    "annotations": [
+        {"quote": "Growth is not welfare", "issue": "Bare", "suggestion": "Add data", "severity": "major"},
+        {"quote": "the doctors they bring closer", "issue": "Vague", "suggestion": "Name them", "severity": "warning"},
+    ],
+})
+
+
+class Replies:
+    """Runnable answering with the given (text, finish_reason) pairs in turn; records its kwargs."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.calls = []
+
+    def invoke(self, prompt, config=None, **kwargs):
+        self.calls.append(kwargs)
+        text, finish = self.replies.pop(0)
+        return AIMessage(
+            content=text,
+            response_metadata={"finish_reason": finish},
+            usage_metadata={"input_tokens": 900, "output_tokens": 2000, "total_tokens": 2900},
+        )
+
+
+@pytest.fixture(autouse=True)
+def one_retry(monkeypatch):
+    monkeypatch.setattr(config, "REPAIR_MAX_RETRIES", 1)
+
+
+def invoke(runnable):
+    with repair.tracking(ESSAY) as report:
+        return RepairingModel(runnable, EvaluationSchema).invoke("prompt"), report
+
+
+def test_malformed_output_is_repaired_without_a_new_call():
+
+    runnable = Replies(("```json\n" + FULL[:-1] + ",}\n```", "stop"))
+    response, report = invoke(runnable)
+
+    assert response.rating == "Good"
+    assert [a.severity for a in response.annotations] == ["error", "warning"]
+    assert len(runnable.calls) == 1
+    assert report.retries == 0 and "enum" in " ".join(report.fixes)
+
+
+def test_output_cut_off_at_max_tokens_is_requested_again_with_more_room():
+
+    before = repair.stats().get("truncated", 0)
+    runnable = Replies((FULL[:150], "length"), (FULL, "stop"))
+    response, report = invoke(runnable)
+
+    assert len(response.annotations) == 2
+    assert runnable.calls == [{}, {"max_tokens": 4000}]
+    assert report.retries == 1
+    assert repair.stats()["truncated"] == before + 1
+
+
+def test_last_attempt_is_repaired_even_if_cut_off(monkeypatch):
+
+    monkeypatch.setattr(config, "REPAIR_MAX_RETRIES", 0)
+    # Cut off inside the second annotation: the partial JSON still parses
+    runnable = Replies((FULL[:FULL.index("the doctors")], "length"))
+    response, _ = invoke(runnable)
+
+    assert response.rating == "Good"
+    assert len(runnable.calls) == 1
+
+
+def test_irreparable_output_fails_after_the_retries():
+
+    runnable = Replies(("no json here", "stop"), ("still none", "stop"))
+
+    with pytest.raises(OutputParserException):
+        invoke(runnable)
+    assert len(runnable.calls) == 2
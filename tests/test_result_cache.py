@@ -0,0 +1,73 @@
+import os
+
+from conftest import make_result
+from result_cache import ResultCache, pack, unpack
+
+
+def test_pack_round_trip():
+
+    result = make_result()
+    restored = unpack(pack(result))
+
+    assert restored["evaluations"].keys() == result["evaluations"].keys()
+    for key, evaluation in result["evaluations"].items():
+        assert restored["evaluations"][key].model_dump() == evaluation.model_dump()
+    assert [a.model_dump() for a in restored["rule_annotations"]] == [a.model_dump() for a in result["rule_annotations"]]
+    for key in ("topic", "essay", "score", "metadata", "usage"):
+        assert restored[key] == result[key]
+    assert [tuple(s) for s in restored["sentences"]] == result["sentences"]
+
+
+def test_pack_round_trip_without_annotations():
+
+    result = make_result(annotations=0)
+    result.pop("rule_annotations")
+    restored = unpack(pack(result))
+
+    assert all(e.annotations == [] for e in restored["evaluations"].values())
+    assert "rule_annotations" not in restored
+
+
+def test_get_returns_a_fresh_copy(tmp_path):
+
+    cache = ResultCache(2**20, str(tmp_path))
+    handle = cache.put(make_result())
+
+    first = cache.get(handle)
+    first["score"] = 0
+    assert cache.get(handle)["score"] == 64
+    assert cache.get("unknown") is None
+
+
+def test_evicted_results_spill_and_reload(tmp_path):
+
+    size = len(pack(make_result()))
+    cache = ResultCache(int(size * 2.5), str(tmp_path))
+    handles = [cache.put(make_result(score=score)) for score in (10, 20, 30)]
+
+    # The least recently used result went to disk
+    assert cache.stats()["spilled"] == 1
+    assert os.path.exists(tmp_path / f"{handles[0]}.bin")
+
+    assert cache.get(handles[0])["score"] == 10
+    stats = cache.stats()
+    assert stats["reloaded"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= cache.max_bytes
+    assert not os.path.exists(tmp_path / f"{handles[0]}.bin")
+
+    # Every result is still reachable, from memory or disk
+    assert [cache.get(h)["score"] for h in handles] == [10, 20, 30]
+
+
+def test_put_replaces_and_discard_removes(tmp_path):
+
+    cache = ResultCache(2**20, str(tmp_path))
+    handle = cache.put(make_result())
+    assert cache.put(make_result(score=80), handle) == handle
+    assert cache.get(handle)["score"] == 80
+    assert cache.stats()["entries"] == 1
+
+    cache.discard(handle)
+    assert cache.get(handle) is None
+    assert cache.stats()["bytes"] == 0
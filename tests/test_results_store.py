@@ -0,0 +1,171 @@
+import os
+import threading
+import time
+
+import pytest
+
+import config
+import results_store
+from conftest import make_result
+from criteria_registry import CRITERIA
+from results_store import RETIRE_GRACE_S, ResultsStore, result_row
+from jobs import dump_result
+
+DAY = 1767225600  # 2026-01-01 00:00 UTC
+
+
+def entry(student="s1", topic="Topic A", score=60, day=0, tenant="inst"):
+    result = make_result(topic=topic, score=score)
+    row = result_row(result, student, tenant, wall_s=12.0, created=DAY + day * 86400 + 3600)
+    return row, dump_result(result)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    # Compaction only when asked for
+    monkeypatch.setattr(config, "RESULTS_COMPACT_SEGMENTS", 1000)
+    return ResultsStore(str(tmp_path / "results"))
+
+
+def live_segments(store, day="2026-01-01"):
+    with store._connect() as db:
+        return db.execute("SELECT COUNT(*) FROM segments WHERE date = ? AND retired IS NULL", (day,)).fetchone()[0]
+
+
+def test_result_row():
+
+    row = result_row(make_result(score=70), "s1")
+    first = CRITERIA[0].key
+
+    assert (row["student"], row["score"], row["criteria"], row["word_count"]) == ("s1", 70, len(CRITERIA), 1100)
+    assert row["annotations"] == 3 * len(CRITERIA)
+    assert (row[f"rating_{first}"], row[f"errors_{first}"], row[f"warnings_{first}"]) == (4, 1, 2)
+    assert row["cost_usd"] == pytest.approx(0.001 * len(CRITERIA))
+
+
+def test_append_query_and_payload(store):
+
+    rows = [entry("s1", "Topic A", 50), entry("s2", "Topic A", 70), entry("s1", "Topic B", 80, day=1)]
+    for e in rows:
+        store.append([e])
+
+    assert store.query(["score"]).num_rows == 3
+    assert sorted(store.query(["score"], topic="Topic A")["score"].to_pylist()) == [50, 70]
+    assert store.query(["score"], since="2026-01-02")["score"].to_pylist() == [80]
+    assert store.query(["score"], student="nobody").num_rows == 0
+
+    history = store.history("s1")
+    assert [(h["topic"], h["score"]) for h in history] == [("Topic A", 50), ("Topic B", 80)]
+
+    payload = store.payload(history[0]["id"])
+    assert payload["score"] == 50
+    assert payload["evaluations"][CRITERIA[0].key].annotations[0].quote == "quote 0"
+    assert store.payload("unknown") is None
+
+
+def test_aggregate(store):
+
+    store.append([entry("s1", "Topic A", 50), entry("s2", "Topic A", 70), entry("s3", "Topic B", 80)])
+    by_topic = {row["topic"]: row for row in store.aggregate("topic").to_pylist()}
+
+    assert by_topic["Topic A"]["count_all"] == 2
+    assert by_topic["Topic A"]["score_mean"] == pytest.approx(60)
+    assert (by_topic["Topic A"]["score_min"], by_topic["Topic A"]["score_max"]) == (50, 70)
+    assert by_topic["Topic B"]["count_all"] == 1
+
+
+def test_compaction_merges_segments_and_keeps_results(store, monkeypatch):
+
+    for i in range(5):
+        store.append([entry(f"s{i % 2}", "Topic A", 50 + i)])
+    store.append([entry("s9", "Topic B", 90, day=1)])
+    assert live_segments(store) == 5
+
+    ids = sorted(store.query(["id"])["id"].to_pylist())
+    assert store.compact() == 5
+    assert live_segments(store) == 1
+    assert live_segments(store, "2026-01-02") == 1
+
+    # Same rows, postings and payloads after the merge
+    assert sorted(store.query(["id"])["id"].to_pylist()) == ids
+    assert [h["score"] for h in store.history("s1")] == [51, 53]
+    assert store.query(["score"], topic="Topic B")["score"].to_pylist() == [90]
+    assert all(store.payload(i) is not None for i in ids)
+
+    # Merged-away segments stay readable for a grace period, then go
+    with store._connect() as db:
+        retired = db.execute("SELECT date, name FROM segments WHERE retired IS NOT NULL").fetchall()
+    assert len(retired) == 5
+    assert all(os.path.exists(store._segment_path(d, n)) for d, n in retired)
+
+    later = time.time() + RETIRE_GRACE_S + 1
+    monkeypatch.setattr(results_store.time, "time", lambda: later)
+    store.compact()
+    assert not any(os.path.exists(store._segment_path(d, n)) for d, n in retired)
+
+
+def levels(store, day="2026-01-01") -> list[int]:
+    with store._connect() as db:
+        return sorted(lvl for (lvl,) in db.execute("SELECT level FROM segments WHERE date = ? AND retired IS NULL", (day,)))
+
+
+def test_append_compacts_once_a_day_has_enough_segments(store, monkeypatch):
+
+    monkeypatch.setattr(config, "RESULTS_COMPACT_SEGMENTS", 3)
+    for i in range(3):
+        store.append([entry(score=i)])
+    store.flush(timeout=10)
+
+    assert live_segments(store) == 1
+    assert sorted(store.query(["score"])["score"].to_pylist()) == [0, 1, 2]
+
+
+def test_merged_segments_are_only_merged_again_with_their_level(store, monkeypatch):
+
+    monkeypatch.setattr(config, "RESULTS_COMPACT_SEGMENTS", 3)
+    for i in range(8):
+        store.append([entry(score=i)])
+        store.flush(timeout=10)
+
+    # Six appends made two level-1 segments; the two newest are still waiting
+    assert levels(store) == [0, 0, 1, 1]
+
+    store.append([entry(score=8)])
+    store.flush(timeout=10)
+    assert levels(store) == [2]
+    assert sorted(store.query(["score"])["score"].to_pylist()) == list(range(9))
+
+
+def test_append_does_not_wait_for_compaction(store, monkeypatch):
+
+    monkeypatch.setattr(config, "RESULTS_COMPACT_SEGMENTS", 2)
+    release = threading.Event()
+    real = store._merge
+
+    def slow_merge(*args):
+        release.wait(10)
+        return real(*args)
+
+    monkeypatch.setattr(store, "_merge", slow_merge)
+    for i in range(3):
+        store.append([entry(score=i)])
+
+    # The merge is blocked, yet every append returned and is visible
+    assert live_segments(store) == 3
+    release.set()
+    store.flush(timeout=10)
+    assert sorted(store.query(["score"])["score"].to_pylist()) == [0, 1, 2]
+
+
+def test_merge_gives_way_to_a_concurrent_one(store):
+
+    for i in range(4):
+        store.append([entry(score=i)])
+    with store._connect() as db:
+        names = [n for (n,) in db.execute("SELECT name FROM segments")]
+
+    assert store._merge("2026-01-01", 0, names[:2])
+    # Another process merged these first: nothing is written twice
+    assert not store._merge("2026-01-01", 0, names[1:3])
+    assert sorted(store.query(["score"])["score"].to_pylist()) == [0, 1, 2, 3]
+    assert len(os.listdir(os.path.join(store.path, "segments", "2026-01-01"))) == 5
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from scheduler import PRIORITIES, FairScheduler, TenantPolicy, priority_level
+
+
+def test_unknown_priority_runs_at_the_lowest_priority(caplog):
+
+    assert priority_level(None) == 0
+    assert priority_level("batch") == PRIORITIES.index("batch")
+    assert priority_level("urgent") == len(PRIORITIES) - 1
+    assert "urgent" in caplog.text
+
+    scheduler = FairScheduler(1)
+    with scheduler.slot("tenant", "urgent") as waited:
+        assert waited >= 0
+    assert scheduler.stats()["tenant"]["granted"] == 1
+
+
+def queued(scheduler: FairScheduler) -> int:
+    return sum(s["queued"] for s in scheduler.stats().values())
+
+
+def enqueue(scheduler: FairScheduler, calls, order: list, hold: threading.Event | None = None) -> list[threading.Thread]:
+    """Queue `calls` of (label, tenant, priority) one after another; each appends its label when granted.
+
+    A call keeps its slot until `hold` is set (released at once without one).
+    """
+
+    threads = []
+    for label, tenant, priority in calls:
+
+        def run(label=label, tenant=tenant, priority=priority):
+            with scheduler.slot(tenant, priority):
+                order.append(label)
+                if hold is not None:
+                    hold.wait(5)
+
+        expected = queued(scheduler) + 1
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: queued(scheduler) == expected or label in order)
+    return threads
+
+
+def wait_for(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_waiting_tenants_share_slots_by_weight():
+
+    scheduler = FairScheduler(1, {"a": TenantPolicy(weight=1), "b": TenantPolicy(weight=3)})
+    order = []
+
+    scheduler.acquire("holder")
+    threads = enqueue(scheduler, [(f"a{i}", "a", None) for i in range(4)] + [(f"b{i}", "b", None) for i in range(12)], order)
+    scheduler.release("holder")
+    for t in threads:
+        t.join(5)
+
+    # Three b calls for every a call while both wait, each tenant in arrival order
+    assert [label[0] for label in order[:8]].count("b") == 6
+    assert [label[0] for label in order[:16]].count("b") == 12
+    assert [label for label in order if label[0] == "a"] == ["a0", "a1", "a2", "a3"]
+    assert [label for label in order if label[0] == "b"] == [f"b{i}" for i in range(12)]
+
+
+def test_interactive_calls_go_before_batch_calls():
+
+    scheduler = FairScheduler(1)
+    order = []
+
+    scheduler.acquire("holder")
+    threads = enqueue(scheduler, [
+        ("batch-1", "a", "batch"),
+        ("batch-2", "a", "batch"),
+        ("interactive-1", "a", "interactive"),
+        ("other-batch", "b", "batch"),
+        ("interactive-2", "a", None),
+    ], order)
+    scheduler.release("holder")
+    for t in threads:
+        t.join(5)
+
+    assert order[:2] == ["interactive-1", "interactive-2"]
+    assert set(order[2:]) == {"batch-1", "batch-2", "other-batch"}
+    assert order.index("batch-1") < order.index("batch-2")
+
+
+def test_tenant_concurrency_cap_leaves_slots_to_others():
+
+    scheduler = FairScheduler(4, {"a": TenantPolicy(max_concurrency=2)})
+    order, hold = [], threading.Event()
+
+    threads = enqueue(scheduler, [(f"a{i}", "a", None) for i in range(3)] + [("b0", "b", None)], order, hold)
+    wait_for(lambda: len(order) == 3)
+
+    # a is at its cap: its third call waits although a slot is free
+    assert order == ["a0", "a1", "b0"]
+    assert scheduler.stats()["a"] == {**scheduler.stats()["a"], "running": 2, "queued": 1}
+
+    hold.set()
+    for t in threads:
+        t.join(5)
+    assert order[3] == "a2"
@@ -0,0 +1,69 @@
+import pytest
+
+from criteria_registry import CRITERIA
+from schemas import EvaluationSchema
+from score_ranks import Histogram, SketchStore, population
+
+
+def test_percentile_counts_ties_as_half():
+
+    h = Histogram({})
+    for value in (40, 50, 50, 60):
+        h.add(value)
+
+    assert h.total == 4
+    assert h.percentile(50) == pytest.approx(50.0)
+    assert h.percentile(40) == pytest.approx(12.5)
+    assert h.percentile(70) == pytest.approx(100.0)
+    assert h.percentile(10) == pytest.approx(0.0)
+    assert Histogram({}).percentile(50) is None
+
+
+def test_quantile():
+
+    h = Histogram({value: 1 for value in range(1, 101)})
+
+    assert h.quantile(0.25) == 25
+    assert h.quantile(0.5) == 50
+    assert h.quantile(0.9) == 90
+    assert h.quantile(1.0) == 100
+    assert Histogram({}).quantile(0.5) is None
+
+
+def test_merge_adds_counts():
+
+    merged = Histogram({50: 2, 60: 1}).merge(Histogram({60: 3, 70: 1}))
+    assert merged.counts == {50: 2, 60: 4, 70: 1}
+
+
+def result(score=60, mode="full", overall=True, cascade=False, criteria=None):
+    keys = [c.key for c in CRITERIA] if criteria is None else criteria
+    evaluation = EvaluationSchema(rating="Good", feedback="", annotations=[])
+    usage = {key: {"cascade": {}} if cascade else {} for key in keys}
+    if overall:
+        usage["overall_evaluation"] = {}
+    return {"topic": "Topic", "score": score, "plan": {"mode": mode},
+            "evaluations": {key: evaluation for key in keys}, "usage": usage}
+
+
+def test_population_separates_scoring_paths():
+
+    assert population(result()) == "full/model"
+    assert population(result(mode="fused")) == "fused/model"
+    assert population(result(cascade=True)) == "full+cascade/model"
+    assert population(result(overall=False)) == "full/local"
+    assert population(result(criteria=["grammar"])) is None
+    assert population(result(score=None)) is None
+
+
+def test_ranks_stay_within_a_population(tmp_path):
+
+    store = SketchStore(str(tmp_path / "sketches.db"))
+    for score in (40, 50, 60):
+        store.add("full/model", "Topic", {"score": score})
+    store.add("fused/model", "Topic", {"score": 90})
+
+    rank = store.ranks("full/model", "topic ", {"score": 60})["score"]
+    assert (rank.topic_count, rank.overall_count) == (3, 3)
+    assert rank.topic == pytest.approx(100 * 2.5 / 3)
+    assert store.ranks("fused/model", "Topic", {"score": 60})["score"].topic == pytest.approx(0.0)
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+from scoring import RATINGS, ScoringWeights, calibrate, score_from_counts
+
+
+def samples(weights: ScoringWeights, n: int = 400, seed: int = 3) -> list[dict]:
+    """Essays scored exactly by `weights`, many with capped annotation penalties."""
+
+    rng = random.Random(seed)
+    keys = list(weights.criterion_weights)
+    out = []
+    for _ in range(n):
+        ratings = {k: rng.choice(RATINGS) for k in keys}
+        severities = {k: {"error": rng.randint(0, 3), "warning": rng.randint(0, 5)} for k in keys}
+        out.append({"ratings": ratings, "severities": severities, "score": score_from_counts(ratings, severities, weights)})
+    return out
+
+
+def test_calibrate_recovers_weights_behind_capped_scores():
+
+    truth = ScoringWeights(
+        rating_points={"Excellent": 88.0, "Good": 74.0, "Average": 60.0, "Poor": 42.0},
+        severity_penalty={"error": 1.5, "warning": 0.4},
+    )
+    data = samples(truth)
+
+    fitted = calibrate(data, ScoringWeights())
+
+    for rating in RATINGS:
+        assert fitted.rating_points[rating] == pytest.approx(truth.rating_points[rating], abs=1.5)
+    assert fitted.severity_penalty["error"] == pytest.approx(1.5, abs=0.2)
+    assert fitted.severity_penalty["warning"] == pytest.approx(0.4, abs=0.1)
+
+    errors = [abs(score_from_counts(s["ratings"], s["severities"], fitted) - s["score"]) for s in data]
+    assert sum(errors) / len(errors) < 1.0
+
+
+def test_calibrate_needs_enough_samples():
+    with pytest.raises(ValueError):
+        calibrate(samples(ScoringWeights(), n=3))
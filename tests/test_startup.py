@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LLM_STACK = ("langchain_core", "langchain_openai", "langgraph", "openai")
+
+
+def test_importing_the_graph_module_defers_the_llm_stack():
+
+    code = f"import sys, build_graph; print(sorted(m for m in {LLM_STACK!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True).stdout
+
+    assert out.strip() == "[]"
+
+
+def test_usage_handler_is_built_on_first_use():
+
+    from models import UsageHandler
+    from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+    import models
+
+    assert issubclass(UsageHandler, UsageMetadataCallbackHandler)
+    assert models.UsageHandler is UsageHandler
@@ -0,0 +1,109 @@
+import contextvars
+import json
+import os
+import threading
+
+import pytest
+
+import config
+import tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "TRACE_PATH", str(tmp_path / "traces" / "trace-{pid}.json"))
+    monkeypatch.setattr(config, "TRACE_SAMPLE_RATE", 1.0)
+    return tracing.trace_path()
+
+
+def spans(path: str) -> list[dict]:
+    return [e for e in tracing.load_events(path) if e["ph"] == "X"]
+
+
+class Model:
+    def invoke(self, prompt, **kwargs):
+        return prompt.upper()
+
+    def stream(self, prompt, **kwargs):
+        yield from prompt
+
+
+def test_sampled_trace_records_nested_spans_across_threads(trace_file):
+
+    @tracing.traced()
+    def resolve():
+        return 1
+
+    def in_thread():
+        with tracing.span("in_thread"):
+            pass
+
+    with tracing.trace("evaluate", "job", tenant="a"):
+        with tracing.span("node", "node"):
+            assert resolve() == 1
+        # Threads started with a copy of the context add to the same trace
+        worker = threading.Thread(target=contextvars.copy_context().run, args=(in_thread,))
+        worker.start()
+        worker.join()
+        assert tracing.TracedModel(Model(), "llm:test", profile="fast").invoke("hi") == "HI"
+        assert "".join(tracing.TracedModel(Model(), "llm:stream").stream("abc")) == "abc"
+
+    events = spans(trace_file)
+    names = {e["name"]: e for e in events}
+
+    assert set(names) == {"evaluate", "node", "resolve", "in_thread", "llm:test", "llm:stream"}
+    assert len({e["args"]["trace"] for e in events}) == 1
+    assert names["evaluate"]["args"]["tenant"] == "a"
+    assert names["llm:test"]["args"]["profile"] == "fast"
+    assert names["llm:stream"]["args"]["stream"] and names["llm:stream"]["args"]["first_chunk_us"] is not None
+    assert names["in_thread"]["tid"] != names["evaluate"]["tid"]
+    root = names["evaluate"]
+    assert all(root["ts"] <= e["ts"] and e["ts"] + e["dur"] <= root["ts"] + root["dur"] + 1000 for e in events)
+
+    # Thread names come first, as metadata events
+    metadata = [e for e in tracing.load_events(trace_file) if e["ph"] == "M"]
+    assert {e["tid"] for e in metadata} == {e["tid"] for e in events}
+
+
+def test_unsampled_traces_record_nothing(trace_file, monkeypatch):
+
+    monkeypatch.setattr(config, "TRACE_SAMPLE_RATE", 0)
+
+    with tracing.trace("evaluate"):
+        assert not tracing.active()
+        with tracing.span("node"):
+            pass
+
+    with tracing.span("outside"):
+        assert not tracing.active()
+
+    assert not os.path.exists(trace_file)
+
+
+def test_failed_spans_carry_the_error(trace_file):
+
+    with pytest.raises(ValueError):
+        with tracing.trace("evaluate"):
+            with tracing.span("node"):
+                raise ValueError("bad")
+
+    assert {e["name"]: e["args"].get("error") for e in spans(trace_file)} == {"evaluate": "ValueError", "node": "ValueError"}
+
+
+def test_trace_file_is_valid_json_and_rotates(trace_file, monkeypatch):
+
+    for i in range(3):
+        with tracing.trace("evaluate", item=i):
+            pass
+
+    # The open array loads as JSON once closed, which is what viewers do
+    with open(trace_file, encoding="utf-8") as f:
+        assert len(json.loads(f.read().rstrip().rstrip(",") + "]")) == 4
+    assert [e["args"]["item"] for e in spans(trace_file)] == [0, 1, 2]
+
+    monkeypatch.setattr(config, "TRACE_MAX_MB", 0)
+    with tracing.trace("evaluate", item=3):
+        pass
+
+    assert [e["args"]["item"] for e in spans(trace_file)] == [3]
+    assert len(spans(trace_file + ".1")) == 3
@@ -0,0 +1,63 @@
+import httpx
+import openai
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from circuit_breaker import CircuitBreaker, GuardedModel
+from models import MODEL_PROFILES, UsageHandler, call_usage
+
+
+class Chat(BaseChatModel):
+    """Answers with fixed token counts, or raises a connection error."""
+
+    name_: str
+    fail: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "test"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.fail:
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://test"))
+        message = AIMessage(
+            content=self.name_,
+            usage_metadata={"input_tokens": 1000, "output_tokens": 100, "total_tokens": 1100},
+            response_metadata={"model_name": self.name_},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def guarded(primary_fails: bool) -> GuardedModel:
+    circuit = CircuitBreaker("test", window_s=60, min_calls=100, error_rate=1, slow_rate=1, slow_call_s=60, open_s=60)
+    return GuardedModel(Chat(name_="primary", fail=primary_fails), Chat(name_="fallback"), circuit, "fast")
+
+
+def test_primary_call_is_priced_at_its_profile():
+
+    handler = UsageHandler()
+    guarded(False).invoke("prompt", config={"callbacks": [handler]})
+    usage = call_usage("strong", handler, 1.0)
+
+    assert usage["profile"] == "strong"
+    assert "fallback_from" not in usage
+    assert usage["cost_usd"] == pytest.approx(MODEL_PROFILES["strong"].cost(1000, 100))
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_fallback_call_is_priced_at_the_fallback_profile(streaming):
+
+    handler = UsageHandler()
+    model = guarded(True)
+    if streaming:
+        list(model.stream("prompt", config={"callbacks": [handler]}))
+    else:
+        assert model.invoke("prompt", config={"callbacks": [handler]}).content == "fallback"
+    usage = call_usage("strong", handler, 1.0)
+
+    assert usage["profile"] == "fast"
+    assert usage["model"] == MODEL_PROFILES["fast"].model
+    assert usage["fallback_from"] == "strong"
+    assert usage["cost_usd"] == pytest.approx(MODEL_PROFILES["fast"].cost(1000, 100))
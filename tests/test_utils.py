@@ -0,0 +1,47 @@
+import config
+from nodes import escalation_reason
+from schemas import Annotation, EvaluationSchema
+from utils import build_sentence_index, resolve_annotations
+
+ESSAY = "Growth is not welfare. Roads matter less than the doctors they bring closer. Policy must follow."
+SENTENCES = build_sentence_index(ESSAY)
+
+
+def annotation(quote: str, sentence_id: int | None = None) -> Annotation:
+    return Annotation(quote=quote, issue="Vague", suggestion="Be specific", severity="warning", sentence_id=sentence_id)
+
+
+def test_anchored_quote_resolves_inside_its_sentence():
+
+    (resolved,) = resolve_annotations(ESSAY, [{"quote": "the doctors", "sentence_id": 2}], sentence_index=SENTENCES)
+
+    assert ESSAY[resolved["start"]:resolved["end"]] == "the doctors"
+    assert SENTENCES[1][0] <= resolved["start"] < SENTENCES[1][1]
+
+
+def test_anchored_quote_missing_from_its_sentence_is_unresolved():
+
+    annotations = [
+        {"quote": "Growth is not welfare", "sentence_id": 2},  # drifted to the wrong sentence
+        {"quote": "invented phrase", "sentence_id": 3},
+        {"quote": "policy MUST follow", "sentence_id": 3},  # case-insensitive match
+    ]
+
+    resolved = resolve_annotations(ESSAY, annotations, allow_overlaps=True, sentence_index=SENTENCES)
+
+    assert [ESSAY[r["start"]:r["end"]] for r in resolved] == ["Policy must follow"]
+
+
+def test_unresolved_anchors_escalate_the_cascade(monkeypatch):
+
+    monkeypatch.setattr(config, "CASCADE_MIN_RESOLUTION", 0.7)
+    state = {"essay": ESSAY, "sentences": SENTENCES}
+
+    def evaluation(*annotations):
+        return EvaluationSchema(rating="Average", feedback="Fine.", annotations=list(annotations))
+
+    good = evaluation(annotation("Growth is not", 1), annotation("the doctors", 2))
+    bad = evaluation(annotation("Growth is not", 1), annotation("invented phrase", 2), annotation("made up", 3))
+
+    assert escalation_reason(good, state) is None
+    assert escalation_reason(bad, state) == "low_resolution"
@@ -0,0 +1,183 @@
+"""Topic analysis computed once per topic and shared by every essay on it.
+
+A mock test has hundreds of essays on one topic. The first essay triggers
+one model call that lists the topic's key dimensions, expected arguments
+and relevant examples by area; the compact form of that analysis is then
+injected into every evaluator prompt for the topic.
+
+Analyses are stored in a JSONL file (TOPIC_CACHE_PATH) and looked up by
+normalized topic text first, then by cosine similarity of hashed term
+vectors, so "Is GDP a measure of development?" and "GDP as a measure of
+development" share one entry. Concurrent essays on a new topic wait for a
+single analysis instead of each requesting their own.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from models import get_structured_model, call_usage
+from nodes import llm_slot, queue_usage, repair_usage
+from relevance_gate import terms, hashed_vector
+from schemas import EssayState, TopicAnalysisSchema
+import config
+import repair
+
+# Topics are short: a small vector keeps the index matrix compact
+TOPIC_DIM = 4096
+
+
+def normalize_topic(topic: str) -> str:
+    text = unicodedata.normalize("NFKC", topic).lower()
+    text = re.sub(r"[\"'“”‘’]", "", text)
+    return re.sub(r"[^a-z0-9]+", " ", text).strip()
+
+
+def topic_vector(topic: str) -> np.ndarray:
+    # Unigrams only: rephrasings reorder words, which breaks bigrams
+    return hashed_vector([t for t in terms(topic) if " " not in t], TOPIC_DIM)
+
+
+class TopicIndex:
+    """JSONL-backed topic -> analysis store with exact and similarity lookup."""
+
+    def __init__(self, path: str, threshold: float):
+
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._inflight: dict[str, threading.Lock] = {}
+        self._analyses: dict[str, TopicAnalysisSchema] = {}
+        self._keys: list[str] = []
+        self._vectors = np.zeros((0, TOPIC_DIM), dtype=np.float32)
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._insert(entry["topic"], TopicAnalysisSchema.model_validate(entry["analysis"]))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _insert(self, topic: str, analysis: TopicAnalysisSchema):
+        key = normalize_topic(topic)
+        if key not in self._analyses:
+            self._keys.append(key)
+            self._vectors = np.vstack([self._vectors, topic_vector(topic)])
+        self._analyses[key] = analysis
+
+    def lookup(self, topic: str) -> tuple[TopicAnalysisSchema | None, str]:
+        """(analysis, "exact" | "similar" | "miss")."""
+
+        key = normalize_topic(topic)
+
+        with self._lock:
+            if key in self._analyses:
+                return self._analyses[key], "exact"
+            if not self._keys:
+                return None, "miss"
+            similarity = self._vectors @ topic_vector(topic)
+            best = int(np.argmax(similarity))
+            if similarity[best] >= self.threshold:
+                return self._analyses[self._keys[best]], "similar"
+
+        return None, "miss"
+
+    def add(self, topic: str, analysis: TopicAnalysisSchema):
+
+        line = json.dumps({"topic": topic, "analysis": analysis.model_dump(mode="json")}, ensure_ascii=False)
+
+        with self._lock:
+            self._insert(topic, analysis)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def get_or_create(self, topic: str, create) -> tuple[TopicAnalysisSchema, str]:
+        """Cached analysis for `topic`, calling `create(topic)` at most once per new topic."""
+
+        analysis, match = self.lookup(topic)
+        if analysis is not None:
+            return analysis, match
+
+        key = normalize_topic(topic)
+        with self._lock:
+            inflight = self._inflight.setdefault(key, threading.Lock())
+
+        with inflight:
+            # Another essay may have finished the analysis while we waited
+            analysis, match = self.lookup(topic)
+            if analysis is not None:
+                return analysis, match
+            analysis = create(topic)
+            self.add(topic, analysis)
+
+        with self._lock:
+            self._inflight.pop(key, None)
+
+        return analysis, "miss"
+
+
+_index: TopicIndex | None = None
+_index_lock = threading.Lock()
+
+
+def topic_index() -> TopicIndex:
+    # Built under a lock: concurrent first essays must share one index
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = TopicIndex(config.TOPIC_CACHE_PATH, config.TOPIC_MATCH_THRESHOLD)
+        return _index
+
+
+def topic_prompt(topic: str) -> str:
+    return f"""
+You are a SENIOR UPSC essay examiner preparing shared marking notes for the essay topic below.
+The notes will be used while evaluating many candidates' essays on this topic, so keep them
+general to the topic, balanced across viewpoints, and factually safe.
+
+Essay Topic:
+{topic}
+
+Provide:
+1. Key dimensions a complete answer should cover (social, economic, political, ethical, historical, etc. as relevant)
+2. Central arguments or tensions a strong essay would develop
+3. Relevant, concrete examples grouped by area (schemes, judgments, data, thinkers, events)
+
+Be concise: short phrases for dimensions, one sentence per argument, 2-4 examples per area.
+"""
+
+
+# ----------------------- GRAPH NODES -----------------------
+
+def topic_analysis_node(state: EssayState):
+
+    if not config.TOPIC_ANALYSIS:
+        return {}
+
+    usage = {}
+
+    def analyze(topic: str) -> TopicAnalysisSchema:
+        from models import UsageHandler
+
+        handler = UsageHandler()
+        with llm_slot(state) as queued, repair.tracking() as report:
+            started = time.perf_counter()
+            structured = get_structured_model(config.TOPIC_ANALYSIS_PROFILE, TopicAnalysisSchema)
+            analysis = structured.invoke(topic_prompt(topic), config={"callbacks": [handler]})
+        call = call_usage(config.TOPIC_ANALYSIS_PROFILE, handler, time.perf_counter() - started)
+        usage["topic_analysis"] = queue_usage(repair_usage(call, report), queued)
+        return analysis
+
+    analysis, _ = topic_index().get_or_create(state["topic"], analyze)
+
+    # Only the essay that triggered the analysis reports (and pays for) its call
+    return {"topic_notes": analysis.compact(), "usage": usage}
@@ -0,0 +1,244 @@
+"""Sampled trace spans, exported in Chrome trace event format.
+
+A trace starts at a root (`trace`): an evaluation in the app, a job or a
+corpus item, or a render of the result view. With probability
+TRACE_SAMPLE_RATE it is recorded, and then every `span` (or `traced`
+function) entered on its behalf, in any thread the context is copied to,
+is recorded too: graph nodes, model calls, scheduler waits, annotation
+resolve and render steps. Unsampled traces cost one ContextVar lookup per
+span, so tracing can stay on in production at a low rate.
+
+A finished trace is appended to TRACE_PATH ("{pid}" is replaced by the
+process id) as complete ("X") events, which Perfetto (ui.perfetto.dev),
+chrome://tracing and speedscope load as flame charts. Files rotate to
+".1" past TRACE_MAX_MB.
+
+    python -m tracing summary traces/trace-*.json     # time per span name
+    python -m tracing merge all.json traces/trace-*.json
+"""
+
+import argparse
+import functools
+import glob
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import config
+
+
+class Trace:
+    __slots__ = ("id", "events")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex[:16]
+        self.events: list[dict] = []
+
+
+_current: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+def active() -> bool:
+    return _current.get() is not None
+
+
+def _event(t: Trace, name: str, cat: str, start_us: int, dur_us: int, args: dict):
+    # list.append is atomic, so spans from node threads can share the list
+    t.events.append({
+        "name": name, "cat": cat, "ph": "X", "ts": start_us, "dur": max(dur_us, 1),
+        "pid": os.getpid(), "tid": threading.get_ident(),
+        "args": {"trace": t.id, **args},
+    })
+
+
+@contextmanager
+def _record(t: Trace, name: str, cat: str, args: dict):
+    start_us = time.time_ns() // 1000
+    started = time.perf_counter_ns()
+    try:
+        yield
+    except BaseException as e:
+        args = {**args, "error": type(e).__name__}
+        raise
+    finally:
+        _event(t, name, cat, start_us, (time.perf_counter_ns() - started) // 1000, args)
+
+
+@contextmanager
+def trace(name: str, cat: str = "request", **args):
+    """Root span, sampled at TRACE_SAMPLE_RATE; inside an active trace, a plain span."""
+
+    current = _current.get()
+    if current is not None:
+        with _record(current, name, cat, args):
+            yield
+        return
+
+    if not config.TRACE_SAMPLE_RATE or random.random() >= config.TRACE_SAMPLE_RATE:
+        yield
+        return
+
+    t = Trace()
+    token = _current.set(t)
+    try:
+        with _record(t, name, cat, args):
+            yield
+    finally:
+        _current.reset(token)
+        export(t)
+
+
+@contextmanager
+def span(name: str, cat: str = "span", **args):
+    """Span within the active trace; nothing when there is none."""
+
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    with _record(current, name, cat, args):
+        yield
+
+
+def add_span(name: str, cat: str, start_us: int, dur_us: int, **args):
+    """Record an already timed span (e.g. one that ended inside a generator)."""
+    current = _current.get()
+    if current is not None:
+        _event(current, name, cat, start_us, dur_us, args)
+
+
+def traced(name: str | None = None, fn=None, cat: str = "span"):
+    """Decorator (or wrapper, with `fn`) that records each call as a span."""
+
+    def decorate(f):
+        label = name or f.__name__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            current = _current.get()
+            if current is None:
+                return f(*args, **kwargs)
+            with _record(current, label, cat, {}):
+                return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorate(fn) if fn is not None else decorate
+
+
+class TracedModel:
+    """Runnable that records each `invoke` and `stream` of `inner` as a model-call span."""
+
+    def __init__(self, inner, name: str, **args):
+        self.inner = inner
+        self.name = name
+        self.args = args
+
+    def invoke(self, prompt, *args, **kwargs):
+        with span(self.name, "llm", **self.args):
+            return self.inner.invoke(prompt, *args, **kwargs)
+
+    def stream(self, prompt, *args, **kwargs):
+        # Timed by hand: a context variable set here would leak to the caller between chunks
+        if not active():
+            yield from self.inner.stream(prompt, *args, **kwargs)
+            return
+
+        start_us = time.time_ns() // 1000
+        started = time.perf_counter_ns()
+        first_us = None
+        try:
+            for chunk in self.inner.stream(prompt, *args, **kwargs):
+                if first_us is None:
+                    first_us = (time.perf_counter_ns() - started) // 1000
+                yield chunk
+        finally:
+            add_span(self.name, "llm", start_us, (time.perf_counter_ns() - started) // 1000,
+                     stream=True, first_chunk_us=first_us, **self.args)
+
+
+# ----------------------- EXPORT -----------------------
+
+_export_lock = threading.Lock()
+# Threads already named in the current file, per path
+_named: dict[str, set[int]] = defaultdict(set)
+
+
+def trace_path() -> str:
+    return config.TRACE_PATH.format(pid=os.getpid())
+
+
+def export(t: Trace):
+
+    if not t.events:
+        return
+
+    path = trace_path()
+    with _export_lock:
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path) and os.path.getsize(path) > config.TRACE_MAX_MB * 2**20:
+            os.replace(path, path + ".1")
+            _named[path].clear()
+
+        lines = [] if os.path.exists(path) else ["["]
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for tid in {e["tid"] for e in t.events} - _named[path]:
+            lines.append(json.dumps({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                                     "args": {"name": names.get(tid, str(tid))}}) + ",")
+            _named[path].add(tid)
+        lines += [json.dumps(e, default=str) + "," for e in sorted(t.events, key=lambda e: e["ts"])]
+
+        # One write per trace; the viewers accept the array without its closing bracket
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def load_events(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip().rstrip(",")
+    return json.loads(text + ("" if text.endswith("]") else "]")) if text else []
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = commands.add_parser("summary", help="Count, total and mean duration per span name")
+    summary_parser.add_argument("paths", nargs="+")
+
+    merge_parser = commands.add_parser("merge", help="Combine trace files into one JSON file")
+    merge_parser.add_argument("out")
+    merge_parser.add_argument("paths", nargs="+")
+
+    args = parser.parse_args()
+    paths = [p for pattern in args.paths for p in sorted(glob.glob(pattern))]
+    events = [e for p in paths for e in load_events(p)]
+
+    if args.command == "merge":
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        print(f"Wrote {len(events)} events from {len(paths)} files to {args.out}")
+        return
+
+    spans = defaultdict(list)
+    for e in events:
+        if e.get("ph") == "X":
+            spans[(e["cat"], e["name"])].append(e["dur"] / 1000)
+
+    traces = len({e["args"]["trace"] for e in events if e.get("ph") == "X"})
+    print(f"{traces} traces\n{'category':<10} {'span':<28} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}")
+    for (cat, name), durations in sorted(spans.items(), key=lambda item: -sum(item[1])):
+        print(f"{cat:<10} {name[:28]:<28} {len(durations):>6} {sum(durations):>10.1f} "
+              f"{sum(durations) / len(durations):>9.1f} {max(durations):>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ from collections import Counter
 from pydoc import html
 import re
 from criteria_registry import CRITERIA
+from tracing import traced
 
 # Criterion color mapping for annotations and feedback panel
 CRITERION_COLORS = {
@@ -36,7 +37,106 @@ def extract_paragraphs(text: str) -> list[str]:
 def count_words(text: str) -> int:
         return len(re.findall(r"\b\w+\b", text))
 
-def resolve_annotations(text, annotations, allow_overlaps: bool = False):
+_SENTENCE_RE = re.compile(r"\S.*?(?:[.!?]+[\"'”’)\]]*(?=\s|$)|(?=\n)|$)", re.S)
+
+def build_sentence_index(text: str) -> list[tuple[int, int]]:
+    """Character spans of each sentence in `text`, in order.
+
+    Sentence ids shown to the model are 1-based positions in this list.
+    """
+    return [m.span() for m in _SENTENCE_RE.finditer(text)]
+
+def _render_sentences(text, sentence_index, selected, numbered):
+
+    lines = []
+    prev_end = 0
+    prev_i = -1
+
+    for i in (range(len(sentence_index)) if selected is None else selected):
+        start, end = sentence_index[i]
+        if lines and "\n" in text[prev_end:start]:
+            lines.append("")
+        if lines and i != prev_i + 1:
+            lines.append("[…]")
+        lines.append(f"[{i + 1}] {text[start:end]}" if numbered else text[start:end])
+        prev_end, prev_i = end, i
+
+    return "\n".join(lines)
+
+def number_sentences(text: str, sentence_index, selected=None) -> str:
+    """Render `text` as one `[n] sentence` per line, keeping paragraph breaks.
+
+    With `selected` (0-based sentence positions) only those sentences are
+    shown, keeping their global numbers and marking gaps with `[…]`.
+    """
+    return _render_sentences(text, sentence_index, selected, numbered=True)
+
+def excerpt_sentences(text: str, sentence_index, selected) -> str:
+    """Verbatim excerpt of the `selected` sentences, gaps marked with `[…]`."""
+    return _render_sentences(text, sentence_index, selected, numbered=False)
+
+def select_sentences(text: str, sentence_index, scope: str) -> list[int]:
+    """0-based positions of the sentences a criterion needs for `scope`.
+
+    "essay": everything; "conclusion": first and last paragraph;
+    "outline": first and last paragraph plus the opening and closing
+    sentence of every body paragraph.
+    """
+
+    paragraph_of = []
+    paragraph = 0
+    prev_end = 0
+    for start, end in sentence_index:
+        if paragraph_of and "\n" in text[prev_end:start]:
+            paragraph += 1
+        paragraph_of.append(paragraph)
+        prev_end = end
+
+    if scope == "essay" or not paragraph_of:
+        return list(range(len(sentence_index)))
+
+    last_paragraph = paragraph_of[-1]
+    selected = []
+
+    for i, p in enumerate(paragraph_of):
+        edge = p in (0, last_paragraph)
+        if scope == "outline":
+            first_in_para = i == 0 or paragraph_of[i - 1] != p
+            last_in_para = i == len(paragraph_of) - 1 or paragraph_of[i + 1] != p
+            edge = edge or first_in_para or last_in_para
+        if edge:
+            selected.append(i)
+
+    return selected
+
+def annotation_dict(criterion_key, ann):
+    """Flatten an `Annotation` into the dict shape used by the resolver and renderer."""
+    return {
+        "quote": ann.quote,
+        "type": criterion_key,
+        "severity": ann.severity,
+        "message": ann.issue,
+        "suggestions": [ann.suggestion],
+        "sentence_id": ann.sentence_id,
+    }
+
+def _find_in_sentence(text, quote, span):
+
+    s_start, s_end = span
+
+    start = text.find(quote, s_start, s_end)
+    if start == -1:
+        start = text[s_start:s_end].lower().find(quote.lower())
+        if start != -1:
+            start += s_start
+
+    if start == -1:
+        return None  # not in its sentence: unresolved, like a quote missing from the essay
+
+    return start, min(start + len(quote), s_end)
+
+@traced(cat="render")
+def resolve_annotations(text, annotations, allow_overlaps: bool = False, sentence_index=None):
 
     """Resolve annotation quotes to character spans in `text`.
 
@@ -45,6 +145,11 @@ def resolve_annotations(text, annotations, allow_overlaps: bool = False):
     resolved spans. If True, all matching quotes are returned even when
     their spans overlap — useful for per-criterion views where we want
     to retain more annotations instead of discarding collisions.
+
+    Annotations carrying a `sentence_id` are resolved through
+    `sentence_index` (from `build_sentence_index`): the sentence span is a
+    list lookup and the anchor phrase is only searched inside it; one not
+    found there is dropped.
     """
 
     resolved = []
@@ -56,12 +161,22 @@ def resolve_annotations(text, annotations, allow_overlaps: bool = False):
         if not quote:
             continue
 
-        start = text.find(quote)
+        sentence_id = ann.get("sentence_id")
+
+        if sentence_index and sentence_id is not None and 1 <= sentence_id <= len(sentence_index):
+            span = _find_in_sentence(text, quote, sentence_index[sentence_id - 1])
+
+            if span is None:
+                continue
+
+            start, end = span
+        else:
+            start = text.find(quote)
 
-        if start == -1:
-            continue  # discard hallucination safely
+            if start == -1:
+                continue  # discard hallucination safely
 
-        end = start + len(quote)
+            end = start + len(quote)
 
         if not allow_overlaps:
             # Check for overlaps with already-resolved annotations
@@ -90,6 +205,7 @@ def resolve_annotations(text, annotations, allow_overlaps: bool = False):
 
     return resolved
 
+@traced(cat="render")
 def render_annotated_essay(text, annotations):
     """
     Clean, formatting-safe annotation renderer.
@@ -187,7 +303,9 @@ def pretty_print(result: dict):
     print("\n📊 CRITERION ANALYSIS")
     print("-" * 80)
 
-    for i, criterion in enumerate(CRITERIA, start=1):
+    selected = [c for c in CRITERIA if c.key in evaluations]
+
+    for i, criterion in enumerate(selected, start=1):
 
         e = evaluations[criterion.key]
 
@@ -293,6 +411,32 @@ def pretty_print(result: dict):
             if suggestions:
                 print(f'Suggestion : {suggestions[0]}')
 
+    # =====================================================
+    # MODEL USAGE
+    # =====================================================
+
+    usage = result.get("usage", {})
+
+    if usage:
+
+        print("\n⏱️ MODEL USAGE")
+        print("-" * 80)
+
+        for node, u in usage.items():
+            print(
+                f"{node:<22} {u['model']:<14} {u['latency_s']:>6.2f}s "
+                f"in {u['input_tokens']:>6}  out {u['output_tokens']:>5}  ${u['cost_usd']:.4f}"
+            )
+
+        print(f"\nTotal cost: ${sum(u['cost_usd'] for u in usage.values()):.4f}")
+
+        plan = result.get("plan") or {}
+        if plan.get("predicted") and plan.get("actual"):
+            predicted, actual = plan["predicted"], plan["actual"]
+            print(f"Plan: {plan['mode']}")
+            print(f"Predicted: in {predicted['input_tokens']}  out {predicted['output_tokens']}  ${predicted['cost_usd']:.4f}")
+            print(f"Actual   : in {actual['input_tokens']}  out {actual['output_tokens']}  ${actual['cost_usd']:.4f}")
+
     print("\n" + "=" * 80)
     print("END OF REPORT")
     print("=" * 80 + "\n")
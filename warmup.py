@@ -0,0 +1,77 @@
+"""Warm-up hooks for the LLM stack.
+
+Importing langgraph, langchain and the OpenAI SDK, building the model
+clients, compiling the graph and loading tiktoken encodings take a couple
+of seconds. None of it happens at import time anymore; it happens on the
+first evaluation, or ahead of it through these hooks:
+
+- `warm_up()` does all of it now, in the calling thread (batch workers)
+- `start()` does it once per process in a background thread, so the app
+  can render its input form while the stack loads
+"""
+
+import importlib
+import threading
+import time
+
+import config
+
+_thread: threading.Thread | None = None
+_lock = threading.Lock()
+_timings: dict[str, float] = {}
+_done = threading.Event()
+
+
+def warm_up(criteria=None, overall: bool = True) -> dict[str, float]:
+    """Load the LLM stack and build the shared objects for `criteria`; seconds per step."""
+
+    timings = {}
+
+    def step(name, fn):
+        started = time.perf_counter()
+        result = fn()
+        timings[name] = round(time.perf_counter() - started, 3)
+        return result
+
+    build_graph = step("import", lambda: importlib.import_module("build_graph"))
+    step("graph", lambda: build_graph.get_workflow(criteria, overall))
+
+    from criteria_registry import select_criteria
+    from models import MODEL_PROFILES, get_chat_model
+    from planner import count_tokens
+
+    profiles = {"default", config.FALLBACK_PROFILE} | {c.model_profile for c in select_criteria(None if criteria is None else set(criteria))}
+    profiles = sorted(p for p in profiles if p in MODEL_PROFILES)
+
+    step("clients", lambda: [get_chat_model(p) for p in profiles])
+    step("tokenizers", lambda: [count_tokens("warm-up", MODEL_PROFILES[p].model) for p in profiles])
+
+    return timings
+
+
+def _run():
+    try:
+        _timings.update(warm_up())
+    finally:
+        _done.set()
+
+
+def start() -> threading.Thread:
+    """Warm up once per process in a daemon thread; later calls return the same thread."""
+
+    global _thread
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, name="warmup", daemon=True)
+            _thread.start()
+        return _thread
+
+
+def wait(timeout: float | None = None) -> bool:
+    """Block until a started warm-up has finished; True if none is pending."""
+    return _thread is None or _done.wait(timeout)
+
+
+def timings() -> dict[str, float]:
+    """Step timings of the background warm-up (empty until it finishes)."""
+    return dict(_timings)